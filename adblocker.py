@@ -11,7 +11,6 @@ Responsibilities:
 import json
 import re
 import threading
-import urllib.request
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -22,6 +21,7 @@ from qt_compat import (
     UTC,
     vlog,
 )
+from metrics import METRICS
 
 # ------------------ Blocklists ------------------
 DEFAULT_LISTS = {
@@ -114,25 +114,21 @@ def _fetch_text(url: str, timeout: int = 30) -> str:
     Fetch plain text from a URL, with a small fallback for GitHub's main/master
     branch naming differences.
     """
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": "RunIT-QT/0.9 (+local) Python-urllib"},
-    )
+    # Lists share hosts (easylist.to, raw.githubusercontent.com), so the
+    # pooled keep-alive connections of the "blocklist" session save most of
+    # the TLS handshakes; gzip cuts the transfer to about a third.
+    from net_session import NET, HTTPStatusError
+
     try:
-        return urllib.request.urlopen(req, timeout=timeout).read().decode("utf-8", "ignore")
-    except urllib.error.HTTPError as e:
+        return NET.fetch_bytes(url, timeout=timeout).decode("utf-8", "ignore")
+    except HTTPStatusError as e:
         if e.code == 404 and "raw.githubusercontent.com" in url:
             swapped = (
                 url.replace("/main/", "/master/")
                 if "/main/" in url
                 else url.replace("/master/", "/main/")
             )
-            return urllib.request.urlopen(
-                urllib.request.Request(
-                    swapped, headers={"User-Agent": "RunIT-QT/0.9"}
-                ),
-                timeout=timeout,
-            ).read().decode("utf-8", "ignore")
+            return NET.fetch_bytes(swapped, timeout=timeout).decode("utf-8", "ignore")
         raise
 
 
@@ -182,6 +178,11 @@ def update_blocklist(force: bool = False):
             except Exception as e:
                 vlog(f"[Adblock] Failed {name}: {e}")
 
+        # Weekly job: don't keep the pooled sockets around until the next one
+        from net_session import NET
+
+        NET.close_idle()
+
         try:
             CACHE_FILE.write_text(
                 json.dumps(
@@ -235,14 +236,26 @@ class TinyAdblockInterceptor(QWebEngineUrlRequestInterceptor):
         blocked_hosts: set[str],
         blocked_paths: set[str],
         allow_suffixes: set[str] | None = None,
+        upgrades=None,
+        data_saver=None,
     ):
         super().__init__()
+        # Optional hsts.UpgradeTable: known-HTTPS hosts are rewritten here,
+        # before the request is issued.
+        self.upgrades = upgrades
+        # Optional data_saver.DataSaver: holds back heavy resource classes
+        # per site (independent of the adblock toggle).
+        self.data_saver = data_saver
         self.blocked_hosts = blocked_hosts
         self.blocked_paths = blocked_paths
         self.allow_suffixes = set(allow_suffixes or set())
         self.enabled = True
         # Per-site allow-list (suffix-based) toggled from the UI
         self.site_allow_suffixes: set[str] = set()
+        # Optional first-party page (page_key) -> blocked count since that
+        # page's main-frame request (set to {} to enable; used by headless.py
+        # for per-page reports)
+        self.blocked_by_first_party: dict[str, int] | None = None
 
     # --- small helpers ---
     @staticmethod
@@ -273,6 +286,25 @@ class TinyAdblockInterceptor(QWebEngineUrlRequestInterceptor):
                 return True
         return False
 
+    @staticmethod
+    def page_key(url) -> str:
+        """Key of a first-party page for blocked_by_first_party: URL sans #fragment."""
+        try:
+            return url.toString().split("#", 1)[0]
+        except Exception:
+            return ""
+
+    def _count_block(self, info):
+        """Attribute a blocked request to its first-party page, if tracking."""
+        counts = self.blocked_by_first_party
+        if counts is None:
+            return
+        try:
+            fp = self.page_key(info.firstPartyUrl())
+        except Exception:
+            fp = ""
+        counts[fp] = counts.get(fp, 0) + 1
+
     @staticmethod
     def _rt(info, name, default=None):
         """
@@ -284,25 +316,89 @@ class TinyAdblockInterceptor(QWebEngineUrlRequestInterceptor):
             enum = getattr(QWebEngineUrlRequestInfo, "ResourceType", None)
             return getattr(enum, name, default) if enum else default
 
+    def _saver_kind(self, rt, path: str):
+        """Data-saver class of a request (data_saver.MEDIA, ...) or None."""
+        if rt == self._rt(None, "ResourceTypeMedia", -10):
+            return "media"
+        if rt == self._rt(None, "ResourceTypeImage", -11):
+            return "image"
+        if rt == self._rt(None, "ResourceTypeFontResource", -13) or path.endswith(
+            (".woff", ".woff2", ".ttf", ".otf", ".eot")
+        ):
+            return "font"
+        if rt in (
+            self._rt(None, "ResourceTypePrefetch", -14),
+            self._rt(None, "ResourceTypeNavigationPreloadMainFrame", -15),
+            self._rt(None, "ResourceTypeNavigationPreloadSubFrame", -16),
+        ):
+            return "prefetch"
+        return None
+
+    def _data_saver_blocks(self, info, url, path: str) -> bool:
+        """Ask the data saver about a subresource; True if it was blocked."""
+        rt = info.resourceType()
+        try:
+            fp = (info.firstPartyUrl().host() or "").lower()
+        except Exception:
+            fp = ""
+        if rt == self._rt(info, "ResourceTypeMainFrame", 0):
+            self.data_saver.page_started((url.host() or "").lower())
+            return False
+        kind = self._saver_kind(rt, path)
+        if kind is None:
+            return False
+        if self.data_saver.decide(fp, kind, url.path() or "", url.query() or ""):
+            info.block(True)
+            return True
+        return False
+
     # --- main interception logic ---
     def interceptRequest(self, info: QWebEngineUrlRequestInfo):
         """
         Called by QWebEngine for each request.
 
         We:
+        - Rewrite http:// to https:// for hosts known to support HTTPS
+          (independent of the adblock toggle).
+        - Hold back heavy resources per the data saver's site policy
+          (also independent of the adblock toggle).
         - Never block when disabled.
         - Never block the main frame.
         - Never block stylesheets & fonts.
         - Apply domain + simple path matching for subresources.
         """
         try:
-            if not self.enabled:
-                return
-
+            METRICS.incr("adblock.requests")
             url = info.requestUrl()
             host = (url.host() or "").lower()
+
+            if (
+                self.upgrades is not None
+                and url.scheme() == "http"
+                and self.upgrades.lookup(host) == "https"
+            ):
+                secure = QtCore.QUrl(url)
+                secure.setScheme("https")
+                if secure.port() == 80:
+                    secure.setPort(-1)
+                info.redirect(secure)
+                METRICS.incr("hsts.upgraded")
+                return
+
             path = (url.path() or "").lower()
 
+            if self.blocked_by_first_party is not None and info.resourceType() == self._rt(
+                info, "ResourceTypeMainFrame", 0
+            ):
+                # This page is (re)loading: its blocked count starts over
+                self.blocked_by_first_party.pop(self.page_key(url), None)
+
+            if self.data_saver is not None and self._data_saver_blocks(info, url, path):
+                return
+
+            if not self.enabled:
+                return
+
             # Never block allow-listed CDNs or per-site allowed suffixes
             if self._is_allowed_by_suffix(host):
                 return
@@ -325,12 +421,16 @@ class TinyAdblockInterceptor(QWebEngineUrlRequestInterceptor):
             # Host-level block for subresources only
             if self._host_in(self.blocked_hosts, host):
                 info.block(True)
+                METRICS.incr("adblock.blocked_host")
+                self._count_block(info)
                 return
 
             # Light path hints
             for needle in self.blocked_paths:
                 if needle in path:
                     info.block(True)
+                    METRICS.incr("adblock.blocked_path")
+                    self._count_block(info)
                     return
         except Exception:
             # Fail open on any unexpected error.
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+bandwidth.py — Global download rate limit (token bucket).
+
+Responsibilities:
+- One process-wide BandwidthLimiter (LIMITER) that every download draws
+  from before it reads from its reply. The cap is a base rate plus
+  optional time-of-day windows (download_rate_kbps /
+  download_rate_schedule in ~/.runit_qt_config.json), so page loads keep
+  some of the link.
+- Pace by not reading: a transfer whose credit is used up stops draining
+  its reply and registers a wake-up. Qt's bounded read buffer then fills
+  and TCP flow control slows the sender; nothing sleeps.
+- Share the refill between waiting transfers by priority weight
+  (High 4 : Normal 2 : Low 1), so a high-priority download gets most of
+  the capped rate while others still trickle.
+- Measure what was actually consumed (actual_bps) next to the configured
+  limit, for the download panel and runit://perf.
+
+Imports only QtCore (like download.py).
+"""
+
+import time
+
+from collections import deque
+
+try:
+    from PyQt6 import QtCore
+except ImportError:
+    from PyQt5 import QtCore
+
+from config import DOWNLOAD_RATE_KBPS, DOWNLOAD_RATE_SCHEDULE
+from metrics import METRICS
+
+# Refill interval while somebody is waiting for credit
+TICK_MS = 25
+# Credit one transfer may bank (seconds of the current rate), and a floor
+BURST_S = 0.25
+MIN_BURST = 64 * 1024
+# Window for the measured rate, kept as per-slot byte totals
+ACTUAL_WINDOW_S = 2.0
+ACTUAL_SLOT_S = 0.1
+# Share of the refill per priority (0 = High, 1 = Normal, 2 = Low)
+PRIORITY_WEIGHTS = {0: 4, 1: 2, 2: 1}
+
+
+def _minutes(hhmm: str) -> int:
+    h, _, m = str(hhmm).strip().partition(":")
+    return (int(h) % 24) * 60 + int(m or 0)
+
+
+def parse_schedule(entries) -> list[tuple[int, int, int]]:
+    """
+    [["08:00", "18:00", 2048], ...] -> [(start_min, end_min, bytes_per_s)].
+    A window may wrap midnight ("22:00" - "06:00"). Bad entries are skipped.
+    """
+    out = []
+    for e in entries or ():
+        try:
+            start, end, kbps = e
+            out.append((_minutes(start), _minutes(end), max(0, int(kbps)) * 1024))
+        except Exception:
+            continue
+    return out
+
+
+def _in_window(minute: int, start: int, end: int) -> bool:
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+class BandwidthLimiter(QtCore.QObject):
+    """
+    Token bucket with per-transfer credit. Transfers are any objects with a
+    'priority' attribute; call order per read is allowance() -> read at
+    most that much -> consume(), and wait() when the allowance is 0.
+    """
+
+    limitChanged = QtCore.pyqtSignal(object)   # bytes/s, 0 = unlimited
+
+    def __init__(self, base_kbps: int = DOWNLOAD_RATE_KBPS, schedule=DOWNLOAD_RATE_SCHEDULE):
+        super().__init__()
+        self.base_bps = max(0, int(base_kbps)) * 1024
+        self.schedule = parse_schedule(schedule)
+        self._credit: dict = {}
+        self._waiting: dict = {}      # transfer -> wake callback
+        self._timer = None
+        self._last_refill = time.monotonic()
+        self._last_limit = None
+        # [slot number, bytes] per ACTUAL_SLOT_S; fixed size however many reads
+        self._consumed = deque(maxlen=int(ACTUAL_WINDOW_S / ACTUAL_SLOT_S) + 1)
+        self.total_bytes = 0
+
+    # ---------- configuration ----------
+    def configure(self, base_kbps=None, schedule=None):
+        if base_kbps is not None:
+            self.base_bps = max(0, int(base_kbps)) * 1024
+        if schedule is not None:
+            self.schedule = parse_schedule(schedule)
+        self._check_limit()
+        # Waiters may be free to go now
+        self._ensure_timer()
+
+    def limit_bps(self, when: float | None = None) -> int:
+        """Cap in effect at 'when' (epoch seconds, default now); 0 = none."""
+        if self.schedule:
+            lt = time.localtime(when)
+            minute = lt.tm_hour * 60 + lt.tm_min
+            for start, end, bps in self.schedule:
+                if _in_window(minute, start, end):
+                    return bps
+        return self.base_bps
+
+    def active_window(self) -> tuple[int, int] | None:
+        """(start_min, end_min) of the schedule window in effect, if any."""
+        lt = time.localtime()
+        minute = lt.tm_hour * 60 + lt.tm_min
+        for start, end, _bps in self.schedule:
+            if _in_window(minute, start, end):
+                return start, end
+        return None
+
+    def _check_limit(self) -> int:
+        bps = self.limit_bps()
+        if bps != self._last_limit:
+            self._last_limit = bps
+            METRICS.set("download.rate_limit_bps", bps)
+            self.limitChanged.emit(bps)
+        return bps
+
+    # ---------- transfers ----------
+    def allowance(self, t) -> int | None:
+        """Bytes 't' may read now; None when no cap is in effect."""
+        if not self._check_limit():
+            return None
+        return max(0, int(self._credit.get(t, 0)))
+
+    def consume(self, t, n: int):
+        """Record 'n' bytes read by 't' (also when unlimited, for actual_bps)."""
+        if n <= 0:
+            return
+        slot = int(time.monotonic() / ACTUAL_SLOT_S)
+        d = self._consumed
+        if d and d[-1][0] == slot:
+            d[-1][1] += n
+        else:
+            d.append([slot, n])
+        self.total_bytes += n
+        if self._last_limit:
+            # May go negative for engine downloads, which report after the fact
+            self._credit[t] = self._credit.get(t, 0) - n
+
+    def wait(self, t, wake):
+        """Call wake() once 't' has credit again."""
+        self._waiting[t] = wake
+        self._ensure_timer()
+
+    def forget(self, t):
+        self._waiting.pop(t, None)
+        self._credit.pop(t, None)
+
+    def _ensure_timer(self):
+        if not self._waiting:
+            return
+        if self._timer is None:
+            self._timer = QtCore.QTimer(self)
+            self._timer.timeout.connect(self._tick)
+        if not self._timer.isActive():
+            self._last_refill = time.monotonic()
+            self._timer.start(TICK_MS)
+
+    def _tick(self):
+        now = time.monotonic()
+        dt = now - self._last_refill
+        self._last_refill = now
+        rate = self._check_limit()
+        waiting = list(self._waiting.items())
+        if not waiting:
+            self._timer.stop()
+            return
+        if rate:
+            # Refill only those waiting, weighted by priority
+            burst = max(MIN_BURST, rate * BURST_S)
+            weights = {t: PRIORITY_WEIGHTS.get(getattr(t, "priority", 1), 1) for t, _cb in waiting}
+            total_w = float(sum(weights.values()))
+            for t, _cb in waiting:
+                c = self._credit.get(t, 0) + rate * dt * weights[t] / total_w
+                self._credit[t] = min(c, burst)
+        for t, cb in waiting:
+            if not rate or self._credit.get(t, 0) > 0:
+                self._waiting.pop(t, None)
+                try:
+                    cb()
+                except Exception:
+                    pass
+        if not self._waiting:
+            self._timer.stop()
+
+    # ---------- measurement ----------
+    def actual_bps(self) -> float:
+        """Bytes/s consumed by all downloads over the last ACTUAL_WINDOW_S."""
+        oldest = int(time.monotonic() / ACTUAL_SLOT_S) - int(ACTUAL_WINDOW_S / ACTUAL_SLOT_S)
+        return sum(n for slot, n in self._consumed if slot > oldest) / ACTUAL_WINDOW_S
+
+    def stats(self) -> dict:
+        return {
+            "limit_bps": self.limit_bps(),
+            "actual_bps": int(self.actual_bps()),
+            "waiting": len(self._waiting),
+            "total_bytes": self.total_bytes,
+        }
+
+
+LIMITER = BandwidthLimiter()
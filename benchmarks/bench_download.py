@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_download.py — Download path benchmark suite (comparable JSON results).
+
+Starts benchmarks/local_server.py in its own process and runs each scenario
+in a fresh child process (so peak RSS and syscall counts belong to that
+scenario alone), driving download.DownloadTransfer, the UI-free core behind
+DownloadDialog and the download panel, on a QCoreApplication:
+- fixed:          plain 200 with Content-Length
+- chunked:        Transfer-Encoding: chunked, size unknown up front
+- slow_drip:      2 MiB trickled in 4 KiB writes at 512 KiB/s
+- redirects:      a chain of 3 redirects before the file
+- range_segments: Range-capable server, SegmentedTransfer with 4 connections
+- resume:         half the file already in '.part' (Range + If-Range)
+- dropped:        connection dropped every 25% of the file; retries resume
+- server_errors:  two 503 answers before the body
+- not_found:      404; must fail cleanly
+
+Per scenario (median over --runs):
+- mb_s:             bytes fetched / wall time
+- cpu_ms:           CPU of the whole process (GUI + writer thread)
+- gui_cpu_ms:       CPU spent on the GUI thread, and gui_busy_pct of wall time
+- peak_rss_kb:      VmHWM at the end; rss_growth_kb above the RSS before start
+- write_syscalls / read_syscalls: from /proc/self/io (Linux; -1 elsewhere)
+- ok:               downloaded digest matches (or failed as expected)
+
+--output writes the report; --compare OLD.json adds per-metric ratios and
+lists regressions beyond --tolerance (exit status 2 if there are any, 1 if a
+scenario failed).
+
+Usage:
+  python3 benchmarks/bench_download.py [--size-mb 64] [--runs 3]
+          [--scenarios fixed,chunked,...] [--output new.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_server import spawn_server, expected_sha256  # noqa: E402
+
+DRIP_BYTES = 2 * 1024 * 1024
+
+# name -> (url path template, query, options)
+SCENARIOS = {
+    "fixed": ("/file/{name}", "", {}),
+    "chunked": ("/file/{name}", "&chunked=1", {}),
+    "slow_drip": ("/file/{name}", f"&rate={512 * 1024}&step=4096", {"size": DRIP_BYTES}),
+    "redirects": ("/redirect/3/file/{name}", "", {}),
+    "range_segments": ("/file/{name}", "", {"segments": 4}),
+    "resume": ("/file/{name}", "", {"partial": True}),
+    "dropped": ("/file/{name}", "&drop_after={quarter}", {}),
+    "server_errors": ("/file/{name}", "&fail=2", {}),
+    "not_found": ("/missing/{name}", "", {"expect_fail": True}),
+}
+
+# Metric -> True if bigger is better (for --compare)
+METRICS_COMPARED = {
+    "mb_s": True,
+    "cpu_ms": False,
+    "gui_cpu_ms": False,
+    "rss_growth_kb": False,
+    "write_syscalls": False,
+}
+
+
+def _proc_io() -> dict:
+    """syscr / syscw / rchar / wchar of this process, or {} if unavailable."""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            return {k: int(v) for k, v in (ln.split(":") for ln in f)}
+    except Exception:
+        return {}
+
+
+def _status_kb(field: str) -> int:
+    from metrics import proc_status_kb
+
+    kb = proc_status_kb(os.getpid(), field)
+    if kb < 0 and field == "VmHWM":
+        try:
+            import resource
+
+            kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform == "darwin":
+                kb //= 1024
+        except Exception:
+            pass
+    return kb
+
+
+# ---------- child: one scenario ----------
+def run_child(name: str, base: str, size: int, directory: str) -> dict:
+    import download
+    from download import DownloadTransfer, QtCore, write_resume_state
+    from local_server import content
+
+    path_tpl, query, opts = SCENARIOS[name]
+    size = opts.get("size", size)
+    fname = f"{name}.bin"
+    url = base + path_tpl.format(name=fname) + f"?size={size}" + query.format(quarter=size // 4)
+    path = os.path.join(directory, fname)
+
+    download.VERBOSE = False
+    download.CHECKSUM_DISCOVERY = False
+    download.RETRY_BASE_S = 0.05
+    app = QtCore.QCoreApplication(sys.argv[:1])  # noqa: F841
+
+    if opts.get("partial"):
+        with open(path + ".part", "wb") as f:
+            f.write(content(0, size // 2))
+        write_resume_state(path + ".part", {
+            "url": url, "etag": f'"v1-{size}"', "last_modified": "",
+            "bytes": size // 2, "total": size,
+        })
+
+    if opts.get("segments"):
+        from segmented_download import SegmentedTransfer
+
+        t = SegmentedTransfer(url, path, segments=opts["segments"])
+    else:
+        t = DownloadTransfer(url, path)
+    loop = QtCore.QEventLoop()
+    t.finished.connect(lambda _p: loop.quit())
+    t.failed.connect(lambda _m: loop.quit())
+    QtCore.QTimer.singleShot(300 * 1000, loop.quit)
+
+    rss0 = _status_kb("VmRSS")
+    io0 = _proc_io()
+    cpu0, gui0, t0 = time.process_time(), time.thread_time(), time.perf_counter()
+    t.start()
+    if t.state == t.RUNNING:
+        loop.exec() if hasattr(loop, "exec") else loop.exec_()
+    wall = max(0.001, time.perf_counter() - t0)
+    cpu, gui = time.process_time() - cpu0, time.thread_time() - gui0
+    io1 = _proc_io()
+    download.wait_all()
+
+    if opts.get("expect_fail"):
+        ok = t.state == t.FAILED and not os.path.exists(path)
+    else:
+        ok = t.state == t.DONE and t.digests.get("sha256") == expected_sha256(size)
+    fetched = max(0, t.received - t.resumed_from)
+    peak = _status_kb("VmHWM")
+    return {
+        "scenario": name,
+        "ok": ok,
+        "state": t.state,
+        "error": t.error,
+        "bytes": t.received,
+        "fetched": fetched,
+        "wall_s": round(wall, 3),
+        "mb_s": round(fetched / wall / 1e6, 2),
+        "cpu_ms": round(cpu * 1000, 1),
+        "gui_cpu_ms": round(gui * 1000, 1),
+        "gui_busy_pct": round(100 * gui / wall, 1),
+        "peak_rss_kb": peak,
+        "rss_growth_kb": peak - rss0 if peak >= 0 and rss0 >= 0 else -1,
+        "write_syscalls": io1.get("syscw", 0) - io0.get("syscw", 0) if io0 else -1,
+        "read_syscalls": io1.get("syscr", 0) - io0.get("syscr", 0) if io0 else -1,
+    }
+
+
+# ---------- parent: suite ----------
+def _median(vals):
+    s = sorted(vals)
+    return s[len(s) // 2] if s else None
+
+
+def _summarise(runs: list[dict]) -> dict:
+    out = {"ok": all(r.get("ok") for r in runs), "runs": len(runs)}
+    for k, v in runs[0].items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[k] = _median([r[k] for r in runs if k in r])
+    errors = sorted({r.get("error") for r in runs if r.get("error")})
+    if errors:
+        out["errors"] = errors
+    return out
+
+
+def _environment() -> dict:
+    env = {"python": platform.python_version(), "platform": platform.platform()}
+    try:
+        from download import QtCore
+
+        env["qt"] = QtCore.QT_VERSION_STR
+        env["pyqt"] = QtCore.PYQT_VERSION_STR
+    except Exception:
+        pass
+    try:
+        env["git"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5,
+        ).stdout.strip()
+    except Exception:
+        pass
+    return env
+
+
+def compare(new: dict, old: dict, tolerance: float) -> dict:
+    """Per scenario and metric: old, new, ratio; regressions beyond 'tolerance'."""
+    table, regressions = {}, []
+    for name, cur in new["scenarios"].items():
+        prev = old.get("scenarios", {}).get(name)
+        if not prev:
+            continue
+        row = {}
+        for metric, higher_better in METRICS_COMPARED.items():
+            a, b = prev.get(metric), cur.get(metric)
+            if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or a <= 0 or b < 0:
+                continue
+            ratio = round(b / a, 3)
+            row[metric] = {"old": a, "new": b, "ratio": ratio}
+            worse = ratio < 1 - tolerance if higher_better else ratio > 1 + tolerance
+            if worse:
+                regressions.append(f"{name}.{metric}: {a} -> {b}")
+        table[name] = row
+    return {"tolerance": tolerance, "table": table, "regressions": regressions}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--size-mb", type=int, default=64)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--output", help="write the JSON report here (default: stdout)")
+    ap.add_argument("--compare", help="earlier report to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.15,
+                    help="relative change that counts as a regression (default 0.15)")
+    # Internal: run one scenario in this process and print its result
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--base", help=argparse.SUPPRESS)
+    ap.add_argument("--dir", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.base, size, args.dir)), flush=True)
+        return
+
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    proc, base = spawn_server()
+    results: dict = {}
+    try:
+        for i in range(args.runs):
+            for name in names:
+                with tempfile.TemporaryDirectory(prefix="runit-benchdl-") as tmp:
+                    out = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--child", name,
+                         "--base", base, "--dir", tmp, "--size-mb", str(args.size_mb)],
+                        capture_output=True, text=True,
+                    )
+                try:
+                    r = json.loads(out.stdout.strip().splitlines()[-1])
+                except Exception:
+                    r = {"scenario": name, "ok": False,
+                         "error": (out.stderr.strip().splitlines() or ["no output"])[-1]}
+                results.setdefault(name, []).append(r)
+                print(f"[{i + 1}/{args.runs}] {name}: "
+                      f"{'ok' if r.get('ok') else 'FAILED'} {r.get('mb_s', '-')} MB/s",
+                      file=sys.stderr, flush=True)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    report = {
+        "benchmark": "download",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "size_mb": args.size_mb,
+        "runs": args.runs,
+        "environment": _environment(),
+        "scenarios": {name: _summarise(rs) for name, rs in results.items()},
+    }
+    status = 0 if all(s["ok"] for s in report["scenarios"].values()) else 1
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+        if report["comparison"]["regressions"] and status == 0:
+            status = 2
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
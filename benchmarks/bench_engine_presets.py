@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_engine_presets.py — Memory vs. load-time trade-off of engine presets.
+
+For every preset in config.ENGINE_PRESETS, starts the browser on the
+offscreen QPA with a set of local fixture pages (one tab each), waits for
+the first loadFinished, and records:
+- first_load_ms: from the --profile-startup report
+- peak_tree_rss_kb: peak summed RSS of the browser and all its
+  QtWebEngineProcess children, sampled from /proc every 50 ms
+
+Results are printed as JSON (Linux only, because of /proc sampling).
+
+Usage:
+  python3 benchmarks/bench_engine_presets.py [--runs N] [--tabs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import ENGINE_PRESETS  # noqa: E402
+from metrics import proc_status_kb  # noqa: E402
+from bench_startup import MAIN, _prepare_home  # noqa: E402
+
+
+def _fixture(home: str, i: int) -> str:
+    """A page with some layout and script work, no network."""
+    rows = "".join(
+        f"<tr><td>{r}</td><td>{'x' * (r % 40)}</td><td><b>{r * i}</b></td></tr>"
+        for r in range(2000)
+    )
+    script = (
+        "<script>var a=[];for(var k=0;k<200000;k++){a.push({k:k,s:'v'+k})}"
+        "document.title='fixture '+a.length;</script>"
+    )
+    path = os.path.join(home, f"fixture{i}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<!doctype html><html><body><table>{rows}</table>{script}</body></html>")
+    return path
+
+
+def _children(pid: int) -> list[int]:
+    out = []
+    for d in os.listdir("/proc"):
+        if not d.isdigit():
+            continue
+        try:
+            with open(f"/proc/{d}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if ppid == pid:
+                out.append(int(d))
+        except Exception:
+            pass
+    return out
+
+
+def _tree_rss_kb(root: int) -> int:
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        rss = proc_status_kb(pid)
+        if rss > 0:
+            total += rss
+        stack.extend(_children(pid))
+    return total
+
+
+def run_preset(preset: str, home: str, fixtures: list[str], timeout: float) -> dict:
+    report = os.path.join(home, f"report-{preset}.json")
+    if os.path.exists(report):
+        os.remove(report)
+    env = dict(os.environ, HOME=home, QT_QPA_PLATFORM="offscreen", RUNIT_VERBOSE="0")
+    proc = subprocess.Popen(
+        [sys.executable, MAIN, f"--engine-preset={preset}", f"--profile-startup={report}",
+         "--quit-after-startup", *("file://" + p for p in fixtures)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    peak = 0
+    deadline = time.monotonic() + timeout
+    while proc.poll() is None and time.monotonic() < deadline:
+        peak = max(peak, _tree_rss_kb(proc.pid))
+        time.sleep(0.05)
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+    try:
+        with open(report, "r", encoding="utf-8") as f:
+            phases = json.load(f).get("phases_ms", {})
+    except Exception:
+        phases = {}
+    return {"first_load_ms": phases.get("first_load_finished"), "peak_tree_rss_kb": peak}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--tabs", type=int, default=4)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="runit-bench-") as home:
+        _prepare_home(home)
+        fixtures = [_fixture(home, i) for i in range(args.tabs)]
+        for preset in ENGINE_PRESETS:
+            runs = [run_preset(preset, home, fixtures, args.timeout) for _ in range(args.runs)]
+            loads = [r["first_load_ms"] for r in runs if r["first_load_ms"] is not None]
+            results[preset] = {
+                "flags": ENGINE_PRESETS[preset].chromium_flags(headless=True),
+                "first_load_ms_median": statistics.median(loads) if loads else None,
+                "peak_tree_rss_kb_median": statistics.median(r["peak_tree_rss_kb"] for r in runs),
+                "runs": runs,
+            }
+            print(f"{preset:11} load={results[preset]['first_load_ms_median']} ms "
+                  f"rss={results[preset]['peak_tree_rss_kb_median']} kB", flush=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_io_cpu.py — CPU cost per GB downloaded, fixed vs. adaptive read sizes.
+
+Starts benchmarks/local_server.py in a separate process (so its CPU isn't
+counted) and downloads one file over loopback with download.DownloadTransfer,
+once with the old fixed 64 KiB reads / 256 KiB read buffer
+(download.ADAPTIVE_IO = False) and once with reads and buffer sized from the
+smoothed speed. Reports per mode:
+- cpu_s_per_gb: CPU seconds of this process (GUI + writer thread) per GiB
+- gui_cpu_s_per_gb: CPU seconds of the GUI thread alone per GiB
+- mb_s: throughput
+- chunk_kb / readbuf_kb: read size and read buffer at the end
+
+--rate-mbps throttles the server, to compare on a slower link.
+
+Usage:
+  python3 benchmarks/bench_io_cpu.py [--size-mb 1024] [--runs 3] [--rate-mbps 0]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import download  # noqa: E402
+from download import DownloadTransfer, QtCore  # noqa: E402
+from local_server import spawn_server  # noqa: E402
+
+GIB = 1024 ** 3
+
+
+def run_once(url: str, path: str, adaptive: bool, size: int) -> dict:
+    download.ADAPTIVE_IO = adaptive
+    t = DownloadTransfer(url, path)
+    loop = QtCore.QEventLoop()
+    t.finished.connect(lambda _p: loop.quit())
+    t.failed.connect(lambda _m: loop.quit())
+
+    cpu0, gui0, t0 = time.process_time(), time.thread_time(), time.perf_counter()
+    t.start()
+    loop.exec() if hasattr(loop, "exec") else loop.exec_()
+    wall = time.perf_counter() - t0
+    cpu, gui = time.process_time() - cpu0, time.thread_time() - gui0
+
+    ok = t.state == t.DONE
+    if ok:
+        os.remove(t.final_path)
+    return {
+        "mode": "adaptive" if adaptive else "fixed",
+        "ok": ok,
+        "error": t.error,
+        "mb_s": round(size / wall / 1e6, 1),
+        "cpu_s_per_gb": round(cpu * GIB / size, 3),
+        "gui_cpu_s_per_gb": round(gui * GIB / size, 3),
+        "chunk_kb": t.chunk // 1024,
+        "readbuf_kb": t.readbuf // 1024,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--size-mb", type=int, default=1024)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--rate-mbps", type=float, default=0.0,
+                    help="server rate limit in MB/s (0 = unthrottled)")
+    args = ap.parse_args()
+    size = args.size_mb * 1024 * 1024
+    query = f"size={size}"
+    if args.rate_mbps > 0:
+        query += f"&rate={int(args.rate_mbps * 1e6)}"
+
+    download.VERBOSE = False
+    download.CHECKSUM_DISCOVERY = False
+    app = QtCore.QCoreApplication(sys.argv)  # noqa: F841
+    proc, base = spawn_server()
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="runit-iocpu-") as tmp:
+            for i in range(args.runs):
+                for adaptive in (False, True):
+                    url = f"{base}/file/c{i}.bin?{query}"
+                    path = os.path.join(tmp, f"c{i}-{int(adaptive)}.bin")
+                    results.append(run_once(url, path, adaptive, size))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    summary = {}
+    for mode in ("fixed", "adaptive"):
+        rs = [r for r in results if r["mode"] == mode and r["ok"]]
+        if rs:
+            summary[mode] = {
+                k: sorted(r[k] for r in rs)[len(rs) // 2]
+                for k in ("mb_s", "cpu_s_per_gb", "gui_cpu_s_per_gb")
+            }
+    print(json.dumps({"size_mb": args.size_mb, "rate_mbps": args.rate_mbps,
+                      "median": summary, "runs": results}, indent=2))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
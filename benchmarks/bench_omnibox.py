@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_omnibox.py — Per-keystroke latency guard for the URL bar index.
+
+Builds omnibox.PrefixIndex over N synthetic history entries (default 100k),
+then replays a set of queries one keystroke at a time, exactly like typing
+into the URL bar. Prints latency percentiles as JSON and exits non-zero if
+the p99 keystroke exceeds the budget (default 1 ms).
+
+Usage:
+  python3 benchmarks/bench_omnibox.py [--entries N] [--budget-ms MS]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from omnibox import PrefixIndex  # noqa: E402
+
+WORDS = (
+    "news weather python linux qt browser video music docs wiki search mail "
+    "map shop cloud game sport travel recipe code github forum blog review "
+    "the and for with how what release download install guide tutorial api"
+).split()
+TLDS = ["com", "org", "net", "io", "de", "fi", "co.uk"]
+
+QUERIES = [
+    "g", "github.com/post", "python docs", "the linux", "wiki qt",
+    "news", "www.site12", "https://site4", "tutorial python install", "zzz",
+]
+
+
+def synth_rows(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    now = time.time()
+    rows = []
+    for i in range(n):
+        host = f"{rnd.choice(WORDS)}{i % 9973}.{rnd.choice(TLDS)}"
+        if i % 3 == 0:
+            host = "www." + host
+        path = "/".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 3)))
+        title = " ".join(rnd.choice(WORDS).capitalize() for _ in range(rnd.randint(2, 7)))
+        rows.append((
+            f"https://{host}/{path}",
+            title,
+            rnd.randint(1, 60),
+            rnd.randint(0, 5),
+            now - rnd.random() * 120 * 86400,
+        ))
+    rows.append(("https://github.com/postman721/RunIT-QT_QWebengine", "RunIT-QT", 40, 10, now))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--entries", type=int, default=100_000)
+    ap.add_argument("--budget-ms", type=float, default=1.0)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    rows = synth_rows(args.entries)
+    t0 = time.perf_counter()
+    idx = PrefixIndex(rows)
+    build_s = time.perf_counter() - t0
+
+    gc.collect()
+    gc.disable()
+    lat = []
+    try:
+        for _ in range(args.rounds):
+            for q in QUERIES:
+                idx.query("")
+                for k in range(1, len(q) + 1):
+                    t = time.perf_counter()
+                    idx.query(q[:k])
+                    lat.append((time.perf_counter() - t) * 1000.0)
+    finally:
+        gc.enable()
+
+    lat.sort()
+    pick = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))]  # noqa: E731
+    result = {
+        "entries": len(idx),
+        "build_s": round(build_s, 3),
+        "keystrokes": len(lat),
+        "p50_ms": round(pick(0.50), 4),
+        "p99_ms": round(pick(0.99), 4),
+        "max_ms": round(lat[-1], 4),
+        "budget_ms": args.budget_ms,
+    }
+    result["ok"] = result["p99_ms"] < args.budget_ms
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
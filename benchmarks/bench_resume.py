@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_resume.py — Resume / retry behaviour of download.DownloadTransfer.
+
+Runs transfers against benchmarks/local_server.py and reports, per scenario,
+wall time, bytes the server had to send (wire_ratio = sent / file size),
+retries, and whether the saved file matches the expected SHA-256:
+- clean:          plain download
+- dropped:        connection dropped every 25% of the file; retries resume
+- server_errors:  two 503 answers before the body; retried with backoff
+- no_range:       half-done .part, but the server ignores Range: restart from zero
+- stale_partial:  leftover .part from an older ETag; If-Range forces a full body
+- kept_partial:   half the file already in .part from an earlier run
+- bad_checksum:   the published '.sha256' doesn't match; must fail and
+                  leave no file behind
+
+Every download also picks up the server's '.sha256' file, so 'verified'
+shows the streaming checksum matched (no second pass over the file).
+
+Exits non-zero if any scenario saves a wrong file.
+
+Usage:
+  python3 benchmarks/bench_resume.py [--size-mb N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import download  # noqa: E402
+from download import DownloadTransfer, QtCore, write_resume_state  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from local_server import start_server, expected_sha256  # noqa: E402
+from local_server import content as server_content  # noqa: E402
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def run_transfer(url: str, path: str, timeout_s: float = 120.0) -> DownloadTransfer:
+    t = DownloadTransfer(url, path)
+    loop = QtCore.QEventLoop()
+    t.finished.connect(lambda _p: loop.quit())
+    t.failed.connect(lambda _m: loop.quit())
+    QtCore.QTimer.singleShot(int(timeout_s * 1000), loop.quit)
+    t.start()
+    if t.state == t.RUNNING:
+        loop.exec() if hasattr(loop, "exec") else loop.exec_()
+    return t
+
+
+def scenario(srv, tmp: str, name: str, size: int, query: str = "", setup=None,
+             expect_fail: bool = False) -> dict:
+    path = os.path.join(tmp, f"{name}.bin")
+    if setup:
+        setup(path + ".part")
+    url = f"{srv.base_url}/file/{name}.bin?size={size}{query}"
+    srv.reset_stats()
+    retries0 = METRICS.counter("download.retries")
+    t0 = time.perf_counter()
+    t = run_transfer(url, path)
+    wall = time.perf_counter() - t0
+    sent = sum(s["bytes"] for s in srv.stats.values())
+    if expect_fail:
+        ok = t.state == t.FAILED and not os.path.exists(path) and not os.path.exists(path + ".part")
+    else:
+        ok = t.state == t.DONE and _sha256(t.final_path) == expected_sha256(size) and t.verified
+    return {
+        "scenario": name,
+        "ok": ok,
+        "state": t.state,
+        "wall_s": round(wall, 3),
+        "wire_ratio": round(sent / size, 3),
+        "requests": sum(s["requests"] for s in srv.stats.values()),
+        "retries": int(METRICS.counter("download.retries") - retries0),
+        "resumed_from": t.resumed_from,
+        "verified": t.verified,
+        "error": t.error,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--size-mb", type=int, default=32)
+    args = ap.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    # Quick backoff so the run stays short
+    download.RETRY_BASE_S = 0.05
+    download.VERBOSE = False
+
+    app = QtCore.QCoreApplication(sys.argv)  # noqa: F841
+    srv = start_server()
+    quarter = size // 4
+
+    def partial(name, query="", etag=None, data=None):
+        """Leave half a file plus its sidecar, as an interrupted run would."""
+        def setup(part):
+            with open(part, "wb") as f:
+                f.write(data if data is not None else server_content(0, size // 2))
+            write_resume_state(part, {
+                "url": f"{srv.base_url}/file/{name}.bin?size={size}{query}",
+                "etag": etag or f'"v1-{size}"', "last_modified": "",
+                "bytes": size // 2, "total": size,
+            })
+        return setup
+
+    with tempfile.TemporaryDirectory(prefix="runit-resume-") as tmp:
+        results = [
+            scenario(srv, tmp, "clean", size),
+            scenario(srv, tmp, "dropped", size, f"&drop_after={quarter}"),
+            scenario(srv, tmp, "server_errors", size, "&fail=2"),
+            scenario(srv, tmp, "no_range", size, "&norange=1",
+                     setup=partial("no_range", "&norange=1")),
+            scenario(srv, tmp, "stale_partial", size,
+                     setup=partial("stale_partial", etag='"v0-1"', data=b"\0" * (size // 2))),
+            scenario(srv, tmp, "kept_partial", size, setup=partial("kept_partial")),
+            scenario(srv, tmp, "bad_checksum", size, "&badsum=1", expect_fail=True),
+        ]
+    srv.shutdown()
+
+    print(json.dumps({"size_mb": args.size_mb, "results": results}, indent=2))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_segments.py — Throughput of segmented vs. single-stream downloads.
+
+Serves a file from benchmarks/local_server.py with a per-connection rate
+limit (to stand in for a high-latency link where one TCP stream can't fill
+the pipe) and random per-connection speed, then downloads it with
+segmented_download.SegmentedTransfer at several segment counts.
+
+For each count it reports MB/s, wall time, ranges opened, work-steal
+rebalances, bytes sent / file size, and whether the saved file matches the
+expected SHA-256 (exit status 1 if any does not).
+
+Usage:
+  python3 benchmarks/bench_segments.py [--size-mb N] [--rate-mbps N]
+                                       [--jitter F] [--latency-ms N]
+                                       [--segments 1,2,4,6]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import download  # noqa: E402
+from download import QtCore  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from segmented_download import SegmentedTransfer  # noqa: E402
+from local_server import start_server, expected_sha256  # noqa: E402
+from bench_resume import _sha256  # noqa: E402
+
+
+def run(url: str, path: str, segments: int, timeout_s: float = 600.0):
+    t = SegmentedTransfer(url, path, segments=segments)
+    loop = QtCore.QEventLoop()
+    t.finished.connect(lambda _p: loop.quit())
+    t.failed.connect(lambda _m: loop.quit())
+    QtCore.QTimer.singleShot(int(timeout_s * 1000), loop.quit)
+    t0 = time.perf_counter()
+    t.start()
+    if t.state == t.RUNNING:
+        loop.exec() if hasattr(loop, "exec") else loop.exec_()
+    return t, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--size-mb", type=int, default=64)
+    ap.add_argument("--rate-mbps", type=float, default=8.0,
+                    help="per-connection cap in MB/s (0 = unlimited)")
+    ap.add_argument("--jitter", type=float, default=0.5,
+                    help="per-connection speed spread (0..1)")
+    ap.add_argument("--latency-ms", type=int, default=50)
+    ap.add_argument("--segments", default="1,2,4,6")
+    args = ap.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    download.VERBOSE = False
+    app = QtCore.QCoreApplication(sys.argv)  # noqa: F841
+    srv = start_server()
+    want = expected_sha256(size)
+
+    query = f"size={size}&delay_ms={args.latency_ms}"
+    if args.rate_mbps > 0:
+        query += f"&rate={int(args.rate_mbps * 1e6)}&rate_jitter={args.jitter}"
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="runit-seg-") as tmp:
+        for n in [int(x) for x in args.segments.split(",") if x.strip()]:
+            srv.reset_stats()
+            opened0 = METRICS.counter("download.segments_opened")
+            steals0 = METRICS.counter("download.steals")
+            path = os.path.join(tmp, f"seg{n}.bin")
+            t, wall = run(f"{srv.base_url}/file/seg{n}.bin?{query}", path, n)
+            sent = sum(s["bytes"] for s in srv.stats.values())
+            ok = t.state == t.DONE and _sha256(t.final_path) == want
+            results.append({
+                "segments": n,
+                "ok": ok,
+                "mb_per_s": round(size / wall / 1e6, 2),
+                "wall_s": round(wall, 3),
+                "ranges_opened": int(METRICS.counter("download.segments_opened") - opened0),
+                "steals": int(METRICS.counter("download.steals") - steals0),
+                "wire_ratio": round(sent / size, 3),
+                "error": t.error,
+            })
+            if ok:
+                os.remove(t.final_path)
+    srv.shutdown()
+
+    print(json.dumps({
+        "size_mb": args.size_mb,
+        "rate_mbps_per_conn": args.rate_mbps,
+        "jitter": args.jitter,
+        "latency_ms": args.latency_ms,
+        "results": results,
+    }, indent=2))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_startup.py — Cold/warm startup benchmark on the offscreen QPA.
+
+Runs `main.py --profile-startup=... --quit-after-startup <fixture>` in a
+throw-away HOME (pre-seeded with a fresh adblock cache so no network is
+touched), and appends one JSON line per invocation to a history file so
+startup time can be tracked over time.
+
+The first run in a fresh HOME is reported as "cold"; the following runs
+reuse that HOME and are reported as "warm".
+
+Usage:
+  python3 benchmarks/bench_startup.py [--runs N] [--history FILE]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+FIXTURE_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>startup fixture</title></head>
+<body><h1>RunIT-QT startup fixture</h1><p>Local page, no network.</p></body></html>
+"""
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def _prepare_home(home: str) -> str:
+    """Seed HOME with a fresh (empty) adblock cache and a fixture page."""
+    with open(os.path.join(home, ".runit_qt_blockcache.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "last_update": datetime.now(timezone.utc).isoformat(),
+                "hosts": [],
+                "paths": [],
+            },
+            f,
+        )
+    fixture = os.path.join(home, "fixture.html")
+    with open(fixture, "w", encoding="utf-8") as f:
+        f.write(FIXTURE_HTML)
+    return fixture
+
+
+def run_once(home: str, fixture: str, timeout: float) -> dict:
+    """Run the browser once and return its startup report (+ wall time)."""
+    report = os.path.join(home, "startup_report.json")
+    if os.path.exists(report):
+        os.remove(report)
+    env = dict(os.environ)
+    env.update(
+        HOME=home,
+        QT_QPA_PLATFORM="offscreen",
+        RUNIT_VERBOSE="0",
+    )
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, MAIN, f"--profile-startup={report}", "--quit-after-startup",
+         "file://" + fixture],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=timeout,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    try:
+        with open(report, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        data = {"error": f"no report (exit code {proc.returncode})"}
+    data["process_wall_ms"] = round(wall_ms, 3)
+    return data
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=5, help="warm runs after the cold one")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--history", default="bench_startup_history.jsonl")
+    args = ap.parse_args()
+
+    rev = _git_rev()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="runit-bench-") as home:
+        fixture = _prepare_home(home)
+        for i in range(args.runs + 1):
+            kind = "cold" if i == 0 else "warm"
+            r = run_once(home, fixture, args.timeout)
+            r.update(kind=kind, rev=rev, at=datetime.now(timezone.utc).isoformat())
+            results.append(r)
+            print(f"{kind:4} total={r.get('total_ms', 'n/a')} ms "
+                  f"wall={r['process_wall_ms']:.1f} ms", flush=True)
+
+    with open(args.history, "a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+
+    warm = [r["total_ms"] for r in results[1:] if "total_ms" in r]
+    summary = {
+        "rev": rev,
+        "cold_ms": results[0].get("total_ms"),
+        "warm_median_ms": statistics.median(warm) if warm else None,
+        "history": os.path.abspath(args.history),
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_writer.py — GUI-thread stalls while downloading, with and without the
+background writer (download_writer.py).
+
+Downloads one file from benchmarks/local_server.py over loopback (well above
+gigabit speed) while a 1 ms precise timer runs on the event loop; every
+late tick is a stall the UI would have felt. Runs the transfer with file
+I/O inline on the GUI thread (download.WRITER_THREAD = False, the old
+behaviour) and on the writer thread, and reports per mode:
+- stall_max_ms / stall_p99_ms: worst and 99th percentile timer lateness
+- stalls_over_16ms: ticks late by more than a 60 Hz frame
+- finish_stall_ms: longest stall between the last byte and 'finished'
+  (trim + hash + fsync + rename)
+- mb_s: throughput
+
+Point --dir at a real disk: on tmpfs, write() and fsync() cost almost nothing.
+
+Usage:
+  python3 benchmarks/bench_writer.py [--size-mb 512] [--dir ~/Downloads] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import download  # noqa: E402
+from download import DownloadTransfer, QtCore  # noqa: E402
+from local_server import start_server  # noqa: E402
+
+TICK_MS = 1
+
+
+def _pct(vals, p: float) -> float:
+    if not vals:
+        return 0.0
+    s = sorted(vals)
+    return s[min(len(s) - 1, int(len(s) * p))]
+
+
+def run_once(url: str, path: str, threaded: bool, size: int) -> dict:
+    download.WRITER_THREAD = threaded
+    t = DownloadTransfer(url, path)
+    loop = QtCore.QEventLoop()
+    stalls = []
+    last = [time.perf_counter()]
+    body_done = [None]
+    finish_stall = [0.0]
+
+    def tick():
+        now = time.perf_counter()
+        late = (now - last[0]) * 1000 - TICK_MS
+        last[0] = now
+        if late > 0:
+            stalls.append(late)
+            if body_done[0] is not None:
+                finish_stall[0] = max(finish_stall[0], late)
+        if body_done[0] is None and t.received >= size:
+            body_done[0] = now
+
+    timer = QtCore.QTimer()
+    # Qt.PreciseTimer (Qt5) => Qt.TimerType.PreciseTimer (Qt6)
+    precise = getattr(QtCore.Qt, "PreciseTimer", None)
+    if precise is None:
+        precise = QtCore.Qt.TimerType.PreciseTimer
+    timer.setTimerType(precise)
+    timer.timeout.connect(tick)
+    timer.start(TICK_MS)
+
+    t.finished.connect(lambda _p: loop.quit())
+    t.failed.connect(lambda _m: loop.quit())
+    t0 = time.perf_counter()
+    t.start()
+    loop.exec() if hasattr(loop, "exec") else loop.exec_()
+    wall = time.perf_counter() - t0
+    timer.stop()
+    # The last tick before 'finished' may not have seen the final stall
+    if body_done[0] is not None:
+        finish_stall[0] = max(finish_stall[0], (time.perf_counter() - last[0]) * 1000 - TICK_MS)
+
+    ok = t.state == t.DONE
+    if ok:
+        os.remove(t.final_path)
+    return {
+        "mode": "writer_thread" if threaded else "inline",
+        "ok": ok,
+        "error": t.error,
+        "mb_s": round(size / wall / 1e6, 1),
+        "stall_max_ms": round(max(stalls, default=0.0), 2),
+        "stall_p99_ms": round(_pct(stalls, 0.99), 2),
+        "stalls_over_16ms": sum(1 for s in stalls if s > 16),
+        "finish_stall_ms": round(finish_stall[0], 2),
+        "sha256": t.digests.get("sha256", "")[:16],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--size-mb", type=int, default=512)
+    ap.add_argument("--dir", default="", help="target directory (default: a temp dir)")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    download.VERBOSE = False
+    download.CHECKSUM_DISCOVERY = False
+    app = QtCore.QCoreApplication(sys.argv)  # noqa: F841
+    srv = start_server()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="runit-writer-", dir=args.dir or None) as tmp:
+        for i in range(args.runs):
+            for threaded in (False, True):
+                url = f"{srv.base_url}/file/w{i}.bin?size={size}"
+                path = os.path.join(tmp, f"w{i}-{int(threaded)}.bin")
+                results.append(run_once(url, path, threaded, size))
+    srv.shutdown()
+
+    summary = {}
+    for mode in ("inline", "writer_thread"):
+        rs = [r for r in results if r["mode"] == mode and r["ok"]]
+        if rs:
+            summary[mode] = {
+                k: sorted(r[k] for r in rs)[len(rs) // 2]
+                for k in ("mb_s", "stall_max_ms", "stall_p99_ms", "stalls_over_16ms", "finish_stall_ms")
+            }
+    print(json.dumps({"size_mb": args.size_mb, "median": summary, "runs": results}, indent=2))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
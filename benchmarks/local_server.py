@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+local_server.py — Range-capable HTTP stand-in for download benchmarks.
+
+Serves deterministic pseudo-random bytes at /file/<name>, so clients can
+verify what they saved without keeping a copy. Supports single byte ranges
+(206 + Content-Range), a strong ETag, Last-Modified and Accept-Ranges.
+
+Query parameters shape the behaviour of each request:
+  size=N          body size in bytes (default 16 MiB)
+  etag=S          change the ETag (simulates a modified resource)
+  norange=1       ignore Range and always answer 200 with the full body
+  drop_after=N    close the connection after N body bytes (per response)
+  fail=K          answer 503 to the first K requests for this URL
+  rate=N          throttle to N bytes/s per connection
+  rate_jitter=F   give each connection a random rate in [rate*(1-F), rate]
+  delay_ms=N      wait before sending headers (simulates latency)
+  chunked=1       no Content-Length, Transfer-Encoding: chunked (full body, no ranges)
+  step=N          bytes per write (default 64 KiB; small + rate = slow drip)
+
+/redirect/<n>/file/<name>?... answers 302 to /redirect/<n-1>/... and finally
+to /file/<name>?... (a chain of n redirects).
+
+/file/<name>.sha256 answers with '<sha256>  <name>' for the same query
+(nosum=1: 404, badsum=1: a wrong digest), like a published checksum file.
+
+Stats per path (requests, body bytes sent, 206 answers) are available at
+/stats (JSON) and via server.stats when used in-process.
+
+Usage:
+  python3 benchmarks/local_server.py [--port 8765]
+  # or: from local_server import start_server; srv = start_server()
+  # or, out of process: proc, base_url = spawn_server()
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import random
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_SIZE = 16 * 1024 * 1024
+_BLOCK = random.Random(1234).randbytes(1024 * 1024)
+_MTIME = time.time() - 3600
+
+
+def content(offset: int, length: int) -> bytes:
+    """The bytes served at [offset, offset+length) of any file."""
+    out = bytearray()
+    pos = offset
+    end = offset + length
+    n = len(_BLOCK)
+    while pos < end:
+        i = pos % n
+        take = min(n - i, end - pos)
+        out += _BLOCK[i : i + take]
+        pos += take
+    return bytes(out)
+
+
+@functools.lru_cache(maxsize=16)
+def expected_sha256(size: int) -> str:
+    """SHA-256 of a complete file of 'size' bytes."""
+    h = hashlib.sha256()
+    pos = 0
+    while pos < size:
+        chunk = content(pos, min(len(_BLOCK), size - pos))
+        h.update(chunk)
+        pos += len(chunk)
+    return h.hexdigest()
+
+
+def _parse_range(value: str, size: int):
+    """'bytes=a-b' -> (start, end_inclusive) or None (ignored / invalid)."""
+    try:
+        unit, _, spec = value.partition("=")
+        if unit.strip() != "bytes" or "," in spec:
+            return None
+        a, _, b = spec.strip().partition("-")
+        if a == "":
+            n = int(b)
+            return max(0, size - n), size - 1
+        start = int(a)
+        end = int(b) if b else size - 1
+        return start, min(end, size - 1)
+    except Exception:
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_args):
+        pass
+
+    def _stat(self, path: str, key: str, n: int = 1):
+        with self.server.lock:
+            s = self.server.stats.setdefault(path, {"requests": 0, "bytes": 0, "partial": 0})
+            s[key] += n
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head: bool):
+        u = urlsplit(self.path)
+        if u.path == "/stats":
+            with self.server.lock:
+                body = json.dumps(self.server.stats).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if u.path.startswith("/redirect/"):
+            self._redirect(u)
+            return
+        if not u.path.startswith("/file/"):
+            self.send_error(404)
+            return
+
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        size = int(q.get("size", DEFAULT_SIZE))
+        if u.path.endswith(".sha256"):
+            self._serve_checksum(u.path, q, size)
+            return
+        etag = '"%s-%d"' % (q.get("etag", "v1"), size)
+        self._stat(self.path, "requests")
+
+        delay = int(q.get("delay_ms", 0))
+        if delay:
+            time.sleep(delay / 1000.0)
+
+        fail = int(q.get("fail", 0))
+        if fail:
+            with self.server.lock:
+                seen = self.server.fail_counts.get(self.path, 0)
+                self.server.fail_counts[self.path] = seen + 1
+            if seen < fail:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+
+        chunked = q.get("chunked") == "1"
+        start, end, status = 0, size - 1, 200
+        rng = self.headers.get("Range")
+        if rng and q.get("norange") != "1" and not chunked:
+            if_range = self.headers.get("If-Range")
+            if not if_range or if_range == etag or if_range == formatdate(_MTIME, usegmt=True):
+                r = _parse_range(rng, size)
+                if r is not None:
+                    if r[0] >= size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    start, end, status = r[0], r[1], 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges",
+                         "none" if q.get("norange") == "1" or chunked else "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(_MTIME, usegmt=True))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self._stat(self.path, "partial")
+        self.end_headers()
+        if head:
+            return
+
+        drop_after = int(q.get("drop_after", 0)) or None
+        rate = int(q.get("rate", 0)) or None
+        if rate and q.get("rate_jitter"):
+            rate = int(rate * (1.0 - random.random() * float(q["rate_jitter"]))) or 1
+        sent = 0
+        t0 = time.perf_counter()
+        pos = start
+        step = max(1, int(q.get("step", 64 * 1024)))
+        try:
+            while pos <= end:
+                n = min(step, end - pos + 1)
+                if drop_after is not None:
+                    n = min(n, drop_after - sent)
+                    if n <= 0:
+                        # Simulate a dropped connection mid-body
+                        self.close_connection = True
+                        self.connection.shutdown(socket.SHUT_RDWR)
+                        return
+                data = content(pos, n)
+                if chunked:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (n, data))
+                else:
+                    self.wfile.write(data)
+                pos += n
+                sent += n
+                self._stat(self.path, "bytes", n)
+                if rate:
+                    ahead = sent / rate - (time.perf_counter() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            self.close_connection = True
+
+    def _redirect(self, u):
+        self._stat(self.path, "requests")
+        try:
+            _, _, n, rest = u.path.split("/", 3)
+            n = int(n)
+        except ValueError:
+            self.send_error(404)
+            return
+        target = f"/redirect/{n - 1}/{rest}" if n > 1 else f"/{rest}"
+        if u.query:
+            target += "?" + u.query
+        self.send_response(302)
+        self.send_header("Location", target)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _serve_checksum(self, path: str, q: dict, size: int):
+        self._stat(self.path, "requests")
+        if q.get("nosum") == "1":
+            self.send_error(404)
+            return
+        digest = expected_sha256(size) if q.get("badsum") != "1" else "0" * 64
+        name = path[len("/file/"):-len(".sha256")]
+        body = f"{digest}  {name}\n".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr):
+        super().__init__(addr, _Handler)
+        self.lock = threading.Lock()
+        self.stats: dict = {}
+        self.fail_counts: dict = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+            self.fail_counts.clear()
+
+
+def start_server(port: int = 0, host: str = "127.0.0.1") -> LocalServer:
+    """Start a server on a background thread and return it (port 0 = any)."""
+    srv = LocalServer((host, port))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def spawn_server(host: str = "127.0.0.1"):
+    """
+    Run the server in a child process (so benchmarks don't count its CPU)
+    and return (process, base_url). Terminate the process when done.
+    """
+    s = socket.socket()
+    s.bind((host, 0))
+    port = s.getsockname()[1]
+    s.close()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port), "--host", host],
+        stdout=subprocess.PIPE, text=True,
+    )
+    proc.stdout.readline()  # "serving on ..."
+    return proc, f"http://{host}:{port}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--host", default="127.0.0.1")
+    args = ap.parse_args()
+    srv = LocalServer((args.host, args.port))
+    print(f"serving on {srv.base_url}/file/<name>?size=N", flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,9 @@ import os
 import re
 import sys
 import threading
+import time
 
+from collections import deque
 from pathlib import Path
 
 from qt_compat import (
@@ -38,12 +40,23 @@ from qt_compat import (
     QStatusBar,
     QSizePolicy,
     QMessageBox,
+    QCompleter,
+    QStringListModel,
     QWebEngineView,
-    QtNetwork,
     CURSOR,
+    _COMPLETION,
     vlog,
 )
-from config import APP_NAME, HOME_URL, FUTURE_QSS
+from config import (
+    APP_NAME,
+    HOME_URL,
+    NEWTAB_URL,
+    FUTURE_QSS,
+    SPARE_TAB_DELAY_MS,
+    DISK_CACHE_MB,
+    DATA_SAVER_DEFAULT,
+    load_user_config,
+)
 from adblocker import (
     TinyAdblockInterceptor,
     update_blocklist,
@@ -51,11 +64,35 @@ from adblocker import (
     ADBLOCK_ALLOW_SUFFIXES,
     CACHE_FILE,
 )
-from web_profile import build_lean_profile
+from web_profile import build_profile
 from web_page import SecurePage
+from page_timing import PageTimingStore, install_vitals_script
+from internal_pages import RunitSchemeHandler, perf_html, perf_json
+from metrics import METRICS, proc_status_kb
+from newtab import MostVisited, NewTabPage
+from history import HistoryStore
+from certs import CertificateCache
+from hsts import UpgradeTable
+from data_saver import DataSaver, LEVELS
+from startup_profile import STARTUP
+
+# Not needed for the first paint, imported on first use: the download stack
+# (download_manager, download, engine_download, download_index, bandwidth),
+# the URL bar index (omnibox) and net_session (via certs / adblock updates).
 
 
 # ------------------ misc helpers ------------------
+def _loaded_stats(module: str, getter) -> dict:
+    """getter(module) once something has imported 'module', else {}."""
+    mod = sys.modules.get(module)
+    if mod is None:
+        return {}
+    try:
+        return getter(mod)
+    except Exception:
+        return {}
+
+
 def is_url(text: str) -> bool:
     """
     Cheap URL heuristic. Accepts bare domains or http(s) URLs.
@@ -76,7 +113,7 @@ def as_http_url_or_search(text: str) -> str:
     - Otherwise, send it to Startpage search.
     """
     t = text.strip()
-    if t.startswith(("http://", "https://")):
+    if t.startswith(("http://", "https://", "runit://")):
         return t
     if is_url(t):
         return "https://" + t
@@ -91,12 +128,12 @@ class Browser(QMainWindow):
     Main browser window for RunIT-QT.
 
     High-level behavior:
-    - Creates a lean QWebEngineProfile + TinyAdblockInterceptor.
+    - Creates a lean (or persistent) QWebEngineProfile + TinyAdblockInterceptor.
     - Wires default toolbars, address bar, mini search box, and zoom controls.
     - Manages tabs and session persistence.
     """
 
-    def __init__(self):
+    def __init__(self, start_urls=None, profile_mode="lean", cache_mb=DISK_CACHE_MB):
         super().__init__()
 
         self.setWindowTitle(APP_NAME)
@@ -106,12 +143,23 @@ class Browser(QMainWindow):
         self.setStyleSheet(FUTURE_QSS)
 
         # Shared profile for all tabs/views
-        self.profile = build_lean_profile()
+        self.profile_mode = profile_mode
+        self.profile = build_profile(profile_mode, cache_mb)
+        METRICS.set("profile.mode", profile_mode)
+        STARTUP.mark("profile_build")
 
         # Adblock: start background update + load cached rules
         update_blocklist()
         hosts, paths = load_blocklist()
-        self.adblock = TinyAdblockInterceptor(hosts, paths, ADBLOCK_ALLOW_SUFFIXES)
+        STARTUP.mark("blocklist_load")
+        self.upgrades = UpgradeTable()
+        self.data_saver = DataSaver(
+            load_user_config().get("data_saver", DATA_SAVER_DEFAULT)
+        )
+        self.adblock = TinyAdblockInterceptor(
+            hosts, paths, ADBLOCK_ALLOW_SUFFIXES,
+            upgrades=self.upgrades, data_saver=self.data_saver,
+        )
         try:
             self.profile.setUrlRequestInterceptor(self.adblock)
         except Exception:
@@ -124,15 +172,66 @@ class Browser(QMainWindow):
         self._jsimg_enabled = True
         self._in_fullscreen = False
 
+        # Per-host load timings / Web Vitals, tagged with the toggles below
+        self.timings = PageTimingStore(context_provider=self._timing_context)
+        install_vitals_script(self.profile)
+
+        # Internal runit:// pages and the metrics they display
+        self.scheme_handler = RunitSchemeHandler(self)
+        self.scheme_handler.add_route("perf", perf_html)
+        self.scheme_handler.add_route("perf.json", perf_json)
+        self.history = HistoryStore()
+        self.certs = CertificateCache(self)
+        self._downloads = None        # DownloadQueue, built on first download
+        self._download_panel = None
+        self.most_visited = MostVisited(self.history)
+        self.most_visited.load_async()
+        self.scheme_handler.add_route("newtab", NewTabPage(self.most_visited))
+        self.scheme_handler.install(self.profile)
+        METRICS.provide("tabs", self._tab_metrics)
+        METRICS.provide("timings", lambda: self.timings.summary()[:25])
+        METRICS.provide("startup", STARTUP.report)
+        METRICS.provide(
+            "downloads", lambda: self._downloads.stats() if self._downloads else {}
+        )
+        METRICS.provide("net", lambda: _loaded_stats("net_session", lambda m: m.NET.stats()))
+        METRICS.provide(
+            "bandwidth", lambda: _loaded_stats("bandwidth", lambda m: m.LIMITER.stats())
+        )
+        METRICS.provide(
+            "download_index",
+            lambda: _loaded_stats("download_index", lambda m: dict(m.INDEX.stats)),
+        )
+        METRICS.provide("data_saver", self.data_saver.stats)
+
+        # Pre-warmed view/page pair handed out by add_new_tab()
+        self._spare_view = None
+        self._spare_pending = False
+        self._closing = False
+        # Measurement hook: (milliseconds, spare_hit) for recent new tabs
+        self.new_tab_latencies = deque(maxlen=64)
+
         # Path to session file (list of open URLs)
         self._session_file = os.path.join(os.path.expanduser("~"), ".runit_qt_session.json")
 
-        # Build UI and restore previous session
+        # Build UI and restore previous session (or open the given URLs)
         self._setup_ui()
-        self.add_new_tab(QUrl(HOME_URL), "Home")
-        self._restore_session()
+        STARTUP.mark("ui_build")
+        # Only a restored session is saved back on exit, so opening a URL from
+        # the command line never replaces the user's saved tabs.
+        self._session_restored = not start_urls
+        if start_urls:
+            for u in start_urls:
+                self.add_new_tab(QUrl.fromUserInput(u, os.getcwd()), "Loading…")
+        else:
+            self.add_new_tab(QUrl(HOME_URL), "Home")
+            self._restore_session()
+        STARTUP.mark("first_tab")
         self.show()
 
+        # Warm up a spare tab once the event loop goes idle
+        self._schedule_spare_refill()
+
     # ---------- UI wiring ----------
     def _setup_ui(self):
         """
@@ -147,7 +246,7 @@ class Browser(QMainWindow):
         # Double-click tab bar -> new tab
         try:
             self.browser_tabs.tabBarDoubleClicked.connect(
-                lambda _i: self.add_new_tab(QUrl("about:config"), "New Tab")
+                lambda _i: self.add_new_tab(QUrl(NEWTAB_URL), "New Tab")
             )
         except Exception:
             pass
@@ -197,7 +296,7 @@ class Browser(QMainWindow):
 
         # New Tab
         nav_top.addWidget(
-            btn("New Tab", "Open new tab", lambda: self.add_new_tab(QUrl("about:config"), "New Tab"))
+            btn("New Tab", "Open new tab", lambda: self.add_new_tab(QUrl(NEWTAB_URL), "New Tab"))
         )
 
         # Back / Forward
@@ -210,6 +309,19 @@ class Browser(QMainWindow):
         self.urlbar.setPlaceholderText("Enter URL or search")
         self.urlbar.returnPressed.connect(self._go_url)
 
+        # URL bar suggestions; the index is built from history on first use
+        self._omnibox = None
+        self._omnibox_loading = False
+        # Visits noted while a (re)build runs, replayed onto the new index
+        self._omnibox_replay: list[tuple[str, str, bool]] = []
+        self._omnibox_lock = threading.Lock()
+        self._omnibox_model = QStringListModel(self)
+        self._completer = QCompleter(self._omnibox_model, self)
+        self._completer.setCompletionMode(_COMPLETION("UnfilteredPopupCompletion"))
+        self._completer.setWidget(self.urlbar)
+        self._completer.activated.connect(self._on_suggestion_activated)
+        self.urlbar.textEdited.connect(self._on_urlbar_edited)
+
         # Make the URL bar expanding and wide
         try:
             Policy = getattr(QSizePolicy, "Policy", QSizePolicy)
@@ -278,6 +390,18 @@ class Browser(QMainWindow):
         self.jsimg_btn = btn("JS/Img ON", "Toggle JavaScript & images", self.toggle_js_images)
         nav_bottom.addWidget(self.jsimg_btn)
 
+        # Data saver: default level, and this site's own level
+        self.saver_btn = btn("Saver OFF", "Cycle data saver level (global)", self.cycle_data_saver)
+        nav_bottom.addWidget(self.saver_btn)
+        self.saver_site_btn = btn(
+            "Saver site", "Cycle data saver level for the current site", self.cycle_data_saver_site
+        )
+        nav_bottom.addWidget(self.saver_site_btn)
+        self._refresh_saver_btn()
+
+        # Download manager panel
+        nav_bottom.addWidget(btn("Downloads", "Show downloads (Ctrl+J)", self.show_downloads))
+
         # Zoom controls
         nav_bottom.addWidget(
             btn("Zoom -", "Zoom out (Ctrl+-)", lambda: self.zoom_by(-0.1))
@@ -293,7 +417,7 @@ class Browser(QMainWindow):
         new_tab_act = QAction("New Tab", self)
         new_tab_act.setShortcut(QKeySequence("Ctrl+T"))
         new_tab_act.triggered.connect(
-            lambda: self.add_new_tab(QUrl("about:config"), "New Tab")
+            lambda: self.add_new_tab(QUrl(NEWTAB_URL), "New Tab")
         )
         self.addAction(new_tab_act)
 
@@ -326,9 +450,24 @@ class Browser(QMainWindow):
         self.addAction(zoom_out_act)
         self.addAction(zoom_reset_act)
 
+        # Downloads panel
+        downloads_act = QAction("Downloads", self)
+        downloads_act.setShortcut(QKeySequence("Ctrl+J"))
+        downloads_act.triggered.connect(self.show_downloads)
+        self.addAction(downloads_act)
+
         # Download hook from QWebEngineProfile
         self.profile.downloadRequested.connect(self.on_download_requested)
 
+    def _timing_context(self) -> dict:
+        """Browser state attached to each timing sample."""
+        return {
+            "adblock": bool(getattr(self.adblock, "enabled", True)),
+            "jsimg": self._jsimg_enabled,
+            "saver": self.data_saver.default_level,
+            "profile": self.profile_mode,
+        }
+
     # ---------- JS & images ----------
     def _apply_jsimg_to_settings(self, settings_obj, enabled: bool):
         from qt_compat import _set_web_attr  # local import to avoid clutter
@@ -345,8 +484,10 @@ class Browser(QMainWindow):
 
         self._apply_jsimg_to_settings(self.profile.settings(), enabled)
 
-        for i in range(self.browser_tabs.count()):
-            w = self.browser_tabs.widget(i)
+        views = [self.browser_tabs.widget(i) for i in range(self.browser_tabs.count())]
+        if self._spare_view is not None:
+            views.append(self._spare_view)
+        for w in views:
             if isinstance(w, QWebEngineView):
                 self._apply_jsimg_to_settings(w.settings(), enabled)
                 try:
@@ -360,6 +501,57 @@ class Browser(QMainWindow):
             2000,
         )
 
+    # ---------- Data saver ----------
+    def _refresh_saver_btn(self):
+        """Sync the data saver button with the default level and bytes saved."""
+        level = self.data_saver.default_level
+        self.saver_btn.setText(f"Saver {level.upper()}")
+        self.saver_btn.setToolTip(
+            f"Cycle data saver level (currently {level}; "
+            f"~{self.data_saver.saved_bytes / 1048576:.1f} MiB saved this session)"
+        )
+
+    def cycle_data_saver(self):
+        """
+        Step the default data saver level off -> lite -> strict -> off and
+        reload the current tab. Sites with their own level keep it.
+        """
+        i = LEVELS.index(self.data_saver.default_level)
+        self.data_saver.set_default(LEVELS[(i + 1) % len(LEVELS)])
+        self._refresh_saver_btn()
+        self.status.showMessage(f"Data saver: {self.data_saver.default_level}", 2000)
+        if self.current_tab():
+            self.current_tab().reload()
+
+    def cycle_data_saver_site(self):
+        """
+        Step the current site's own level default -> off -> lite -> strict
+        -> default, then reload. Setting "off" fetches what was held back.
+        """
+        tab = self.current_tab()
+        if not tab:
+            return
+        host = (tab.url().host() or "").lower().strip(".")
+        if not host:
+            return
+        host = host[4:] if host.startswith("www.") else host
+
+        choices = (None,) + LEVELS
+        current = self.data_saver.site_rule(host)
+        nxt = choices[(choices.index(current) + 1) % len(choices)]
+        self.data_saver.set_site(host, nxt)
+        saved = sum(
+            n for h, n in self.data_saver.saved_by_site.items()
+            if h == host or h.endswith("." + host)
+        )
+        self.status.showMessage(
+            f"Data saver for {host}: {nxt or 'default (' + self.data_saver.default_level + ')'}"
+            f" — ~{saved / 1024:.0f} KiB saved here",
+            3000,
+        )
+        self._refresh_saver_btn()
+        tab.reload()
+
     # ---------- Zoom ----------
     def zoom_by(self, delta: float, min_f: float = 0.25, max_f: float = 3.0):
         """
@@ -404,19 +596,23 @@ class Browser(QMainWindow):
         Close tab at 'index' but keep at least one tab open (last-tab guard).
         """
         if self.browser_tabs.count() <= 1:
-            # Last tab: don't close, just navigate to about:config.
+            # Last tab: don't close, just navigate to the new tab page.
             w = self.browser_tabs.currentWidget()
             if isinstance(w, QWebEngineView):
-                w.setUrl(QUrl("about:config"))
+                w.setUrl(QUrl(NEWTAB_URL))
             return
         self.browser_tabs.removeTab(index)
 
-    def add_new_tab(self, qurl, label="New Tab"):
+    def _create_view(self):
         """
-        Create a new tab with a QWebEngineView + SecurePage and load 'qurl'.
+        Build a hidden QWebEngineView + SecurePage pair on the shared profile.
         """
-        view = QWebEngineView(self.browser_tabs)
-        page = SecurePage(self.profile, view, lock_cb=self._set_lock)
+        view = QWebEngineView(self)
+        view.hide()
+        page = SecurePage(
+            self.profile, view, lock_cb=self._set_lock, timings=self.timings,
+            certs=self.certs, upgrades=self.upgrades,
+        )
         view.setPage(page)
 
         # Per-view settings: always start with JS/images enabled
@@ -431,11 +627,94 @@ class Browser(QMainWindow):
             page.fullScreenRequested.connect(self._on_fullscreen_requested)
         except Exception:
             pass
+        page.httpsFallback.connect(lambda url, v=view: self._on_https_fallback(v, url))
+        return view
+
+    def _schedule_spare_refill(self):
+        """
+        Queue creation of the spare view for when the app is idle.
+        """
+        if self._closing or self._spare_view is not None or self._spare_pending:
+            return
+        self._spare_pending = True
+        QtCore.QTimer.singleShot(SPARE_TAB_DELAY_MS, self._refill_spare)
+
+    def _refill_spare(self):
+        """
+        Create the spare view and load about:blank so the renderer spins up now
+        instead of when the user opens the next tab.
+        """
+        self._spare_pending = False
+        if self._closing or self._spare_view is not None:
+            return
+        try:
+            view = self._create_view()
+            view.setUrl(QUrl("about:blank"))
+            self._spare_view = view
+            vlog("[Tabs] spare view ready")
+        except Exception as e:
+            vlog("[Tabs] spare view failed:", e)
+
+    def _take_spare_view(self):
+        """
+        Return (view, spare_hit): the pre-warmed view if one is ready, otherwise
+        a freshly built one. A refill is scheduled either way.
+        """
+        view, self._spare_view = self._spare_view, None
+        hit = view is not None
+        if view is None:
+            view = self._create_view()
+        else:
+            self._drop_warmup_history(view)
+        self._schedule_spare_refill()
+        return view, hit
+
+    @staticmethod
+    def _drop_warmup_history(view):
+        """
+        Forget the about:blank warm-up entry once the tab's first page has
+        committed, so Back is not enabled towards a blank page.
+        QWebEngineHistory.clear() keeps the current entry, hence after the
+        load rather than before setUrl().
+        """
+        page = view.page()
+
+        def clear(_ok=True):
+            if view.url().toString() == "about:blank":
+                return  # the warm-up load itself, still in flight when taken
+            try:
+                page.loadFinished.disconnect(clear)
+            except Exception:
+                pass
+            try:
+                view.history().clear()
+            except Exception:
+                pass
+
+        page.loadFinished.connect(clear)
+
+    def _dispose_view(self, view):
+        """Detach and delete a view and its page."""
+        p = view.page()
+        view.setPage(None)
+        if p:
+            p.deleteLater()
+        view.deleteLater()
+
+    def add_new_tab(self, qurl, label="New Tab"):
+        """
+        Open a new tab for 'qurl', reusing the pre-warmed spare view if ready.
+        """
+        t0 = time.perf_counter()
+        view, spare_hit = self._take_spare_view()
 
         view.urlChanged.connect(self._on_url_changed)
         view.titleChanged.connect(
             lambda title, v=view: self._update_tab_title_for(v, title)
         )
+        view.loadFinished.connect(lambda ok, v=view: self._on_load_finished(v, ok))
+        if not STARTUP.done():
+            view.loadFinished.connect(lambda _ok: STARTUP.mark("first_load_finished"))
 
         idx = self.browser_tabs.addTab(view, label or "New Tab")
         self.browser_tabs.setCurrentIndex(idx)
@@ -448,16 +727,43 @@ class Browser(QMainWindow):
         self.urlbar.setFocus()
         self.urlbar.selectAll()
 
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.new_tab_latencies.append((ms, spare_hit))
+        METRICS.observe("tabs.new_tab_ms", round(ms, 3))
+        METRICS.incr("tabs.spare_hit" if spare_hit else "tabs.spare_miss")
+        vlog(f"[Tabs] new tab in {ms:.2f} ms (spare={'hit' if spare_hit else 'miss'})")
+
+    def _tab_metrics(self) -> list[dict]:
+        """Per-tab renderer PID and RSS for runit://perf."""
+        rows = []
+        for i in range(self.browser_tabs.count()):
+            w = self.browser_tabs.widget(i)
+            if not isinstance(w, QWebEngineView):
+                continue
+            try:
+                pid = w.page().renderProcessPid()
+            except Exception:
+                pid = -1
+            rows.append({
+                "index": i,
+                "title": self.browser_tabs.tabText(i),
+                "host": w.url().host(),
+                "pid": pid,
+                "rss_kb": proc_status_kb(pid),
+            })
+        return rows
+
     def current_tab(self):
         """Return the current QWebEngineView or None."""
         w = self.browser_tabs.currentWidget()
         return w if isinstance(w, QWebEngineView) else None
 
     def _update_tab_title_for(self, view, title: str):
-        """Update the tab text when the page title changes."""
+        """Update the tab text (and history title) when the page title changes."""
         i = self.browser_tabs.indexOf(view)
         if i >= 0:
             self.browser_tabs.setTabText(i, title or "Loading…")
+        self.history.update_title(view.url().toString(), title)
 
     # ---------- Fullscreen bridge ----------
     def _on_fullscreen_requested(self, request):
@@ -541,6 +847,84 @@ class Browser(QMainWindow):
             return
         self.current_tab().setUrl(QUrl(as_http_url_or_search(t)))
 
+    # ---------- URL bar suggestions ----------
+    def _ensure_omnibox(self):
+        """
+        Return the suggestion index, starting a background build from
+        history the first time it is needed (None until it is ready).
+        """
+        if self._omnibox is None:
+            self._build_omnibox()
+        return self._omnibox
+
+    def _build_omnibox(self):
+        """
+        Build a PrefixIndex from history on a worker thread and swap it in.
+        Used for the first build and whenever the live overlay is full; the
+        old index keeps answering meanwhile.
+        """
+        if self._omnibox_loading:
+            return
+        self._omnibox_loading = True
+
+        from omnibox import PrefixIndex, MAX_RESULTS
+
+        self._completer.setMaxVisibleItems(MAX_RESULTS)
+
+        def worker():
+            t0 = time.perf_counter()
+            # Batched visits must be on disk to be part of the new index
+            self.history.flush()
+            with self._omnibox_lock:
+                # Visits noted before the flush are in the rows already
+                self._omnibox_replay = []
+            index = PrefixIndex(self.history.load_entries())
+            with self._omnibox_lock:
+                for url, title, typed in self._omnibox_replay:
+                    index.note_visit(url, title, typed=typed)
+                self._omnibox_replay = []
+                self._omnibox = index
+                self._omnibox_loading = False
+            METRICS.incr("omnibox.builds")
+            METRICS.set("omnibox.entries", len(index))
+            METRICS.set("omnibox.build_ms", round((time.perf_counter() - t0) * 1000.0, 1))
+            vlog(f"[Omnibox] index ready: {len(index)} entries")
+
+        threading.Thread(target=worker, name="omnibox-build", daemon=True).start()
+
+    def _note_omnibox_visit(self, url: str, title: str, typed: bool):
+        """Feed a visit to the live index; rebuild it once its overlay is full."""
+        with self._omnibox_lock:
+            index = self._omnibox
+            if self._omnibox_loading:
+                self._omnibox_replay.append((url, title, typed))
+        if index is None:
+            return
+        index.note_visit(url, title, typed=typed)
+        if index.needs_rebuild:
+            self._build_omnibox()
+
+    def _on_urlbar_edited(self, text: str):
+        """
+        Refresh suggestions for each keystroke from the prefix index.
+        """
+        index = self._ensure_omnibox()
+        if index is None:
+            return
+        t0 = time.perf_counter()
+        rows = index.query(text)
+        METRICS.observe("omnibox.query_ms", round((time.perf_counter() - t0) * 1000.0, 4))
+        self._omnibox_model.setStringList([url for url, _title in rows])
+        if rows:
+            self._completer.complete()
+        else:
+            self._completer.popup().hide()
+
+    def _on_suggestion_activated(self, text: str):
+        """Navigate to a suggestion picked from the popup."""
+        self.urlbar.setText(text)
+        self._go_url()
+
     def navigate_home(self):
         """
         Go to the configured home page.
@@ -549,13 +933,42 @@ class Browser(QMainWindow):
         if tab:
             tab.setUrl(QUrl(HOME_URL))
 
+    def _record_visit(self, view):
+        """
+        Queue a history visit for a committed main-frame load; the history
+        writer thread does the disk I/O. Same-document changes (#fragment
+        jumps, pushState routes that re-fire loadFinished) and reloads of
+        the URL last recorded for this tab are not new visits.
+        """
+        qurl = view.url()
+        key = qurl.toString().split("#", 1)[0]
+        if key == getattr(view, "_last_visit", None):
+            return
+        view._last_visit = key
+        try:
+            transition = getattr(view.page(), "last_transition", "link")
+        except Exception:
+            transition = "link"
+        self.history.record_visit(qurl.toString(), view.title(), transition)
+        self._note_omnibox_visit(qurl.toString(), view.title(), transition == "typed")
+
+    def _on_load_finished(self, view, ok: bool):
+        """
+        Record the visit and feed successful page loads into the
+        most-visited index.
+        """
+        if ok:
+            self._record_visit(view)
+            self.most_visited.record(view.url().toString(), view.title())
+
     def _on_url_changed(self, qurl):
         """
         Sync URL bar and lock icon when the current tab's URL changes.
         """
         if self.sender() is not self.current_tab():
             return
-        self.urlbar.setText(qurl.toString())
+        text = qurl.toString()
+        self.urlbar.setText("" if text == NEWTAB_URL else text)
         self._set_lock((qurl.scheme() or "").lower() == "https")
 
     # ---------- Search helpers ----------
@@ -702,87 +1115,69 @@ class Browser(QMainWindow):
         self.lock_btn.setText("🔒" if secure else "🔓")
         self.lock_btn.setToolTip("Secure HTTPS" if secure else "Not secure")
 
+    def _on_https_fallback(self, view, url):
+        """A failed HTTPS upgrade fell back to http://: say so, don't hide it."""
+        host = url.host()
+        if view is self.current_tab():
+            self._set_lock(False)
+            self.lock_btn.setToolTip(f"Not secure: {host} refused HTTPS, loaded over HTTP")
+        self.status.showMessage(
+            f"{host}: HTTPS connection failed — loaded over plain HTTP (not secure)", 6000
+        )
+
+    def _show_message(self, title: str, text: str, warning: bool = False):
+        """
+        Show a non-modal message box (no nested event loop).
+        """
+        Icon = getattr(QMessageBox, "Icon", QMessageBox)
+        box = QMessageBox(
+            getattr(Icon, "Warning" if warning else "Information"), title, text,
+            parent=self,
+        )
+        try:
+            attr = getattr(Qt, "WidgetAttribute", Qt)
+            box.setAttribute(getattr(attr, "WA_DeleteOnClose"))
+        except Exception:
+            pass
+        box.open()
+        return box
+
     def _show_certificate(self):
         """
-        Perform a HEAD request and display basic certificate information.
+        Show basic certificate information for the current HTTPS page.
+
+        Hosts already seen are answered from the certificate cache; otherwise
+        a one-off asynchronous probe fills the cache and the dialog opens when
+        it completes.
         """
         tab = self.current_tab()
         if not tab:
             return
         url = tab.url()
         if (url.scheme() or "").lower() != "https":
-            QMessageBox.information(self, "Certificate", "This page is not HTTPS.")
+            self._show_message("Certificate", "This page is not HTTPS.")
             return
 
-        mgr = QtNetwork.QNetworkAccessManager(self)
-        reply = mgr.head(QtNetwork.QNetworkRequest(url))
-        loop = QtCore.QEventLoop()
-        timer = QtCore.QTimer(self)
-        timer.setSingleShot(True)
-
-        def quit_loop():
-            if loop.isRunning():
-                loop.quit()
-
-        timer.timeout.connect(quit_loop)
-        reply.finished.connect(quit_loop)
-        timer.start(8000)
-        loop.exec()
-        timer.stop()
-
-        try:
-            conf = reply.sslConfiguration()
-        except Exception:
-            conf = None
-
-        reply.deleteLater()
-        mgr.deleteLater()
-
-        if not conf:
-            QMessageBox.warning(self, "Certificate", "Could not retrieve certificate.")
-            return
-
-        try:
-            chain = conf.peerCertificateChain()
-        except Exception:
-            chain = []
-
-        if not chain:
-            QMessageBox.warning(self, "Certificate", "No peer certificate chain provided.")
-            return
-
-        leaf = chain[0]
-        try:
-            SI = getattr(QtNetwork.QSslCertificate, "SubjectInfo", None)
-            subj = leaf.subjectInfo(
-                SI.CommonName if SI else QtNetwork.QSslCertificate.CommonName
-            )
-            issr = leaf.issuerInfo(
-                SI.CommonName if SI else QtNetwork.QSslCertificate.CommonName
-            )
-            subj = (
-                subj[0]
-                if isinstance(subj, (list, tuple)) and subj
-                else str(subj)
-            )
-            issr = (
-                issr[0]
-                if isinstance(issr, (list, tuple)) and issr
-                else str(issr)
+        def show(info):
+            if not info:
+                self._show_message(
+                    "Certificate", "Could not retrieve certificate.", warning=True
+                )
+                return
+            self._show_message(
+                "Certificate Info",
+                f"Subject (CN): {info['subject']}\n"
+                f"Issuer (CN): {info['issuer']}\n"
+                f"Valid From: {info['valid_from']}\n"
+                f"Valid Until: {info['valid_until']}\n",
             )
-            nb = leaf.effectiveDate().toString("yyyy-MM-dd HH:mm:ss t")
-            na = leaf.expiryDate().toString("yyyy-MM-dd HH:mm:ss t")
-        except Exception:
-            subj = issr = ""
-            nb = na = ""
-
-        info = (
-            f"Subject (CN): {subj}\n"
-            f"Issuer (CN): {issr}\n"
-            f"Valid From: {nb}\n"
-            f"Valid Until: {na}\n"
-        )
-        QMessageBox.information(self, "Certificate Info", info)
+
+        if self.certs.get(url.host()) is None:
+            self.status.showMessage("Fetching certificate…", 2000)
+            METRICS.incr("certs.miss")
+        else:
+            METRICS.incr("certs.hit")
+        self.certs.fetch(url, show)
 
     # ---------- Downloads ----------
     def _safe_name_hint(self, url_str: str) -> str:
@@ -800,17 +1195,21 @@ class Browser(QMainWindow):
         """
         Intercept downloads to:
         - Show a safety warning on executable-like files.
-        - Delegate actual saving to the DownloadDialog from download.py.
+        - Offer a file downloaded earlier from the same URL (download index)
+          instead of fetching a second copy.
+        - Hand the engine's own download to the download manager (non-modal).
+          QtWebEngine keeps streaming it with the page's cookies and request,
+          into ~/Downloads/<sanitised name>.
         """
-        # Cancel the default download handling
-        try:
-            item.cancel()
-        except Exception:
-            pass
+        if item is None:
+            return
+        from engine_download import suggested_name, target_for
+        from download import offer_existing
 
-        url = item.url() if item else None
+        url = item.url()
         url_str = url.toString() if url else ""
-        hint = self._safe_name_hint(url_str)
+        # The engine's suggested name honours Content-Disposition, unlike the URL path
+        hint = suggested_name(item) or self._safe_name_hint(url_str)
 
         risky = (".exe", ".bat", ".cmd", ".scr", ".js", ".vbs", ".jar", ".apk", ".msi", ".dll")
         if any(hint.lower().endswith(ext) for ext in risky):
@@ -827,12 +1226,44 @@ class Browser(QMainWindow):
                 QMessageBox.No,
             )
             if r != QMessageBox.Yes:
+                try:
+                    item.cancel()
+                except Exception:
+                    pass
                 return
 
-        # Delegate to your existing DownloadDialog
-        from download import DownloadDialog
+        # Downloaded before? Offer the existing file instead of a second copy
+        action, existing = offer_existing(self, url_str, target=target_for(item))
+        if action != "download":
+            try:
+                item.cancel()
+            except Exception:
+                pass
+            if existing:
+                self.status.showMessage(
+                    ("Linked: " if action == "link" else "Already downloaded: ") + existing, 5000)
+            return
+
+        self.downloads.adopt(item)
+        self.show_downloads()
 
-        DownloadDialog.download_url(self, url_str)
+    @property
+    def downloads(self):
+        """The DownloadQueue; the download stack is imported on first use."""
+        if self._downloads is None:
+            from download_manager import DownloadQueue
+
+            self._downloads = DownloadQueue(self)
+        return self._downloads
+
+    def show_downloads(self):
+        """Show (creating on first use) the download manager panel."""
+        if self._download_panel is None:
+            from download_manager import DownloadPanel
+
+            self._download_panel = DownloadPanel(self.downloads, self)
+        self._download_panel.show()
+        self._download_panel.raise_()
 
     # ---------- Session ----------
     def _restore_session(self):
@@ -856,27 +1287,34 @@ class Browser(QMainWindow):
         """
         Save the current session and dispose WebEngine pages cleanly on exit.
         """
-        # Save session URLs
-        try:
-            urls = [
-                self.browser_tabs.widget(i).url().toString()
-                for i in range(self.browser_tabs.count())
-                if isinstance(self.browser_tabs.widget(i), QWebEngineView)
-            ]
-            json.dump(urls, open(self._session_file, "w", encoding="utf-8"))
-        except Exception:
-            pass
+        # Save session URLs (unless this window was started with URLs)
+        if self._session_restored:
+            try:
+                urls = [
+                    self.browser_tabs.widget(i).url().toString()
+                    for i in range(self.browser_tabs.count())
+                    if isinstance(self.browser_tabs.widget(i), QWebEngineView)
+                ]
+                json.dump(urls, open(self._session_file, "w", encoding="utf-8"))
+            except Exception:
+                pass
+
+        self.timings.save()
+        self.upgrades.save()
+        self.history.close()
+        if self._downloads is not None:
+            self._downloads.shutdown()
 
         # Dispose all pages/views before app quits to avoid profile-release warning
+        self._closing = True
         try:
             for i in range(self.browser_tabs.count()):
                 w = self.browser_tabs.widget(i)
                 if isinstance(w, QWebEngineView):
-                    p = w.page()
-                    w.setPage(None)
-                    if p:
-                        p.deleteLater()
-                    w.deleteLater()
+                    self._dispose_view(w)
+            if self._spare_view is not None:
+                self._dispose_view(self._spare_view)
+                self._spare_view = None
         except Exception:
             pass
 
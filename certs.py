@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+certs.py — Per-host TLS certificate cache for the lock/certificate viewer.
+
+Responsibilities:
+- Keep a small LRU of certificate summaries per host, evicted when the
+  certificate expires or the entry gets older than CERT_TTL.
+- Capture chains from the page's own connection when QtWebEngine hands one
+  over (certificate errors), otherwise fetch asynchronously once per host,
+  only when the certificate dialog asks for it, with a HEAD request (over
+  the shared "certs" network session); concurrent requests for one host
+  share one fetch.
+- Never block: results are delivered through callbacks from Qt signals.
+"""
+
+import time
+
+from collections import OrderedDict
+
+from qt_compat import QtCore, QtNetwork, vlog
+
+# Max age of a cached entry (certificates can be rotated before expiry)
+CERT_TTL = 6 * 3600
+# Hosts kept in the cache
+CERT_CACHE_MAX = 256
+# Abort a probe that takes longer than this
+FETCH_TIMEOUT_MS = 8000
+
+
+def _first(v) -> str:
+    return v[0] if isinstance(v, (list, tuple)) and v else str(v or "")
+
+
+def describe_chain(chain) -> dict | None:
+    """
+    Summarise the leaf of a QSslCertificate chain as a plain dict:
+    subject, issuer, valid_from, valid_until, expires (epoch seconds).
+    """
+    if not chain:
+        return None
+    leaf = chain[0]
+    try:
+        SI = getattr(QtNetwork.QSslCertificate, "SubjectInfo", None)
+        cn = SI.CommonName if SI else QtNetwork.QSslCertificate.CommonName
+        expiry = leaf.expiryDate()
+        return {
+            "subject": _first(leaf.subjectInfo(cn)),
+            "issuer": _first(leaf.issuerInfo(cn)),
+            "valid_from": leaf.effectiveDate().toString("yyyy-MM-dd HH:mm:ss t"),
+            "valid_until": expiry.toString("yyyy-MM-dd HH:mm:ss t"),
+            "expires": float(expiry.toSecsSinceEpoch()),
+            "chain_len": len(chain),
+        }
+    except Exception as e:
+        vlog("[Certs] describe failed:", e)
+        return None
+
+
+class CertificateCache(QtCore.QObject):
+    """
+    host -> certificate summary, with asynchronous fill.
+    """
+
+    def __init__(self, parent=None, manager=None):
+        super().__init__(parent)
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._pending: dict[str, list] = {}
+        self._manager = manager
+
+    # ---------- cache ----------
+    def get(self, host: str) -> dict | None:
+        """Return the cached summary for 'host' if it is still valid."""
+        host = (host or "").lower()
+        item = self._entries.get(host)
+        if item is None:
+            return None
+        valid_until, info = item
+        if time.time() >= valid_until:
+            del self._entries[host]
+            return None
+        self._entries.move_to_end(host)
+        return info
+
+    def put(self, host: str, info: dict):
+        host = (host or "").lower()
+        if not host or not info:
+            return
+        valid_until = min(time.time() + CERT_TTL, info.get("expires") or float("inf"))
+        self._entries[host] = (valid_until, info)
+        self._entries.move_to_end(host)
+        while len(self._entries) > CERT_CACHE_MAX:
+            self._entries.popitem(last=False)
+
+    def capture_chain(self, host: str, chain):
+        """Store a chain obtained from the page's own connection."""
+        info = describe_chain(chain)
+        if info:
+            self.put(host, info)
+
+    # ---------- async fetch ----------
+    def _mgr(self):
+        # Shared long-lived manager: a repeat probe can reuse the TLS
+        # session (and socket) of the previous probe to that host
+        if self._manager is None:
+            from net_session import NET
+
+            self._manager = NET.manager("certs")
+        return self._manager
+
+    def fetch(self, url, callback=None):
+        """
+        Make sure 'url''s host is cached. 'callback(info_or_None)' runs once
+        the result is known (immediately if it already is).
+        """
+        host = (url.host() or "").lower()
+        if not host or (url.scheme() or "").lower() != "https":
+            if callback:
+                callback(None)
+            return
+        info = self.get(host)
+        if info is not None:
+            if callback:
+                callback(info)
+            return
+
+        waiters = self._pending.get(host)
+        if waiters is not None:
+            if callback:
+                waiters.append(callback)
+            return
+        self._pending[host] = [callback] if callback else []
+
+        probe = QtCore.QUrl(url)
+        probe.setPath("/")
+        probe.setQuery("")
+        probe.setFragment("")
+        from net_session import NET
+
+        mgr = self._mgr()
+        reply = NET.track(mgr.head(NET.prepare(QtNetwork.QNetworkRequest(probe))),
+                          NET.purpose_of(mgr))
+
+        timer = QtCore.QTimer(reply)
+        timer.setSingleShot(True)
+        timer.timeout.connect(reply.abort)
+        timer.start(FETCH_TIMEOUT_MS)
+        reply.finished.connect(lambda r=reply, h=host: self._on_fetched(h, r))
+
+    def _on_fetched(self, host: str, reply):
+        info = None
+        try:
+            conf = reply.sslConfiguration()
+            info = describe_chain(conf.peerCertificateChain() if conf else [])
+        except Exception:
+            info = None
+        reply.deleteLater()
+
+        if info:
+            self.put(host, info)
+        for cb in self._pending.pop(host, []):
+            try:
+                cb(info)
+            except Exception as e:
+                vlog("[Certs] callback failed:", e)
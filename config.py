@@ -2,13 +2,156 @@
 """
 config.py — Global configuration, theme and small constants
 for the RunIT-QT browser.
+
+A few settings can be overridden per user in ~/.runit_qt_config.json
+(see load_user_config); command-line options override both.
 """
 
+import json
+import os
+
+from dataclasses import dataclass, field
+
 APP_NAME = "RunIT-QT"
 
 # Homepage & search defaults
 HOME_URL = "https://startpage.com"
 
+# Built-in new tab page (served from memory by internal_pages.py)
+NEWTAB_URL = "runit://newtab"
+
+# Quick links shown on the new tab page: (url, label)
+QUICK_LINKS = [
+    ("https://startpage.com", "Startpage"),
+    ("https://en.wikipedia.org", "Wikipedia"),
+    ("https://www.youtube.com", "YouTube"),
+    ("https://github.com", "GitHub"),
+]
+
+# New-tab performance: delay (ms) before the spare pre-warmed tab is rebuilt.
+# 0 means "as soon as the event loop is idle".
+SPARE_TAB_DELAY_MS = 0
+
+# WebEngine profile mode:
+#   "lean"       — off-the-record, no HTTP cache (default; lowest persistence)
+#   "persistent" — named on-disk profile with a size-capped disk HTTP cache
+PROFILE_MODES = ("lean", "persistent")
+PROFILE_MODE = "lean"
+DISK_CACHE_MB = 256
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".runit_qt_profile")
+
+# Download manager: transfers running at once (the rest wait in the queue)
+MAX_CONCURRENT_DOWNLOADS = 3
+# Connections per download for servers that accept Range requests
+# (1 = single stream; Qt opens at most 6 connections per host)
+DOWNLOAD_SEGMENTS = 1
+MAX_DOWNLOAD_SEGMENTS = 6
+# Global download rate cap in KiB/s (0 = unlimited), and optional
+# time-of-day windows that override it: [["08:00", "18:00", 2048], ...]
+# (a window may wrap midnight; first match wins)
+DOWNLOAD_RATE_KBPS = 0
+DOWNLOAD_RATE_SCHEDULE = ()
+
+# Data saver (data_saver.py): level for sites without their own rule
+# ("off" | "lite" | "strict"), web fonts allowed per page in "lite", and the
+# image edge (px, from URL size hints) from which "lite" holds images back
+DATA_SAVER_DEFAULT = "off"
+DATA_SAVER_FONT_LIMIT = 2
+DATA_SAVER_LARGE_IMAGE_PX = 800
+
+
+# Chromium engine tuning (QTWEBENGINE_CHROMIUM_FLAGS), applied by main.py
+# before QApplication is created.
+@dataclass(frozen=True)
+class EngineTuning:
+    """
+    Typed view of the Chromium switches RunIT-QT cares about.
+
+    None / False means "leave Chromium's default".
+    """
+
+    name: str
+    process_model: str | None = None            # "process-per-site" | "process-per-site-instance"
+    renderer_process_limit: int | None = None
+    disable_gpu_rasterization: bool = False
+    enable_gpu_rasterization: bool = False
+    js_heap_mb: int | None = None               # V8 --max-old-space-size
+    disable_background_timer_throttling: bool = False
+    disable_renderer_backgrounding: bool = False
+    extra_flags: tuple[str, ...] = field(default_factory=tuple)
+
+    def chromium_flags(self, headless: bool = False) -> list[str]:
+        """
+        Return the switch list for this preset. On headless (offscreen)
+        runs GPU rasterisation is always disabled.
+        """
+        flags = []
+        if self.process_model:
+            flags.append(f"--{self.process_model}")
+        if self.renderer_process_limit:
+            flags.append(f"--renderer-process-limit={self.renderer_process_limit}")
+        if self.disable_gpu_rasterization or headless:
+            flags.append("--disable-gpu-rasterization")
+        elif self.enable_gpu_rasterization:
+            flags.append("--enable-gpu-rasterization")
+        if self.js_heap_mb:
+            flags.append(f"--js-flags=--max-old-space-size={self.js_heap_mb}")
+        if self.disable_background_timer_throttling:
+            flags.append("--disable-background-timer-throttling")
+        if self.disable_renderer_backgrounding:
+            flags.append("--disable-renderer-backgrounding")
+        flags.extend(self.extra_flags)
+        return flags
+
+
+ENGINE_PRESETS = {
+    # Few renderers, one per site, capped V8 heap: for small RAM machines.
+    "low-memory": EngineTuning(
+        name="low-memory",
+        process_model="process-per-site",
+        renderer_process_limit=2,
+        disable_gpu_rasterization=True,
+        js_heap_mb=256,
+    ),
+    # Chromium defaults with a sane renderer cap.
+    "balanced": EngineTuning(
+        name="balanced",
+        renderer_process_limit=6,
+    ),
+    # Fastest page work: GPU raster, no throttling of background tabs.
+    "throughput": EngineTuning(
+        name="throughput",
+        enable_gpu_rasterization=True,
+        disable_background_timer_throttling=True,
+        disable_renderer_backgrounding=True,
+    ),
+}
+ENGINE_PRESET = "balanced"
+
+# Per-user overrides (JSON object, keys are the lowercase setting names)
+USER_CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".runit_qt_config.json")
+
+
+def load_user_config(path: str = USER_CONFIG_FILE) -> dict:
+    """
+    Read user overrides, e.g.
+    {"profile_mode": "persistent", "disk_cache_mb": 512, "engine_preset": "low-memory",
+     "download_segments": 4, "download_rate_kbps": 4096,
+     "download_rate_schedule": [["08:00", "18:00", 1024]], "data_saver": "lite"}.
+
+    Returns an empty dict if the file is missing or invalid.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[Config] ignoring {path}: {e}", flush=True)
+        return {}
+
+
 # Futuristic stylesheet used by the main window.
 # This is copied from your original single-file script.
 FUTURE_QSS = """
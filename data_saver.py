@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+data_saver.py — Per-site data-saver policies for metered links.
+
+Responsibilities:
+- Decide, per subresource request, whether a heavy resource class should
+  be held back: media, large images, web fonts beyond the first N per
+  page, and prefetches. TinyAdblockInterceptor classifies each request
+  from QWebEngineUrlRequestInfo's resource type and asks decide().
+- Keep the per-site level ("off" / "lite" / "strict") in a suffix trie
+  (hsts.SuffixTrie, so a rule for example.com covers its subdomains)
+  with a small per-host cache in front; levels persist in a JSON file.
+  Sites without a rule use the global default level.
+- Estimate the bytes each held-back request would have cost (image
+  dimensions from the URL when present, otherwise a per-class average)
+  and keep totals per class and per site for the toolbar and
+  runit://perf.
+
+Request interceptors can only block or redirect, so "deferred" resources
+are those blocked now and fetched once the site is switched to "off" and
+reloaded (the "Saver site" button in the browser).
+
+Lookups are plain dict reads, like hsts.UpgradeTable; rule changes happen
+on the GUI thread.
+"""
+
+import json
+import re
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from config import DATA_SAVER_FONT_LIMIT, DATA_SAVER_LARGE_IMAGE_PX
+from hsts import SuffixTrie
+from metrics import METRICS
+from qt_compat import vlog
+
+# Per-site levels
+DATA_SAVER_FILE = Path.home() / ".runit_qt_datasaver.json"
+
+OFF = "off"
+LITE = "lite"
+STRICT = "strict"
+LEVELS = (OFF, LITE, STRICT)
+
+# Resource classes the interceptor reports
+MEDIA = "media"
+IMAGE = "image"
+FONT = "font"
+PREFETCH = "prefetch"
+
+# Typical transfer size per class when nothing better is known (bytes).
+# Media requests are usually range chunks of a longer stream.
+AVG_BYTES = {
+    MEDIA: 1024 * 1024,
+    IMAGE: 60 * 1024,
+    FONT: 40 * 1024,
+    PREFETCH: 80 * 1024,
+}
+# Compressed bytes per pixel of a photo-like JPEG/WebP
+BYTES_PER_PIXEL = 0.25
+
+# Hosts whose level is cached (the cache is cleared, not trimmed, when full)
+MAX_CACHED_HOSTS = 4096
+
+_RASTER_EXT = (".jpg", ".jpeg", ".png", ".webp", ".avif", ".gif", ".bmp", ".heic")
+_SMALL_HINTS = ("favicon", "sprite", "icon", "logo", "avatar", "emoji", "thumb", "badge")
+_DIMS_RE = re.compile(r"(?<!\d)(\d{2,4})x(\d{2,4})(?!\d)")
+_WIDTH_RE = re.compile(r"[?&;,/](?:w|width|wid|imwidth|resize|sz|size)[=_]?(\d{2,4})(?!\d)")
+_DENSITY_RE = re.compile(r"@([23])x\b")
+
+
+@dataclass(frozen=True)
+class SaverPolicy:
+    """What one level holds back."""
+
+    name: str
+    media: bool = False
+    prefetch: bool = False
+    large_images: bool = False
+    all_images: bool = False        # every raster image except small ones
+    font_limit: int | None = None   # fonts allowed per page (None = all)
+
+
+POLICIES = {
+    OFF: SaverPolicy(OFF),
+    LITE: SaverPolicy(
+        LITE, media=True, prefetch=True, large_images=True,
+        font_limit=DATA_SAVER_FONT_LIMIT,
+    ),
+    STRICT: SaverPolicy(
+        STRICT, media=True, prefetch=True, large_images=True, all_images=True,
+        font_limit=0,
+    ),
+}
+
+
+def image_size_hint(path_and_query: str) -> tuple[int, int] | None:
+    """
+    Best guess at (width, height) in pixels from URL conventions:
+    "800x600" in the path, w=/width= style parameters, "@2x" suffixes.
+    None when the URL says nothing about size.
+    """
+    s = (path_and_query or "").lower()
+    m = _DIMS_RE.search(s)
+    if m:
+        w, h = int(m.group(1)), int(m.group(2))
+    else:
+        m = _WIDTH_RE.search(s)
+        if not m:
+            m = _DENSITY_RE.search(s)
+            if not m:
+                return None
+            # Retina asset of unknown base size: assume a 400 px wide original
+            w = 400 * int(m.group(1))
+            return w, w * 9 // 16
+        w = int(m.group(1))
+        h = w * 9 // 16
+    return w, h
+
+
+def estimate_bytes(kind: str, path_and_query: str = "") -> int:
+    """Lightweight response-size estimate for a held-back request."""
+    if kind == IMAGE:
+        dims = image_size_hint(path_and_query)
+        if dims:
+            return max(1024, int(dims[0] * dims[1] * BYTES_PER_PIXEL))
+    return AVG_BYTES.get(kind, 0)
+
+
+def _is_small_image(path: str) -> bool:
+    p = (path or "").lower()
+    if p.endswith((".svg", ".ico")):
+        return True
+    name = p.rsplit("/", 1)[-1]
+    return any(h in name for h in _SMALL_HINTS)
+
+
+class DataSaver:
+    """
+    Per-site levels + per-page font counts + bytes-saved accounting.
+    'default_level' applies to sites without a rule of their own.
+    """
+
+    def __init__(self, default_level: str = OFF, path: Path = DATA_SAVER_FILE):
+        self.path = Path(path)
+        self.default_level = default_level if default_level in LEVELS else OFF
+        self._rules: dict[str, str] = {}
+        self._trie = SuffixTrie()
+        self._cache: dict[str, str] = {}
+        # first-party host -> fonts seen since its last main-frame load
+        self._fonts: dict[str, int] = {}
+        self.blocked: dict[str, int] = {}
+        self.saved_bytes = 0
+        self.saved_by_site: dict[str, int] = {}
+        self._load()
+
+    # ---------- persistence ----------
+    def _load(self):
+        try:
+            if not self.path.exists():
+                return
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            for host, level in (data.get("sites") or {}).items():
+                if level in LEVELS:
+                    self._rules[host] = level
+            self._rebuild()
+        except Exception as e:
+            vlog("[DataSaver] load failed:", e)
+
+    def save(self):
+        try:
+            self.path.write_text(json.dumps({"sites": self._rules}), encoding="utf-8")
+        except Exception as e:
+            vlog("[DataSaver] save failed:", e)
+
+    def _rebuild(self):
+        trie = SuffixTrie()
+        for host, level in self._rules.items():
+            trie.insert(host, level, include_subdomains=True)
+        self._trie = trie
+        self._cache = {}
+
+    # ---------- levels ----------
+    def site_rule(self, host: str) -> str | None:
+        """The level set for 'host' or a parent domain, None if unset."""
+        return self._trie.lookup(host)
+
+    def level_for(self, host: str) -> str:
+        h = (host or "").lower().strip(".")
+        level = self._cache.get(h)
+        if level is None:
+            level = self._trie.lookup(h) or self.default_level
+            if len(self._cache) >= MAX_CACHED_HOSTS:
+                self._cache.clear()
+            self._cache[h] = level
+        return level
+
+    def set_site(self, host: str, level: str | None):
+        """Set (or with None, clear) the level for 'host' and its subdomains."""
+        h = (host or "").lower().strip(".")
+        if not h:
+            return
+        if level in LEVELS:
+            self._rules[h] = level
+        else:
+            self._rules.pop(h, None)
+        self._rebuild()
+        self.save()
+
+    def set_default(self, level: str):
+        if level in LEVELS:
+            self.default_level = level
+            self._cache = {}
+
+    # ---------- interceptor ----------
+    def page_started(self, first_party_host: str):
+        """A main frame for this site is loading: restart its font count."""
+        self._fonts.pop((first_party_host or "").lower(), None)
+
+    def decide(self, first_party_host: str, kind: str, path: str, query: str = "") -> bool:
+        """
+        True if this request should be held back. 'kind' is one of MEDIA,
+        IMAGE, FONT, PREFETCH (anything else is never held back).
+        """
+        fp = (first_party_host or "").lower()
+        policy = POLICIES[self.level_for(fp)]
+        if policy.name == OFF:
+            return False
+
+        if kind == MEDIA:
+            block = policy.media
+        elif kind == PREFETCH:
+            block = policy.prefetch
+        elif kind == IMAGE:
+            block = self._block_image(policy, path, query)
+        elif kind == FONT:
+            if policy.font_limit is None:
+                return False
+            seen = self._fonts.get(fp, 0) + 1
+            self._fonts[fp] = seen
+            block = seen > policy.font_limit
+        else:
+            return False
+
+        if block:
+            self._count(fp, kind, path + ("?" + query if query else ""))
+        return block
+
+    @staticmethod
+    def _block_image(policy: SaverPolicy, path: str, query: str) -> bool:
+        if _is_small_image(path):
+            return False
+        dims = image_size_hint(path + "?" + query) if policy.large_images else None
+        if dims:
+            return max(dims) >= DATA_SAVER_LARGE_IMAGE_PX
+        return policy.all_images and path.lower().endswith(_RASTER_EXT)
+
+    def _count(self, fp: str, kind: str, url_tail: str):
+        est = estimate_bytes(kind, url_tail)
+        self.blocked[kind] = self.blocked.get(kind, 0) + 1
+        self.saved_bytes += est
+        self.saved_by_site[fp] = self.saved_by_site.get(fp, 0) + est
+        METRICS.incr(f"datasaver.blocked_{kind}")
+        METRICS.incr("datasaver.saved_bytes", est)
+
+    # ---------- reporting ----------
+    def stats(self) -> dict:
+        top = sorted(self.saved_by_site.items(), key=lambda kv: kv[1], reverse=True)[:5]
+        out = {
+            "default_level": self.default_level,
+            "site_rules": len(self._rules),
+            "saved_bytes": self.saved_bytes,
+        }
+        for kind, n in sorted(self.blocked.items()):
+            out[f"blocked_{kind}"] = n
+        for host, n in top:
+            out[f"saved:{host or '?'}"] = n
+        return out
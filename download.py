@@ -5,11 +5,21 @@
 # Copyright (c) 2015 JJ Posti
 # GPL v2 (June 1991).
 
+import hashlib
+import json
+import math
 import os
+import random
 import sys
 import time
 import re
 
+from metrics import METRICS
+from net_session import NET
+from download_writer import FileWriter, wait_all
+from bandwidth import LIMITER
+from download_index import INDEX, link_existing
+
 # -------- Qt compat imports --------
 try:
     from PyQt6 import QtCore, QtWidgets, QtNetwork
@@ -55,6 +65,16 @@ def REDIRECT_ATTR():
     )
 
 
+def HTTP_STATUS_ATTR():
+    # Qt5: QNetworkRequest.HttpStatusCodeAttribute
+    # Qt6: QNetworkRequest.Attribute.HttpStatusCodeAttribute
+    return getattr(
+        QNetworkRequest,
+        "HttpStatusCodeAttribute",
+        getattr(QNetworkRequest.Attribute, "HttpStatusCodeAttribute"),
+    )
+
+
 def CONTENT_LENGTH_HEADER():
     # Qt5: QNetworkRequest.ContentLengthHeader
     # Qt6: QNetworkRequest.KnownHeaders.ContentLengthHeader
@@ -79,6 +99,15 @@ def APP_EXEC(app):
     return app.exec() if hasattr(app, "exec") else app.exec_()
 
 
+# Same switch as qt_compat.vlog (this module avoids the WebEngine imports)
+VERBOSE = os.environ.get("RUNIT_VERBOSE", "1") != "0"
+
+
+def vlog(*args):
+    if VERBOSE:
+        print(*args, flush=True)
+
+
 sys.dont_write_bytecode = True
 
 # -------- MIME → extension map --------
@@ -200,17 +229,320 @@ def _append_extension_if_missing(filename: str, mime: str) -> str:
     return base + ext_guess
 
 
-class DownloadDialog(QDialog):
-    def __init__(self, parent=None, preset_url: str = ""):
+# -------- transfer core (no UI) --------
+
+# Queue priorities (lower runs first)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_HIGH: "High", PRIORITY_NORMAL: "Normal", PRIORITY_LOW: "Low"}
+
+
+def unique_path(path: str, taken=()) -> str:
+    """
+    Return 'path', or 'name (1).ext', 'name (2).ext', ... if it already
+    exists on disk or is in 'taken'.
+    """
+    if not os.path.exists(path) and path not in taken:
+        return path
+    base, ext = os.path.splitext(path)
+    n = 1
+    while True:
+        cand = f"{base} ({n}){ext}"
+        if not os.path.exists(cand) and cand not in taken:
+            return cand
+        n += 1
+
+
+# Automatic retry of transient network errors (resumes from the .part file)
+RETRY_LIMIT = 5
+RETRY_BASE_S = 1.0
+RETRY_MAX_S = 30.0
+
+# How often the resume sidecar is rewritten while data flows (seconds)
+STATE_SAVE_INTERVAL = 1.0
+
+# Network errors worth retrying; HTTP 408/429/5xx are retried as well
+TRANSIENT_ERRORS = (
+    "RemoteHostClosedError",
+    "TimeoutError",
+    "TemporaryNetworkFailureError",
+    "NetworkSessionFailedError",
+    "UnknownNetworkError",
+    "ProxyConnectionClosedError",
+    "ProxyTimeoutError",
+    "ConnectionRefusedError",
+    "HostNotFoundError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "UnknownServerError",
+)
+
+
+def _net_error(name: str):
+    # Qt5: QNetworkReply.<Name>; Qt6: QNetworkReply.NetworkError.<Name>
+    enum = getattr(QNetworkReply, "NetworkError", None)
+    return getattr(enum, name, getattr(QNetworkReply, name, None))
+
+
+def _parse_content_range(value) -> tuple[int, int]:
+    """
+    'bytes 100-199/1000' -> (100, 1000). Unknown parts are -1.
+    """
+    try:
+        v = bytes(value).decode("latin-1").strip()
+        unit, _, rest = v.partition(" ")
+        if unit.lower() != "bytes":
+            return -1, -1
+        rng, _, total = rest.partition("/")
+        start = int(rng.split("-", 1)[0])
+        return start, (int(total) if total.strip() not in ("", "*") else -1)
+    except Exception:
+        return -1, -1
+
+
+def state_path(tmp_path: str) -> str:
+    """Resume metadata sidecar for a '.part' file."""
+    return tmp_path + ".json"
+
+
+def read_resume_state(tmp_path: str) -> dict | None:
+    """
+    Return the saved resume state for 'tmp_path' ({"url", "etag",
+    "last_modified", "bytes", "total"}), or None if missing or unusable.
+    """
+    try:
+        with open(state_path(tmp_path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        size = os.path.getsize(tmp_path)
+        if not isinstance(meta, dict) or int(meta.get("bytes", 0)) <= 0:
+            return None
+        # Never trust more bytes than the file holds
+        meta["bytes"] = min(int(meta["bytes"]), size)
+        return meta
+    except Exception:
+        return None
+
+
+def write_resume_state(tmp_path: str, meta: dict):
+    """Atomically (re)write the sidecar."""
+    path = state_path(tmp_path)
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+    except Exception:
+        pass
+
+
+# Digests computed while the data streams in (the expected hash's algorithm
+# is added automatically)
+HASH_ALGOS = ("sha256",)
+# Hex digest length -> algorithm, for hashes pasted without a prefix
+_HASH_LENGTHS = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+# Look for '<url>.sha256' next to each download when no hash was given
+CHECKSUM_DISCOVERY = True
+CHECKSUM_PROBE_TIMEOUT_MS = 8000
+
+# Write, hash, fsync and rename on a background thread (download_writer.py);
+# False keeps all file I/O on the GUI thread
+WRITER_THREAD = True
+
+# Adaptive I/O: each read takes about READ_TARGET_S of data at the measured
+# rate (between DownloadTransfer.CHUNK and MAX_CHUNK, doubling/halving), and
+# the reply's read buffer holds READBUF_CHUNKS reads. MAX_READBUF is the
+# ceiling per transfer (split between the connections of a segmented one).
+# False keeps the fixed 64 KiB reads / 256 KiB buffer.
+ADAPTIVE_IO = True
+READ_TARGET_S = 0.02
+MAX_CHUNK = 1024 * 1024
+READBUF_CHUNKS = 4
+MAX_READBUF = 4 * 1024 * 1024
+# Time constant of the smoothed speed (seconds)
+SPEED_TAU_S = 3.0
+# Slowest progress cadence (slow links: about one 0.1 % step per signal)
+UI_INTERVAL_MAX = 0.5
+
+
+def parse_expected_hash(text: str) -> tuple[str, str] | None:
+    """
+    'sha256:ab12…', 'SHA-256=ab12…' or a bare hex digest -> (algo, hex).
+    None if empty or not recognisable.
+    """
+    t = (text or "").strip()
+    algo = ""
+    for sep in (":", "="):
+        if sep in t:
+            algo, _, t = t.partition(sep)
+            algo = algo.strip().lower().replace("-", "")
+            t = t.strip()
+            break
+    t = t.lower()
+    if not t or any(c not in "0123456789abcdef" for c in t):
+        return None
+    algo = algo or _HASH_LENGTHS.get(len(t), "")
+    if algo not in hashlib.algorithms_available:
+        return None
+    try:
+        if len(t) != hashlib.new(algo).digest_size * 2:
+            return None
+    except Exception:
+        return None
+    return algo, t
+
+
+def parse_checksum_file(text: str, filename: str) -> str | None:
+    """
+    Find the digest for 'filename' in a checksum file: 'hex  name',
+    'hex *name', 'SHA256 (name) = hex', or a single bare digest.
+    """
+    found = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = re.match(r"^[A-Za-z0-9-]+ \((.+)\) = ([0-9a-fA-F]+)$", line)
+        if m:
+            name, digest = m.group(1), m.group(2)
+        else:
+            digest, _, name = line.partition(" ")
+            name = name.strip().lstrip("*")
+        if not re.fullmatch(r"[0-9a-fA-F]{32,128}", digest):
+            continue
+        if name and os.path.basename(name) == filename:
+            return digest.lower()
+        found.append(digest.lower())
+    return found[0] if len(found) == 1 else None
+
+
+class SpeedEstimator:
+    """
+    Exponentially smoothed transfer rate. Each update() weights the rate
+    since the previous one by 1 - exp(-dt / tau), so irregular update
+    intervals don't bias it and one slow burst doesn't swing the ETA.
+    """
+
+    MIN_DT = 0.05
+
+    def __init__(self, tau_s: float = SPEED_TAU_S):
+        self.tau_s = tau_s
+        self.bps = 0.0
+        self._t = None
+        self._bytes = 0
+        self._primed = False
+
+    def reset(self, received: int, now: float | None = None):
+        """Start a new measuring run (after a (re)connect or resume)."""
+        self._t = time.time() if now is None else now
+        self._bytes = received
+        self._primed = False
+
+    def update(self, received: int, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        if self._t is None:
+            self.reset(received, now)
+            return self.bps
+        dt = now - self._t
+        if dt < self.MIN_DT:
+            return self.bps
+        inst = max(0.0, (received - self._bytes) / dt)
+        self._t, self._bytes = now, received
+        if not self._primed:
+            # First sample of a run: no history worth blending with
+            self.bps = inst
+            self._primed = True
+        else:
+            self.bps += (1.0 - math.exp(-dt / self.tau_s)) * (inst - self.bps)
+        return self.bps
+
+    def eta_s(self, remaining: int) -> float:
+        return max(0.0, remaining / self.bps) if remaining > 0 and self.bps > 0 else 0.0
+
+
+def remove_partial(tmp_path: str):
+    """Delete a '.part' file and its sidecar."""
+    for p in (tmp_path, state_path(tmp_path)):
+        try:
+            if p and os.path.exists(p):
+                os.remove(p)
+        except Exception:
+            pass
+
+
+class DownloadTransfer(QtCore.QObject):
+    """
+    One streaming HTTP download into '<path>.part', renamed to its final
+    name when complete.
+
+    Has no UI: progress and outcome are reported through signals so the
+    DownloadDialog or the download manager panel can drive it. Progress is
+    emitted every UI_INTERVAL seconds, less often (up to UI_INTERVAL_MAX)
+    on slow links where the bar would barely move; speed and ETA come from
+    a SpeedEstimator.
+
+    With ADAPTIVE_IO the read size and the reply's read buffer follow the
+    smoothed speed: fast links use few large reads instead of thousands of
+    64 KiB ones, and memory stays within MAX_READBUF per transfer.
+
+    pause() stops draining the reply; with the bounded read buffer Qt then
+    stops reading the socket, so the server is throttled by TCP flow control
+    instead of the data piling up in memory.
+
+    Resume: next to the '.part' file a '.part.json' sidecar records the URL,
+    validators (ETag / Last-Modified) and bytes written. A later start() for
+    the same URL and path continues with Range/If-Range; if the server
+    answers with the full body instead, the file is restarted from zero.
+    Transient network errors are retried with exponential backoff. Errors
+    keep the partial file; only cancel() deletes it.
+
+    File I/O goes through a download_writer.FileWriter: chunks are queued
+    to a worker thread that coalesces them into large writes and does the
+    fsync and rename, so a slow disk can't freeze the UI. While the writer
+    is congested the reply isn't drained (same backpressure as pause()).
+
+    Checksums: the writer hashes the data in file order (HASH_ALGOS), so
+    'digests' is ready at completion without reading the file again. An
+    expected hash, given by the caller or found in a sibling
+    '<url>.sha256', is checked before the rename; a mismatch fails the
+    download and deletes the data.
+    """
+
+    # (received, total); total is -1 while unknown
+    progress = QtCore.pyqtSignal(object, object)
+    stateChanged = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal(str)   # final path
+    failed = QtCore.pyqtSignal(str)     # error message
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    # Memory/IO controls (starting / minimum values with ADAPTIVE_IO)
+    CHUNK = 64 * 1024         # 64 KiB read/write chunks
+    READBUF = 256 * 1024      # 256 KiB Qt internal buffer cap
+    UI_INTERVAL = 0.10        # seconds between progress signals
+
+    # Failed/cancelled transfers can be queued again (engine downloads can't)
+    can_retry = True
+
+    def __init__(self, url, path: str, priority: int = PRIORITY_NORMAL,
+                 manager=None, overwrite: bool = True, parent=None,
+                 expected_hash: str | None = None, hash_algos=HASH_ALGOS):
         super().__init__(parent)
-        self.setWindowTitle("Download")
-        self.setFixedSize(480, 260)
+        self.url = url if isinstance(url, QUrl) else QUrl(str(url))
+        self.final_path = path
+        self.tmp_path = path + ".part"
+        self.priority = priority
+        self.overwrite = overwrite
+        self.manager = manager
+        self.state = self.QUEUED
+        self.error = ""
 
-        self.manager = None
         self.reply = None
         self.file = None
-        self.tmp_path = None
-        self.final_path = None
         self.start_time = None
         self.redirects = 0
         self.max_redirects = 5
@@ -219,18 +551,792 @@ class DownloadDialog(QDialog):
             b"(KHTML, like Gecko) RunIT-QT Downloader Safari/538.1"
         )
 
-        # Memory/IO controls
-        self.CHUNK = 64 * 1024         # 64 KiB read/write chunks
-        self.READBUF = 256 * 1024      # 256 KiB Qt internal buffer cap
-        self._last_ui_update = 0.0     # throttle progress updates
-        self._ui_interval = 0.10       # seconds
-        self._bytes_received = 0       # local counter (robust even if progress signal skipped)
-        self._total_bytes = -1         # from Content-Length, if known
+        self.received = 0          # bytes in the .part file (robust even if progress signal skipped)
+        self.total = -1            # full size, if known
+        self.offset = 0            # where the current request started
+        self.speed_bps = 0.0
+        self.chunk = self.CHUNK    # current read size
+        self.readbuf = self.READBUF
+        self._speed = SpeedEstimator()
+        self.attempt = 0           # automatic retries since the last progress
+        self.resumed_from = 0      # offset of the first successful resume
+        self._etag = ""
+        self._last_modified = ""
+        self._saved_total = -1
+        self._last_emit = 0.0
+        self._last_state_save = 0.0
+        self._session_bytes0 = 0
         self._preallocated = False
+        self._skip_body = False
+        self._finish_pending = False
+        self._reconnect_on_resume = False
+        self._resume_state = None     # sidecar read by start(), if any
+        self._error_msg = ""
+
+        self._retry_timer = QtCore.QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._retry_now)
 
         # MIME type from headers (used to append extension)
         self._mime = ""
 
+        # Streaming checksums
+        self.expected_hash = parse_expected_hash(expected_hash) if expected_hash else None
+        self.hash_source = "given" if self.expected_hash else ""
+        self.digests: dict[str, str] = {}
+        self.verified = None          # True once checked against expected_hash
+        self._hash_algos = tuple(hash_algos or ())
+        self._hash_probe = None
+        self._writer = None
+        self._finishing = False
+        self._finalize_pending = False
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.final_path)
+
+    @property
+    def retrying(self) -> bool:
+        return self._retry_timer.isActive()
+
+    @property
+    def etag(self) -> str:
+        """Validator of the resource as last seen (for the download index)."""
+        return self._etag
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            if state != self.RUNNING:
+                LIMITER.forget(self)
+            self.stateChanged.emit(state)
+
+    # ---------- control ----------
+    def start(self):
+        """Open '<path>.part' (resuming it if possible) and issue the request."""
+        if self.state != self.QUEUED:
+            return
+        try:
+            d = os.path.dirname(self.final_path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            meta = read_resume_state(self.tmp_path)
+            if meta and meta.get("url") != self.url.toString():
+                meta = None
+            self._resume_state = meta
+            if meta:
+                # open in binary, unbuffered, without truncating
+                self.file = open(self.tmp_path, "r+b", buffering=0)
+                self.received = meta["bytes"]
+                self._etag = meta.get("etag") or ""
+                self._last_modified = meta.get("last_modified") or ""
+                self._saved_total = int(meta.get("total") or -1)
+                self.total = self._saved_total
+            else:
+                # binary, unbuffered; readable so the writer can hash
+                # out-of-order data back from the page cache
+                self.file = open(self.tmp_path, "w+b", buffering=0)
+                self.received = 0
+                self._etag = self._last_modified = ""
+                self._saved_total = -1
+        except Exception as e:
+            self._fail(f"Cannot open file:\n{e}")
+            return
+        algos = set(self._hash_algos)
+        if self.expected_hash:
+            algos.add(self.expected_hash[0])
+        self._writer = FileWriter(self.file, prefix=self.received, algos=algos,
+                                  threaded=WRITER_THREAD, parent=self)
+        self._writer.drained.connect(self._on_ready_read)
+        self._writer.failed.connect(lambda m: self._fail(f"I/O write error:\n{m}"))
+        self._writer.done.connect(self._on_written)
+        self.redirects = 0
+        self.attempt = 0
+        self._set_state(self.RUNNING)
+        self._kickoff_request(self.url)
+        self._probe_checksum()
+
+    def pause(self):
+        if self.state == self.RUNNING:
+            self._set_state(self.PAUSED)
+            self.speed_bps = 0.0
+            self._save_state()
+            self._emit_progress(force=True)
+
+    def resume(self):
+        if self.state != self.PAUSED:
+            return
+        self._set_state(self.RUNNING)
+        self._speed.reset(self.received)
+        if self._reconnect_on_resume:
+            # The connection was dropped while paused: continue with Range
+            self._reconnect_on_resume = False
+            self._kickoff_request(self.url)
+            return
+        self._on_ready_read()
+        if self._finish_pending:
+            self._finish_pending = False
+            self._on_finished(self.reply)
+
+    def requeue(self) -> bool:
+        """Mark a failed or cancelled transfer as queued again."""
+        if self.state not in (self.FAILED, self.CANCELLED):
+            return False
+        self.error = ""
+        self._set_state(self.QUEUED)
+        return True
+
+    def cancel(self):
+        """Abort and remove the partial file."""
+        if self.state in (self.DONE, self.CANCELLED):
+            return
+        self._set_state(self.CANCELLED)
+        self._retry_timer.stop()
+        self._drop_reply()
+        self._cleanup(keep_partial=False)
+
+    def suspend(self, message: str = "Interrupted"):
+        """Stop but keep the partial file for a later resume (app exit)."""
+        if self.state in (self.DONE, self.CANCELLED, self.FAILED, self.QUEUED):
+            return
+        self._retry_timer.stop()
+        self.error = message
+        self._set_state(self.FAILED)
+        self._drop_reply()
+        self._cleanup(keep_partial=True)
+
+    # ---------- network ----------
+    def _kickoff_request(self, url: QUrl):
+        if self.manager is None:
+            self.manager = NET.manager("downloads")
+
+        self.offset = self.received
+        req = QNetworkRequest(url)
+        req.setRawHeader(b"User-Agent", self.user_agent)
+        if self.offset > 0:
+            req.setRawHeader(b"Range", f"bytes={self.offset}-".encode("ascii"))
+            # If-Range needs a strong validator; weak ETags can't be used
+            validator = self._etag if self._etag and not self._etag.startswith("W/") \
+                else self._last_modified
+            if validator:
+                req.setRawHeader(b"If-Range", validator.encode("latin-1", "replace"))
+
+        reply = self.reply = NET.track(self.manager.get(NET.prepare(req)),
+                                       NET.purpose_of(self.manager))
+
+        # Limit the internal read buffer to keep RAM bounded
+        try:
+            reply.setReadBufferSize(self.readbuf)
+        except Exception:
+            pass
+
+        # Signals (bound to this reply, so a stale one can't touch the next)
+        reply.readyRead.connect(self._on_ready_read)
+        reply.downloadProgress.connect(
+            lambda rec, tot, r=reply: r is self.reply and self._on_progress(rec, tot)
+        )
+        reply.finished.connect(lambda r=reply: self._on_finished(r))
+        if hasattr(reply, "metaDataChanged"):
+            reply.metaDataChanged.connect(lambda r=reply: self._on_headers(r))
+        if hasattr(reply, "errorOccurred"):
+            reply.errorOccurred.connect(self._on_error)
+        else:
+            reply.error.connect(self._on_error)
+
+        self.start_time = time.time()
+        self._session_bytes0 = self.received
+        self._speed.reset(self.received, self.start_time)
+        self._last_emit = 0.0
+        self._preallocated = False
+        self._skip_body = False
+        self._error_msg = ""
+        self._mime = ""
+        self._emit_progress(force=True)
+
+    def _drop_reply(self):
+        """Forget the current reply (its late signals are ignored)."""
+        r, self.reply = self.reply, None
+        if r is not None:
+            try:
+                r.abort()
+            except Exception:
+                pass
+            r.deleteLater()
+
+    def _restart_from_zero(self, reason: str):
+        """The server won't resume: discard the partial data and refetch."""
+        vlog(f"[Download] {self.name}: restarting from zero ({reason})")
+        METRICS.incr("download.range_ignored")
+        self._drop_reply()
+        self._writer.truncate(0)
+        self._preallocated = False
+        self.received = 0
+        self.total = self._saved_total = -1
+        self._etag = self._last_modified = ""
+        self._resume_state = None
+        self._kickoff_request(self.url)
+
+    # Grab headers early for status, range, validators, Content-Length and MIME type
+    def _on_headers(self, reply):
+        if reply is not self.reply:
+            return
+        try:
+            status = int(reply.attribute(HTTP_STATUS_ATTR()) or 0)
+        except Exception:
+            status = 0
+        # Redirect or error bodies are never written to the file
+        self._skip_body = status >= 300
+        if self._skip_body:
+            return
+
+        if self.offset > 0:
+            if status == 206:
+                start, full = _parse_content_range(reply.rawHeader(b"Content-Range"))
+                if start != self.offset or (self._saved_total > 0 and full > 0
+                                            and full != self._saved_total):
+                    self._restart_from_zero("range mismatch")
+                    return
+                if not self.resumed_from:
+                    self.resumed_from = self.offset
+                METRICS.incr("download.resumed")
+                if full > 0:
+                    self.total = full
+                    self._maybe_preallocate(full)
+            elif status == 200:
+                # Range ignored (or If-Range failed): full body follows
+                self.received = self.offset = 0
+                self._resume_state = None
+                METRICS.incr("download.range_ignored")
+                self._writer.truncate(0)
+                self._preallocated = False
+
+        try:
+            etag = bytes(reply.rawHeader(b"ETag")).decode("latin-1").strip()
+            lm = bytes(reply.rawHeader(b"Last-Modified")).decode("latin-1").strip()
+            if etag or lm:
+                self._etag, self._last_modified = etag, lm
+        except Exception:
+            pass
+
+        # Content-Length (of this response; the rest of the file for a 206)
+        if status != 206 or self.total <= 0:
+            try:
+                hdr = CONTENT_LENGTH_HEADER()
+                if hdr is not None:
+                    v = reply.header(hdr)
+                    if v is not None:
+                        try:
+                            total = self.offset + int(v)
+                            self.total = total
+                            self._maybe_preallocate(total)
+                        except Exception:
+                            pass
+            except Exception:
+                pass
+
+        # Content-Type → MIME string
+        try:
+            hct = CONTENT_TYPE_HEADER()
+            if hct is not None:
+                v = reply.header(hct)
+            else:
+                v = None
+            if v is not None:
+                self._mime = str(v)
+        except Exception:
+            pass
+        self._save_state(force=True)
+
+    def _maybe_preallocate(self, total: int):
+        # posix_fallocate (or a sparse ftruncate) on the writer thread;
+        # failures there are ignored
+        if self._preallocated or total <= 0 or not self._writer:
+            return
+        self._writer.allocate(total)
+        self._preallocated = True
+
+    def _on_ready_read(self):
+        # Paused: leave data in the (bounded) reply buffer
+        if self.state != self.RUNNING or not (self.reply and self._writer):
+            return
+        w = self._writer
+        try:
+            # Writer congested: leave data in the (bounded) reply buffer
+            # until it reports 'drained'
+            while not w.congested:
+                # limit each read to the current chunk size to avoid large
+                # intermediate buffers
+                n = self.chunk
+                budget = None if self._skip_body else LIMITER.allowance(self)
+                if budget is not None:
+                    if budget <= 0:
+                        # Over the rate cap: stop reading; the full reply
+                        # buffer slows the sender until credit returns
+                        if self.reply.bytesAvailable() > 0:
+                            LIMITER.wait(self, self._on_ready_read)
+                        break
+                    n = min(n, budget)
+                data = self.reply.read(n)
+                if not data:
+                    break
+                if self._skip_body:
+                    continue
+                LIMITER.consume(self, len(data))
+                w.write(data, self.received)
+                self.received += len(data)
+        except Exception as e:
+            self._fail(f"I/O write error:\n{e}")
+            return
+        if self.received > self._session_bytes0:
+            self.attempt = 0
+        self._save_state()
+        self._emit_progress()
+        if self._finish_pending and not w.congested and self.reply.bytesAvailable() == 0:
+            # The reply finished while the writer was congested
+            self._finish_pending = False
+            self._on_finished(self.reply)
+
+    def _on_progress(self, received: int, total: int):
+        # Update total once when known
+        if total > 0 and self.total < self.offset + total:
+            self.total = self.offset + total
+            self._maybe_preallocate(self.total)
+
+    def _ui_interval(self) -> float:
+        if self.total > 0 and self.speed_bps > 0:
+            # No more often than the bar moves by 0.1 %, within bounds
+            step_s = self.total / 1000.0 / self.speed_bps
+            return min(UI_INTERVAL_MAX, max(self.UI_INTERVAL, step_s))
+        return self.UI_INTERVAL
+
+    def _emit_progress(self, force: bool = False):
+        # Throttle to ~10 Hz (less on slow links)
+        now = time.time()
+        if not force and (now - self._last_emit) < self._ui_interval():
+            return
+        self._last_emit = now
+        if self.state == self.RUNNING and self.start_time and not self.retrying:
+            self.speed_bps = self._speed.update(self.received, now)
+            METRICS.set("download.speed_bps", int(self.speed_bps))
+            self._tune_io()
+        self.progress.emit(self.received, self.total)
+
+    def eta_s(self) -> float:
+        if self.total > 0:
+            return self._speed.eta_s(self.total - self.received)
+        return 0.0
+
+    # ---------- adaptive I/O ----------
+    def _replies(self) -> list:
+        return [self.reply] if self.reply is not None else []
+
+    def _tune_io(self):
+        """Size reads and the read buffer(s) for the smoothed speed."""
+        if not ADAPTIVE_IO:
+            return
+        want = self.speed_bps * READ_TARGET_S
+        chunk = self.chunk
+        while chunk < MAX_CHUNK and chunk < want:
+            chunk *= 2
+        while chunk > self.CHUNK and chunk > 2 * want:
+            chunk //= 2
+        replies = self._replies()
+        per_conn = MAX_READBUF // max(1, len(replies))
+        readbuf = max(self.READBUF, min(chunk * READBUF_CHUNKS, per_conn))
+        self.chunk = min(chunk, readbuf)
+        if readbuf != self.readbuf:
+            self.readbuf = readbuf
+            METRICS.set("download.readbuf_bytes", readbuf)
+            for r in replies:
+                try:
+                    r.setReadBufferSize(readbuf)
+                except Exception:
+                    pass
+
+    def _save_state(self, force: bool = False):
+        """Rewrite the resume sidecar (at most every STATE_SAVE_INTERVAL)."""
+        now = time.time()
+        if not self._writer or self.received <= 0:
+            return
+        if not force and now - self._last_state_save < STATE_SAVE_INTERVAL:
+            return
+        self._last_state_save = now
+        # Written by the writer thread after the data it describes
+        self._writer.call(lambda p=self.tmp_path, m=self._resume_meta(): write_resume_state(p, m))
+
+    def _resume_meta(self) -> dict:
+        """Sidecar contents; 'bytes' is the contiguous prefix on disk."""
+        return {
+            "url": self.url.toString(),
+            "etag": self._etag,
+            "last_modified": self._last_modified,
+            "bytes": self.received,
+            "total": self.total,
+        }
+
+    # ---------- checksums ----------
+    def _probe_checksum(self):
+        """Look for '<url>.sha256' unless a hash was given."""
+        if self.expected_hash or not CHECKSUM_DISCOVERY or self._hash_probe is not None:
+            return
+        if self.url.scheme().lower() not in ("http", "https") or not self.url.fileName():
+            return
+        u = QUrl(self.url)
+        u.setPath(u.path() + ".sha256")
+        req = QNetworkRequest(u)
+        req.setRawHeader(b"User-Agent", self.user_agent)
+        follow = getattr(QNetworkRequest, "FollowRedirectsAttribute", None)
+        if follow is not None:
+            req.setAttribute(follow, True)  # Qt5 (Qt6 follows safe redirects)
+        reply = self._hash_probe = NET.track(self.manager.get(NET.prepare(req)),
+                                             NET.purpose_of(self.manager))
+        QtCore.QTimer.singleShot(CHECKSUM_PROBE_TIMEOUT_MS,
+                                 lambda r=reply: r is self._hash_probe and r.abort())
+        # A checksum file is tiny; don't buffer some unrelated large page
+        reply.downloadProgress.connect(
+            lambda rec, tot, r=reply: (rec > 65536 or tot > 65536) and r.abort()
+        )
+        reply.finished.connect(lambda r=reply: self._on_checksum_probe(r))
+
+    def _on_checksum_probe(self, reply):
+        if reply is not self._hash_probe:
+            return
+        self._hash_probe = None
+        try:
+            status = int(reply.attribute(HTTP_STATUS_ATTR()) or 0)
+            ok = reply.error() == (_net_error("NoError") or 0)
+            if ok and status == 200 and not self.expected_hash:
+                text = bytes(reply.read(64 * 1024)).decode("utf-8", "replace")
+                digest = parse_checksum_file(text, self.url.fileName())
+                found = parse_expected_hash(f"sha256:{digest}") if digest else None
+                if found:
+                    self.expected_hash = found
+                    self.hash_source = "sibling"
+                    METRICS.incr("download.checksum_found")
+                    vlog(f"[Download] {self.name}: checksum from {reply.url().toString()}")
+        except Exception:
+            pass
+        reply.deleteLater()
+        if self._finalize_pending:
+            self._finalize_pending = False
+            if self.state == self.RUNNING:
+                self._finalize()
+
+    # ---------- completion / retry ----------
+    def _is_transient(self, err, status: int) -> bool:
+        if status in (408, 429) or 500 <= status < 600:
+            return True
+        return any(err == _net_error(n) for n in TRANSIENT_ERRORS if _net_error(n) is not None)
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Exponential backoff with up to 25% jitter (seconds)."""
+        delay = min(RETRY_MAX_S, RETRY_BASE_S * (2 ** attempt))
+        return delay * (1.0 + random.random() * 0.25)
+
+    def _schedule_retry(self, why: str) -> bool:
+        """Back off and retry from the current offset; False when out of attempts."""
+        if self.attempt >= RETRY_LIMIT:
+            return False
+        delay = self._backoff_delay(self.attempt)
+        self.attempt += 1
+        METRICS.incr("download.retries")
+        vlog(f"[Download] {self.name}: {why}; retry {self.attempt}/{RETRY_LIMIT} in {delay:.1f}s")
+        self._drop_reply()
+        self._save_state(force=True)
+        self.speed_bps = 0.0
+        self._emit_progress(force=True)
+        self._retry_timer.start(int(delay * 1000))
+        return True
+
+    def _retry_now(self):
+        if self.state == self.RUNNING:
+            self._kickoff_request(self.url)
+        elif self.state == self.PAUSED:
+            self._reconnect_on_resume = True
+
+    def _on_finished(self, reply=None):
+        if reply is None or reply is not self.reply:
+            return  # stale reply (restarted, retried or cancelled)
+        if self.state in (self.CANCELLED, self.FAILED, self.DONE):
+            return
+
+        noerr_enum = _net_error("NoError") or 0
+        current_err = reply.error() if hasattr(reply, "error") else noerr_enum
+        try:
+            status = int(reply.attribute(HTTP_STATUS_ATTR()) or 0)
+        except Exception:
+            status = 0
+
+        if self.state == self.PAUSED:
+            if current_err != noerr_enum:
+                # Connection dropped while paused; reconnect on resume
+                self._drop_reply()
+                self._save_state(force=True)
+                self._reconnect_on_resume = True
+            else:
+                # Finish once the buffered tail has been drained
+                self._finish_pending = True
+            return
+
+        # Follow redirects?
+        try:
+            redir_attr = REDIRECT_ATTR()
+            attr = reply.attribute(redir_attr)
+        except Exception:
+            attr = None
+
+        if attr:
+            self.redirects += 1
+            if self.redirects > self.max_redirects:
+                self._fail("Too many redirects.")
+                return
+            target = attr if isinstance(attr, QUrl) else QUrl(str(attr))
+            if target.isRelative():
+                target = reply.url().resolved(target)
+            self._drop_reply()
+            self._kickoff_request(target)
+            return
+
+        if status == 416 and self.offset > 0:
+            # Saved range no longer valid for this resource
+            self._restart_from_zero("range not satisfiable")
+            return
+
+        if current_err != noerr_enum:
+            msg = self._error_msg or f"Network error: {current_err}"
+            if self._is_transient(current_err, status) and self._schedule_retry(msg):
+                return
+            self._fail(msg)
+            return
+
+        # Flush any pending bytes
+        self._on_ready_read()
+        if self.state != self.RUNNING:
+            return
+        if reply.bytesAvailable() > 0:
+            # Writer congested or over the rate cap: finish once drained
+            self._finish_pending = True
+            return
+        if self.total > 0 and self.received < self.total and not self._skip_body:
+            # Connection closed early without an error
+            if self._schedule_retry(f"short body ({self.received}/{self.total})"):
+                return
+            self._fail(f"Incomplete download: {self.received} of {self.total} bytes.")
+            return
+        self._finalize()
+
+    def _finalize(self):
+        """Hand trim/verify/fsync/rename to the writer; _on_written reports."""
+        if self._hash_probe is not None:
+            # A sibling checksum may still arrive; check it before the rename
+            self._finalize_pending = True
+            return
+        if self._finishing or not self._writer:
+            return
+        # Decide final filename (append extension if missing using MIME)
+        dirpath, base = os.path.split(self.final_path)
+        dirpath = dirpath or default_download_dir()
+        safe_base = _sanitize_filename(base or "download")
+        safe_base = _append_extension_if_missing(safe_base, self._mime)
+        final_path = os.path.join(dirpath, safe_base)
+        if not self.overwrite and final_path != self.final_path:
+            final_path = unique_path(final_path)
+        self._finishing = True
+        self._writer.finish(self.received, self.expected_hash, self.tmp_path, final_path)
+
+    def _on_written(self, result: dict):
+        """The writer has finished the file (or failed to)."""
+        self._finishing = False
+        if self.state != self.RUNNING:
+            return
+        if result.get("error"):
+            self._fail(f"I/O finalize error:\n{result['error']}")
+            return
+        self.digests = result.get("digests") or {}
+        self.verified = result.get("verified")
+        if result.get("mismatch"):
+            algo, want, got = result["mismatch"]
+            METRICS.incr("download.checksum_mismatch")
+            # Resuming would only reproduce the bad data: start clean
+            self._writer = None
+            self.file = None
+            remove_partial(self.tmp_path)
+            self.received = 0
+            self._fail(f"Checksum mismatch ({algo}):\nexpected {want}\ngot      {got}")
+            return
+        if self.expected_hash and self.verified is not True:
+            # Requested but not checked: never report success. The complete
+            # '.part' is kept.
+            METRICS.incr("download.checksum_unverified")
+            self._writer = None
+            self.file = None
+            why = result.get("unverified") or self.expected_hash[0]
+            self._fail(f"Checksum could not be verified ({why})")
+            return
+        if self.verified:
+            METRICS.incr("download.checksum_verified")
+        self._writer = None
+        self.file = None
+        self.final_path = result["path"]
+        remove_partial(self.tmp_path)
+
+        elapsed = max(0.001, time.time() - self.start_time)
+        fetched = self.received - self._session_bytes0
+        METRICS.incr("download.completed")
+        METRICS.incr("download.bytes", fetched)
+        METRICS.observe("download.mbps", round(fetched / elapsed / 1e6, 3))
+        METRICS.set("download.speed_bps", 0)
+
+        r, self.reply = self.reply, None
+        if r is not None:
+            r.deleteLater()
+        if self.total <= 0:
+            self.total = self.received
+        self.speed_bps = 0.0
+        self._set_state(self.DONE)
+        self._emit_progress(force=True)
+        self.finished.emit(self.final_path)
+
+    def _on_error(self, code):
+        msg = f"Network error: {code}"
+        try:
+            if self.reply and self.reply.errorString():
+                msg = f"Network error: {self.reply.errorString()}"
+        except Exception:
+            pass
+        # Show basic SSL error hint if any
+        try:
+            if hasattr(self.reply, "sslErrors") and self.reply.sslErrors():
+                msg += "\nSSL errors occurred."
+        except Exception:
+            pass
+        # Reported from _on_finished, which always follows
+        self._error_msg = msg
+
+    def _fail(self, message: str):
+        if self.state in (self.FAILED, self.CANCELLED):
+            return
+        METRICS.incr("download.failed")
+        self.error = message
+        self.speed_bps = 0.0
+        self._retry_timer.stop()
+        # Before abort(): the reply's finished signal may fire synchronously
+        self._set_state(self.FAILED)
+        self._save_state(force=True)
+        self._drop_reply()
+        # Keep what we have so a retry can resume it
+        self._cleanup(keep_partial=self.received > 0)
+        self.failed.emit(message)
+
+    def _cleanup(self, keep_partial: bool = False):
+        self._finalize_pending = False
+        probe, self._hash_probe = self._hash_probe, None
+        if probe is not None:
+            try:
+                probe.abort()
+                probe.deleteLater()
+            except Exception:
+                pass
+        self._finishing = False
+        try:
+            if self.reply:
+                self.reply.deleteLater()
+                self.reply = None
+            w, self._writer = self._writer, None
+            if w is not None:
+                # Queued writes land first, unless the data is being thrown away;
+                # the writer closes the file and deletes temp file + sidecar
+                w.close(() if keep_partial else (self.tmp_path, state_path(self.tmp_path)))
+            elif self.file:
+                try:
+                    self.file.close()
+                except Exception:
+                    pass
+                if not keep_partial:
+                    remove_partial(self.tmp_path)
+            elif not keep_partial:
+                # Remove temp file + sidecar on cancel (or when nothing was saved)
+                remove_partial(self.tmp_path)
+            self.file = None
+        except Exception:
+            pass
+
+
+# -------- already downloaded? (download_index) --------
+
+def _button_role(name: str):
+    # Qt5: QMessageBox.<Role>; Qt6: QMessageBox.ButtonRole.<Role>
+    return getattr(QMessageBox, name, None) if not QT6 else getattr(QMessageBox.ButtonRole, name)
+
+
+def offer_existing(parent, url: str, expected_hash=None, target: str = "") -> tuple[str, str]:
+    """
+    Check the download index for 'url' (or the SHA-256 of 'expected_hash',
+    a parse_expected_hash() tuple or string) and, on a hit, ask whether to
+    use the existing file, hard-link it to 'target' or download again.
+
+    Returns (action, path): ("download", "") to go ahead, ("reuse", path),
+    ("link", new path) or ("cancel", "").
+    """
+    if isinstance(expected_hash, str):
+        expected_hash = parse_expected_hash(expected_hash)
+    sha = expected_hash[1] if expected_hash and expected_hash[0] == "sha256" else ""
+    rec = INDEX.find(url=url, sha256=sha)
+    if rec is None:
+        return "download", ""
+    METRICS.incr("download.index_hits")
+
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(rec.ts))
+    if rec.match == "sha256":
+        why = "A file with the expected SHA-256"
+        note = ""
+    else:
+        why = "This URL"
+        note = "\n\nThe server's copy may have changed since."
+        if rec.etag:
+            note = f"\n\nIt was saved at version (ETag) {rec.etag}; the server's copy may have changed since."
+    box = QMessageBox(parent)
+    box.setWindowTitle("Already downloaded")
+    box.setText(f"{why} was downloaded on {when}:\n\n  {rec.path}\n  ({rec.size:,} bytes){note}")
+    b_reuse = box.addButton("Use existing file", _button_role("AcceptRole"))
+    b_link = None
+    if target and os.path.abspath(target) != rec.path:
+        b_link = box.addButton("Hard link here", _button_role("ActionRole"))
+    b_again = box.addButton("Download again", _button_role("DestructiveRole"))
+    box.addButton("Cancel", _button_role("RejectRole"))
+    box.setDefaultButton(b_reuse)
+    box.exec() if hasattr(box, "exec") else box.exec_()
+
+    clicked = box.clickedButton()
+    if clicked is b_reuse:
+        return "reuse", rec.path
+    if clicked is b_again:
+        return "download", ""
+    if b_link is not None and clicked is b_link:
+        try:
+            return "link", link_existing(rec, target)
+        except OSError as e:
+            r = QMessageBox.question(
+                parent, "Hard link",
+                f"Couldn't create a hard link next to the existing file:\n{e}\n\nDownload again instead?",
+            )
+            return ("download", "") if r == MSGBOX_YES() else ("cancel", "")
+    return "cancel", ""
+
+
+# -------- dialog --------
+
+class DownloadDialog(QDialog):
+    def __init__(self, parent=None, preset_url: str = ""):
+        super().__init__(parent)
+        self.setWindowTitle("Download")
+        self.setFixedSize(480, 310)
+
+        self.manager = None
+        self.transfer = None
+        self.final_path = None
+
         self._build_ui()
         if preset_url:
             self.set_url(preset_url)
@@ -253,6 +1359,12 @@ class DownloadDialog(QDialog):
         lay.addWidget(self.path_label)
         lay.addLayout(row)
 
+        self.hash_label = QLabel("Expected checksum (optional, e.g. sha256:…):", self)
+        self.hash_edit = QLineEdit(self)
+        self.hash_edit.setPlaceholderText("Empty: use <url>.sha256 if the server has one")
+        lay.addWidget(self.hash_label)
+        lay.addWidget(self.hash_edit)
+
         self.progress = QProgressBar(self)
         self.progress.setTextVisible(True)
         lay.addWidget(self.progress)
@@ -350,7 +1462,7 @@ class DownloadDialog(QDialog):
         safe_base = _sanitize_filename(base or "download")
 
         # We don't yet know MIME here, so we *don't* append extension yet.
-        # That will happen later in _on_finished() once headers are known.
+        # The transfer does that once headers are known.
         path = os.path.join(dirpath, safe_base)
 
         if os.path.isdir(path):
@@ -358,278 +1470,299 @@ class DownloadDialog(QDialog):
             self.btn_go.setDisabled(False)
             return
 
+        expected = self.hash_edit.text().strip()
+        if expected and parse_expected_hash(expected) is None:
+            QMessageBox.warning(self, "Download", "Unrecognised checksum (use sha256:<hex>).")
+            self.btn_go.setDisabled(False)
+            return
+
+        # Same URL or checksum downloaded before? Offer that file first
+        action, existing = offer_existing(self, url.toString(), expected or None, target=path)
+        if action != "download":
+            if existing:
+                self.final_path = existing
+                self.speed.setText(("Linked: " if action == "link" else "Already downloaded: ")
+                                   + existing)
+            self.btn_go.setDisabled(False)
+            return
+
         if os.path.exists(path):
             r = QMessageBox.question(self, "Overwrite", "File exists. Overwrite?")
             if r != MSGBOX_YES():
                 self.btn_go.setDisabled(False)
                 return
 
-        # temp file path for atomic replace
-        self.final_path = path
-        self.tmp_path = path + ".part"
-
-        try:
-            # open in binary, unbuffered small buffer to reduce Python-side RAM
-            self.file = open(self.tmp_path, "wb", buffering=0)
-        except Exception as e:
-            QMessageBox.critical(self, "Download", f"Cannot open file:\n{e}")
-            self.btn_go.setDisabled(False)
-            return
-
-        self._kickoff_request(url)
-
-    def _kickoff_request(self, url: QUrl):
         if self.manager is None:
-            self.manager = QNetworkAccessManager(self)
-
-        req = QNetworkRequest(url)
-        req.setRawHeader(b"User-Agent", self.user_agent)
-
-        self.reply = self.manager.get(req)
-
-        # Limit the internal read buffer to keep RAM bounded
-        try:
-            self.reply.setReadBufferSize(self.READBUF)
-        except Exception:
-            pass
-
-        # Signals
-        self.reply.readyRead.connect(self._on_ready_read)
-        self.reply.downloadProgress.connect(self._on_progress)
-        self.reply.finished.connect(self._on_finished)
-        if hasattr(self.reply, "metaDataChanged"):
-            self.reply.metaDataChanged.connect(self._on_headers)
-        if hasattr(self.reply, "errorOccurred"):
-            self.reply.errorOccurred.connect(self._on_error)
-        else:
-            self.reply.error.connect(self._on_error)
-
-        self.start_time = time.time()
-        self._last_ui_update = 0.0
-        self._bytes_received = 0
-        self._total_bytes = -1
-        self._preallocated = False
-        self._mime = ""
+            self.manager = NET.manager("downloads")
+        self.final_path = path
+        self.transfer = DownloadTransfer(url, path, manager=self.manager, parent=self,
+                                         expected_hash=expected or None)
+        self.transfer.progress.connect(self._on_transfer_progress)
+        self.transfer.finished.connect(self._on_transfer_finished)
+        self.transfer.failed.connect(self._on_transfer_failed)
 
         self.progress.setValue(0)
-        self.progress.setMaximum(0)  # unknown until we see bytes_total
+        self.progress.setMaximum(0)  # unknown until we see the total
         self.speed.setText("Starting…")
+        self.transfer.start()
+
+    def _on_transfer_progress(self, received, total):
+        # QProgressBar takes a C int; scale to KiB to stay in range for big files
+        if total > 0:
+            self.progress.setMaximum(max(1, total // 1024))
+        self.progress.setValue(int(received // 1024))
+        t = self.transfer
+        if t is not None and t.state == t.RUNNING:
+            self.speed.setText(f"Speed: {t.speed_bps/1024:.1f} KB/s   ETA: {t.eta_s():.1f} s")
+
+    def _on_transfer_finished(self, path: str):
+        self.final_path = path
+        self.speed.setText("Done.")
+        t = self.transfer
+        if t is not None:
+            INDEX.record_transfer(t)
+        check = ""
+        if t is not None and t.digests.get("sha256"):
+            check = f"\n\nSHA-256:\n{t.digests['sha256']}"
+            if t.verified:
+                check += f"\n(matches the {'given' if t.hash_source == 'given' else 'published'} checksum)"
+        QMessageBox.information(
+            self,
+            "Download",
+            f"Download completed successfully.\n\nSaved as:\n{path}{check}",
+        )
+        self.btn_go.setDisabled(False)
+        self.accept()
 
-    # Grab headers early for Content-Length and MIME type, then preallocate
-    def _on_headers(self):
-        # Content-Length
-        try:
-            hdr = CONTENT_LENGTH_HEADER()
-            if hdr is not None:
-                v = self.reply.header(hdr)
-                if v is not None:
-                    try:
-                        total = int(v)
-                        self._total_bytes = total
-                        self.progress.setMaximum(total)
-                        self._maybe_preallocate(total)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
-
-        # Content-Type → MIME string
-        try:
-            hct = CONTENT_TYPE_HEADER()
-            if hct is not None:
-                v = self.reply.header(hct)
-            else:
-                v = None
-            if v is not None:
-                self._mime = str(v)
-        except Exception:
-            pass
-
-    def _maybe_preallocate(self, total: int):
-        if self._preallocated or total <= 0 or not self.file:
-            return
-        try:
-            fd = self.file.fileno()
-            # Best: posix_fallocate (no sparse, ensures disk reservation)
-            try:
-                if hasattr(os, "posix_fallocate"):
-                    os.posix_fallocate(fd, 0, total)  # type: ignore
-                else:
-                    # Fallback: ftruncate creates a sparse file on many FS (still OK)
-                    os.ftruncate(fd, total)
-                # Reset position for writing
-                os.lseek(fd, 0, os.SEEK_SET)
-                self._preallocated = True
-            except Exception:
-                # Don’t fail the download; just skip preallocation
-                pass
-        except Exception:
-            pass
+    def _on_transfer_failed(self, message: str):
+        QMessageBox.warning(self, "Download", message)
+        self.btn_go.setDisabled(False)
 
-    def _on_ready_read(self):
-        # Read in fixed chunks to keep memory flat
-        if not (self.reply and self.file):
-            return
-        try:
-            while True:
-                # limit each read to CHUNK to avoid large intermediate buffers
-                data = self.reply.read(self.CHUNK)
-                if not data:
-                    break
-                # data is 'bytes' already; write directly
-                written = self.file.write(data)
-                if written is None:
-                    # Some platforms return None; ignore
-                    pass
-                self._bytes_received += len(data)
-        except Exception as e:
-            self._fail(f"I/O write error:\n{e}")
+    def _cancel(self):
+        if self.transfer is not None:
+            self.transfer.cancel()
+        self.reject()
 
-    def _on_progress(self, received: int, total: int):
-        # Update maximum once when known
-        if total > 0 and (self._total_bytes != total):
-            self._total_bytes = total
-            self.progress.setMaximum(total)
-            self._maybe_preallocate(total)
 
-        # Throttle UI updates to ~10 Hz
-        now = time.time()
-        if (now - self._last_ui_update) < self._ui_interval:
-            return
-        self._last_ui_update = now
+# -------- batch mode (command line) --------
 
-        # Prefer signal values, but keep local counter as fallback
-        rec = received if received >= 0 else self._bytes_received
-        self.progress.setValue(int(rec))
+def read_batch_file(path: str) -> list[str]:
+    """
+    One entry per line ('-' = stdin): '<url>' or '<url> sha256:<hex>'.
+    Blank lines and #comments are skipped.
+    """
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
-        elapsed = max(0.001, now - self.start_time)
-        speed_bps = rec / elapsed
-        eta = (total - rec) / speed_bps if total > 0 and speed_bps > 0 else 0
-        self.speed.setText(f"Speed: {speed_bps/1024:.1f} KB/s   ETA: {eta:.1f} s")
 
-    def _on_finished(self):
-        # Follow redirects?
-        try:
-            redir_attr = REDIRECT_ATTR()
-            attr = self.reply.attribute(redir_attr)
-        except Exception:
-            attr = None
+class BatchDownloader(QtCore.QObject):
+    """
+    Runs a list of downloads with at most 'parallel' at once, without any
+    UI, and collects one result dict per URL. Each entry is '<url>' or
+    '<url> <expected hash>'. Call start(); 'done_cb(report)' runs when all
+    have finished.
+    """
 
-        if attr:
-            self.redirects += 1
-            if self.redirects > self.max_redirects:
-                self._fail("Too many redirects.")
-                return
-            target = attr if isinstance(attr, QUrl) else QUrl(str(attr))
-            if target.isRelative():
-                target = self.reply.url().resolved(target)
-            self.reply.deleteLater()
-            self._kickoff_request(target)
+    def __init__(self, entries, directory: str = "", parallel: int = 4, segments: int = 1,
+                 skip_existing: bool = False, done_cb=None, file_cb=None):
+        super().__init__()
+        self.directory = directory or default_download_dir()
+        self.parallel = max(1, int(parallel))
+        self.segments = max(1, int(segments))
+        self.skip_existing = skip_existing
+        self.done_cb = done_cb
+        self.file_cb = file_cb
+        self.manager = NET.manager("downloads")
+        self.results: list[dict] = []
+        self._pending: list = []
+        self._running: dict = {}     # transfer -> (result, t0)
+        self._taken: set = set()
+        self._t0 = 0.0
+        for entry in entries:
+            url, _, expected = str(entry).strip().partition(" ")
+            self._pending.append((url, expected.strip() or None))
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._pump()
+
+    def _target(self, url: QUrl) -> str:
+        # Same naming as the panel: sanitised URL name, unique within the batch
+        name = _sanitize_filename(url.fileName() or "download")
+        path = os.path.join(self.directory, name)
+        if self.skip_existing and os.path.exists(path):
+            return path
+        path = unique_path(path, self._taken)
+        self._taken.add(path)
+        return path
+
+    def _pump(self):
+        while self._pending and len(self._running) < self.parallel:
+            raw, expected = self._pending.pop(0)
+            url = QUrl.fromUserInput(raw)
+            res = {"url": raw, "path": "", "status": "failed", "bytes": 0, "fetched": 0,
+                   "seconds": 0.0, "mb_s": 0.0, "sha256": "", "verified": None, "error": ""}
+            self.results.append(res)
+            if not url.isValid() or url.scheme() not in ("http", "https"):
+                res["error"] = "not an http(s) URL"
+                self._report(res)
+                continue
+            if expected and parse_expected_hash(expected) is None:
+                res["error"] = f"unrecognised checksum: {expected}"
+                self._report(res)
+                continue
+            path = self._target(url)
+            res["path"] = path
+            if self.skip_existing and os.path.exists(path):
+                res["status"] = "skipped"
+                res["bytes"] = os.path.getsize(path)
+                self._report(res)
+                continue
+            if self.segments > 1:
+                # Imported here: segmented_download imports this module
+                from segmented_download import SegmentedTransfer
+                t = SegmentedTransfer(url, path, manager=self.manager, overwrite=False,
+                                      parent=self, segments=self.segments, expected_hash=expected)
+            else:
+                t = DownloadTransfer(url, path, manager=self.manager, overwrite=False,
+                                     parent=self, expected_hash=expected)
+            self._running[t] = (res, time.perf_counter())
+            t.finished.connect(lambda _p, t=t: self._on_done(t))
+            t.failed.connect(lambda _m, t=t: self._on_done(t))
+            t.start()
+        if not self._pending and not self._running:
+            self._finish()
+
+    def _on_done(self, t):
+        entry = self._running.pop(t, None)
+        if entry is None:
             return
+        res, t0 = entry
+        secs = max(0.001, time.perf_counter() - t0)
+        fetched = max(0, t.received - t.resumed_from)
+        res.update({
+            "path": t.final_path,
+            "status": "done" if t.state == t.DONE else "failed",
+            "bytes": t.received,
+            "fetched": fetched,
+            "seconds": round(secs, 3),
+            "mb_s": round(fetched / secs / 1e6, 2),
+            "sha256": t.digests.get("sha256", ""),
+            "verified": t.verified,
+            "error": t.error,
+        })
+        self._report(res)
+        # Let the transfer's own slots return before the next one starts
+        QtCore.QTimer.singleShot(0, self._pump)
+
+    def _report(self, res: dict):
+        if self.file_cb is not None:
+            self.file_cb(res)
+
+    def _finish(self):
+        wall = max(0.001, time.perf_counter() - self._t0)
+        fetched = sum(r["fetched"] for r in self.results)
+        report = {
+            "files": self.results,
+            "aggregate": {
+                "files": len(self.results),
+                "done": sum(1 for r in self.results if r["status"] == "done"),
+                "skipped": sum(1 for r in self.results if r["status"] == "skipped"),
+                "failed": sum(1 for r in self.results if r["status"] == "failed"),
+                "bytes": sum(r["bytes"] for r in self.results),
+                "fetched": fetched,
+                "wall_s": round(wall, 3),
+                "mb_s": round(fetched / wall / 1e6, 2),
+                "parallel": self.parallel,
+                "segments": self.segments,
+            },
+        }
+        if self.done_cb is not None:
+            self.done_cb(report)
+
+
+def main(argv=None) -> int:
+    """
+    python3 download.py                       # the dialog
+    python3 download.py [options] URL ...     # batch mode, no window
+    python3 download.py --url-file=urls.txt   # (or '-' for stdin)
 
-        # No error?
-        noerr_enum = getattr(
-            QNetworkReply.NetworkError,
-            "NoError",
-            getattr(QNetworkReply, "NoError", 0),
-        )
-        current_err = self.reply.error() if hasattr(self.reply, "error") else noerr_enum
-        if current_err == noerr_enum:
-            try:
-                # Flush any pending bytes
-                self._on_ready_read()
-                if self.file:
-                    self.file.flush()
-                    os.fsync(self.file.fileno())
-                    self.file.close()
-                    self.file = None
-
-                # Decide final filename (append extension if missing using MIME)
-                dirpath, base = os.path.split(self.final_path)
-                dirpath = dirpath or default_download_dir()
-                safe_base = _sanitize_filename(base or "download")
-                safe_base = _append_extension_if_missing(safe_base, self._mime)
-                final_path = os.path.join(dirpath, safe_base)
-
-                # Atomic replace: tmp_path -> final_path
-                try:
-                    os.replace(self.tmp_path, final_path)
-                except Exception:
-                    # Best-effort rename fallback
-                    try:
-                        if os.path.exists(final_path):
-                            os.remove(final_path)
-                        os.rename(self.tmp_path, final_path)
-                    except Exception:
-                        raise
-
-                self.final_path = final_path
-
-            except Exception as e:
-                self._fail(f"I/O finalize error:\n{e}")
-                return
-
-            if self._total_bytes > 0:
-                self.progress.setValue(self._total_bytes)
-            self.speed.setText("Done.")
-            QMessageBox.information(
-                self,
-                "Download",
-                f"Download completed successfully.\n\nSaved as:\n{self.final_path}",
-            )
-            self.accept()
-        else:
-            self._cleanup()
-
-        self.btn_go.setDisabled(False)
-
-    def _on_error(self, code):
-        msg = str(code)
-        # Show basic SSL error hint if any
-        try:
-            if hasattr(self.reply, "sslErrors") and self.reply.sslErrors():
-                msg += "\nSSL errors occurred."
-        except Exception:
-            pass
-        self._fail(f"Network error: {msg}")
-
-    def _cancel(self):
-        if self.reply:
-            try:
-                self.reply.abort()
-            except Exception:
-                pass
-        self._cleanup()
-        self.reject()
-
-    def _fail(self, message: str):
-        self._cleanup()
-        QMessageBox.warning(self, "Download", message)
-        self.btn_go.setDisabled(False)
-
-    def _cleanup(self):
-        try:
-            if self.reply:
-                self.reply.deleteLater()
-                self.reply = None
-            if self.file:
-                try:
-                    self.file.close()
-                except Exception:
-                    pass
-                self.file = None
-            # Remove temp file on failure/cancel
-            if self.tmp_path and os.path.exists(self.tmp_path):
-                try:
-                    os.remove(self.tmp_path)
-                except Exception:
-                    pass
-        except Exception:
-            pass
+    Batch mode prints one JSON line per file to stderr as it finishes and
+    the full report (per file and aggregate throughput) to stdout or
+    --output. Exit status 1 if any download failed.
+    """
+    import argparse
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        app = QApplication(sys.argv)
+        d = DownloadDialog()
+        d.show()
+        return APP_EXEC(app)
+
+    ap = argparse.ArgumentParser(prog="download.py", description="Batch downloader (no window).")
+    ap.add_argument("urls", nargs="*", help="URL, optionally followed by sha256:<hex> in one argument")
+    ap.add_argument("--url-file", help="file with one URL per line ('-' = stdin)")
+    ap.add_argument("--dir", default="", help="target directory (default ~/Downloads)")
+    ap.add_argument("--parallel", type=int, default=4, help="downloads at once")
+    ap.add_argument("--segments", type=int, default=1, help="Range connections per download")
+    ap.add_argument("--rate-kbps", type=int, default=0, help="global speed limit in KiB/s")
+    ap.add_argument("--skip-existing", action="store_true",
+                    help="leave files that already exist under their name alone")
+    ap.add_argument("--no-checksum-probe", action="store_true",
+                    help="don't look for <url>.sha256")
+    ap.add_argument("--output", help="write the JSON report here instead of stdout")
+    ap.add_argument("-v", "--verbose", action="store_true", help="log to stderr")
+    args = ap.parse_args(argv)
+
+    entries = list(args.urls)
+    if args.url_file:
+        entries += read_batch_file(args.url_file)
+    if not entries:
+        ap.error("no URLs given")
+
+    global VERBOSE, CHECKSUM_DISCOVERY
+    VERBOSE = args.verbose
+    if args.verbose:
+        # Keep stdout for the report
+        sys.stdout = sys.stderr
+    CHECKSUM_DISCOVERY = not args.no_checksum_probe
+    if args.rate_kbps:
+        LIMITER.configure(base_kbps=args.rate_kbps)
+    if args.dir:
+        os.makedirs(args.dir, exist_ok=True)
+
+    app = QtCore.QCoreApplication(sys.argv[:1])
+    report = {}
+
+    def per_file(res):
+        print(json.dumps(res), file=sys.stderr, flush=True)
+
+    def done(rep):
+        report.update(rep)
+        app.quit()
+
+    runner = BatchDownloader(entries, directory=args.dir, parallel=args.parallel,
+                             segments=args.segments, skip_existing=args.skip_existing,
+                             done_cb=done, file_cb=per_file)
+    QtCore.QTimer.singleShot(0, runner.start)
+    APP_EXEC(app)
+    wait_all()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text, file=sys.__stdout__, flush=True)
+    return 0 if report.get("aggregate", {}).get("failed", 1) == 0 else 1
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    d = DownloadDialog()
-    d.show()
-    sys.exit(APP_EXEC(app))
+    # Run as 'download' so segmented_download shares this module's classes
+    import download
+    sys.exit(download.main())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+download_index.py — Index of completed downloads (SQLite, WAL mode).
+
+Responsibilities:
+- Remember every finished download: URL, final path, size, ETag, SHA-256
+  and time (record / record_transfer).
+- find(): before a new download starts, look for the same URL or the same
+  expected SHA-256 among files that are still on disk with their recorded
+  size, so the caller can offer to reuse or hard-link them instead of
+  fetching the data again. Both columns are indexed and only a handful of
+  rows are stat()ed, so the lookup is cheap enough for the GUI thread.
+- link_existing(): hard-link an indexed file to a new name.
+
+No Qt imports: used by the browser, the download manager and the
+standalone downloader alike. Rows whose file has gone are dropped when a
+lookup runs into them.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+
+# Database location
+DOWNLOAD_INDEX_FILE = Path.home() / ".runit_qt_downloads.sqlite"
+
+# Candidates checked per lookup (newest first)
+LOOKUP_LIMIT = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id     INTEGER PRIMARY KEY,
+    url    TEXT NOT NULL,
+    path   TEXT NOT NULL UNIQUE,
+    size   INTEGER NOT NULL DEFAULT -1,
+    etag   TEXT NOT NULL DEFAULT '',
+    sha256 TEXT NOT NULL DEFAULT '',
+    ts     REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS downloads_url ON downloads(url, ts);
+CREATE INDEX IF NOT EXISTS downloads_sha256 ON downloads(sha256);
+"""
+
+_UPSERT = """
+INSERT INTO downloads (url, path, size, etag, sha256, ts) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET
+    url = excluded.url, size = excluded.size, etag = excluded.etag,
+    sha256 = excluded.sha256, ts = excluded.ts
+"""
+
+
+@dataclass(frozen=True)
+class IndexRecord:
+    """One indexed download; 'match' says how find() matched it."""
+
+    url: str
+    path: str
+    size: int
+    etag: str
+    sha256: str
+    ts: float
+    match: str = ""      # "sha256" | "url"
+
+
+class DownloadIndex:
+    """
+    Small synchronous store: one insert per finished download and indexed
+    point lookups, on a single connection shared under a lock.
+    """
+
+    def __init__(self, path: Path = DOWNLOAD_INDEX_FILE):
+        self.path = Path(path)
+        self._conn = None
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "recorded": 0, "stale": 0, "lookup_ms": 0.0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+    # ---------- write ----------
+    def record(self, url: str, path: str, size: int = -1, etag: str = "",
+               sha256: str = "", ts: float | None = None):
+        """Remember a finished download (replaces an older row for 'path')."""
+        if not url or not path:
+            return
+        path = os.path.abspath(path)
+        if size < 0:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+        try:
+            with self._lock:
+                conn = self._db()
+                with conn:
+                    conn.execute(_UPSERT, (url, path, int(size), etag or "",
+                                           (sha256 or "").lower(), ts or time.time()))
+            self.stats["recorded"] += 1
+        except Exception:
+            pass
+
+    def record_transfer(self, t):
+        """record() a DONE DownloadTransfer / EngineDownload."""
+        try:
+            url = t.url.toString() if hasattr(t.url, "toString") else str(t.url)
+        except Exception:
+            return
+        self.record(
+            url, t.final_path,
+            size=t.total if t.total > 0 else -1,
+            etag=getattr(t, "etag", ""),
+            sha256=(getattr(t, "digests", None) or {}).get("sha256", ""),
+        )
+
+    # ---------- lookup ----------
+    def find(self, url: str = "", sha256: str = "") -> IndexRecord | None:
+        """
+        Newest indexed file with the given SHA-256 (preferred) or URL that
+        still exists with its recorded size.
+        """
+        t0 = time.perf_counter()
+        self.stats["lookups"] += 1
+        try:
+            return self._find(url, (sha256 or "").lower())
+        except Exception:
+            return None
+        finally:
+            self.stats["lookup_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+
+    def _find(self, url: str, sha256: str) -> IndexRecord | None:
+        if not self.path.exists() and self._conn is None:
+            return None
+        for match, col, value in (("sha256", "sha256", sha256), ("url", "url", url)):
+            if not value:
+                continue
+            with self._lock:
+                rows = self._db().execute(
+                    f"SELECT url, path, size, etag, sha256, ts FROM downloads "
+                    f"WHERE {col} = ? ORDER BY ts DESC LIMIT ?",
+                    (value, LOOKUP_LIMIT),
+                ).fetchall()
+            for row in rows:
+                rec = IndexRecord(*row, match=match)
+                if self._still_there(rec):
+                    self.stats["hits"] += 1
+                    return rec
+        return None
+
+    def _still_there(self, rec: IndexRecord) -> bool:
+        try:
+            ok = os.path.getsize(rec.path) == rec.size or rec.size < 0
+        except OSError:
+            ok = False
+        if not ok:
+            # Moved, deleted or changed since: forget it
+            self.stats["stale"] += 1
+            try:
+                with self._lock:
+                    conn = self._db()
+                    with conn:
+                        conn.execute("DELETE FROM downloads WHERE path = ?", (rec.path,))
+            except Exception:
+                pass
+        return ok
+
+    def count(self) -> int:
+        try:
+            with self._lock:
+                return self._db().execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+        except Exception:
+            return 0
+
+
+def link_existing(rec: IndexRecord, target: str) -> str:
+    """
+    Hard-link rec.path to 'target' (or 'target' with a ' (n)' suffix if it
+    is taken) and return the new path. Raises OSError where hard links are
+    not possible (other file system, FAT, ...).
+    """
+    base, ext = os.path.splitext(target)
+    path, n = target, 1
+    while os.path.exists(path):
+        if os.path.samefile(path, rec.path):
+            return path
+        path = f"{base} ({n}){ext}"
+        n += 1
+    os.link(rec.path, path)
+    return path
+
+
+INDEX = DownloadIndex()
@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+download_manager.py — Non-modal download manager.
+
+Responsibilities:
+- DownloadQueue: owns DownloadTransfer objects (download.py), starts them in
+  priority order (then FIFO) with at most 'max_concurrent' running at once,
+  and offers pause / resume / cancel / retry per item. A retry (or a new
+  download of the same URL to the same name) resumes the kept '.part' file.
+  With 'segments' > 1, transfers are SegmentedTransfer objects that use
+  several Range connections when the server allows it.
+- Finished downloads go into the download index (download_index.py); a
+  new URL that was downloaded before is offered for reuse first.
+- Downloads started by pages are adopted as EngineDownload objects
+  (engine_download.py): QtWebEngine streams them itself, the queue only
+  schedules and shows them. The NAM transfers above are used for URLs
+  typed into the panel.
+- DownloadPanel: a small tool window listing every transfer with progress,
+  speed/ETA, a priority selector and pause/cancel buttons, plus the global
+  speed limit (bandwidth.py) with the measured total rate next to it.
+  Priority also sets a running transfer's share of a capped rate.
+
+Transfers stream on the event loop through Qt's asynchronous network stack;
+the panel only repaints from the transfers' throttled progress signals, so
+browsing is never blocked by a running download.
+"""
+
+import heapq
+import itertools
+import os
+
+from qt_compat import QtCore, QtWidgets, Qt, vlog
+from config import (
+    MAX_CONCURRENT_DOWNLOADS,
+    DOWNLOAD_SEGMENTS,
+    MAX_DOWNLOAD_SEGMENTS,
+    DOWNLOAD_RATE_KBPS,
+    DOWNLOAD_RATE_SCHEDULE,
+    load_user_config,
+)
+from download import (
+    DownloadTransfer,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+    PRIORITY_NAMES,
+    RETRY_LIMIT,
+    default_download_dir,
+    offer_existing,
+    parse_expected_hash,
+    unique_path,
+    _sanitize_filename,
+)
+import download_writer
+from bandwidth import LIMITER
+from download_index import INDEX
+from net_session import NET
+from segmented_download import SegmentedTransfer
+from engine_download import EngineDownload, target_for
+
+# States that no longer occupy a slot
+_FINAL = (DownloadTransfer.DONE, DownloadTransfer.FAILED, DownloadTransfer.CANCELLED)
+
+
+def _fmt_bytes(n) -> str:
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.1f} GB"
+
+
+class DownloadQueue(QtCore.QObject):
+    """
+    Priority queue of transfers with a concurrency cap.
+    Paused transfers give their slot to the next queued one.
+    """
+
+    added = QtCore.pyqtSignal(object)     # DownloadTransfer
+    removed = QtCore.pyqtSignal(object)   # DownloadTransfer
+
+    def __init__(self, parent=None, max_concurrent: int = MAX_CONCURRENT_DOWNLOADS,
+                 segments: int | None = None):
+        super().__init__(parent)
+        self.max_concurrent = max(1, int(max_concurrent))
+        user = load_user_config()
+        if segments is None:
+            segments = user.get("download_segments", DOWNLOAD_SEGMENTS)
+        self.set_segments(segments)
+        try:
+            LIMITER.configure(
+                base_kbps=user.get("download_rate_kbps", DOWNLOAD_RATE_KBPS),
+                schedule=user.get("download_rate_schedule", DOWNLOAD_RATE_SCHEDULE),
+            )
+        except Exception as e:
+            vlog(f"[Downloads] ignoring rate limit settings: {e}")
+        self.manager = NET.manager("downloads")
+        self.transfers: list[DownloadTransfer] = []
+        # (priority, seq, transfer); stale entries are skipped when popped
+        self._waiting: list = []
+        self._seq = itertools.count()
+        self._pump_scheduled = False
+
+    # ---------- queue ----------
+    def enqueue(self, url: str, path: str | None = None,
+                priority: int = PRIORITY_NORMAL,
+                expected_hash: str | None = None) -> DownloadTransfer:
+        """
+        Queue 'url' for download to 'path' (default: ~/Downloads/<name>).
+        Name clashes with existing files or other queued transfers get a
+        ' (n)' suffix. 'expected_hash' ('sha256:…' or bare hex) is checked
+        before the file is moved into place.
+        """
+        if not path:
+            name = _sanitize_filename(QtCore.QUrl(url).fileName() or "download")
+            path = os.path.join(default_download_dir(), name)
+        taken = {t.final_path for t in self.transfers if t.state not in _FINAL}
+        path = unique_path(path, taken)
+
+        if self.segments > 1:
+            t = SegmentedTransfer(url, path, priority=priority, manager=self.manager,
+                                  overwrite=False, parent=self, segments=self.segments,
+                                  expected_hash=expected_hash)
+        else:
+            t = DownloadTransfer(url, path, priority=priority, manager=self.manager,
+                                 overwrite=False, parent=self, expected_hash=expected_hash)
+        return self._add(t)
+
+    def adopt(self, item, priority: int = PRIORITY_NORMAL) -> EngineDownload:
+        """
+        Take over a QtWebEngine download item from downloadRequested. Must be
+        called from the signal handler (the engine cancels items that are
+        not accepted before it returns).
+        """
+        taken = {t.final_path for t in self.transfers if t.state not in _FINAL}
+        return self._add(EngineDownload(item, target_for(item, taken),
+                                        priority=priority, parent=self))
+
+    def _add(self, t):
+        t.stateChanged.connect(lambda _s, t=t: self._on_state(t))
+        self.transfers.append(t)
+        heapq.heappush(self._waiting, (t.priority, next(self._seq), t))
+        self.added.emit(t)
+        vlog(f"[Downloads] queued {t.name} (priority {PRIORITY_NAMES.get(t.priority)})")
+        self._schedule_pump()
+        return t
+
+    def running_count(self) -> int:
+        return sum(1 for t in self.transfers if t.state == t.RUNNING)
+
+    def stats(self) -> dict:
+        """Transfer counts by state (for runit://perf)."""
+        out = {"max_concurrent": self.max_concurrent, "segments": self.segments,
+               "rate_limit_bps": LIMITER.limit_bps()}
+        for t in self.transfers:
+            out[t.state] = out.get(t.state, 0) + 1
+        return out
+
+    def set_max_concurrent(self, n: int):
+        self.max_concurrent = max(1, int(n))
+        self._schedule_pump()
+
+    def set_segments(self, n):
+        """Connections per new download (transfers already queued keep theirs)."""
+        try:
+            self.segments = min(MAX_DOWNLOAD_SEGMENTS, max(1, int(n)))
+        except Exception:
+            self.segments = DOWNLOAD_SEGMENTS
+
+    def set_rate_limit(self, kbps: int):
+        """Base speed cap in KiB/s for this session (0 = unlimited)."""
+        LIMITER.configure(base_kbps=kbps)
+
+    def set_priority(self, t: DownloadTransfer, priority: int):
+        # Queued: start order. Running: share of a capped rate (read live).
+        if t.priority == priority:
+            return
+        t.priority = priority
+        if t.state == t.QUEUED:
+            heapq.heappush(self._waiting, (priority, next(self._seq), t))
+            self._schedule_pump()
+
+    # ---------- per-item control ----------
+    def pause(self, t: DownloadTransfer):
+        t.pause()
+
+    def resume(self, t: DownloadTransfer):
+        t.resume()
+
+    def cancel(self, t: DownloadTransfer):
+        t.cancel()
+
+    def retry(self, t: DownloadTransfer):
+        if t.requeue():
+            heapq.heappush(self._waiting, (t.priority, next(self._seq), t))
+
+    def remove(self, t: DownloadTransfer):
+        """Forget a finished transfer (cancels it first if still active)."""
+        if t.state not in _FINAL:
+            t.cancel()
+        try:
+            self.transfers.remove(t)
+        except ValueError:
+            return
+        self.removed.emit(t)
+        t.deleteLater()
+
+    def clear_finished(self):
+        for t in [t for t in self.transfers if t.state in _FINAL]:
+            self.remove(t)
+
+    def shutdown(self):
+        """
+        Stop everything (window closing). Partial files are kept, so
+        downloading the same URL again later resumes them.
+        """
+        self._waiting.clear()
+        for t in list(self.transfers):
+            if t.state not in _FINAL:
+                t.suspend()
+        # Let the writer threads put queued data and resume sidecars on disk
+        download_writer.wait_all()
+
+    # ---------- scheduling ----------
+    def _on_state(self, t: DownloadTransfer):
+        if t.state == t.DONE:
+            INDEX.record_transfer(t)
+        if t.state in _FINAL or t.state in (t.PAUSED, t.QUEUED):
+            self._schedule_pump()
+
+    def _schedule_pump(self):
+        if not self._pump_scheduled:
+            self._pump_scheduled = True
+            QtCore.QTimer.singleShot(0, self._pump)
+
+    def _pump(self):
+        self._pump_scheduled = False
+        running = self.running_count()
+        while running < self.max_concurrent and self._waiting:
+            prio, _seq, t = heapq.heappop(self._waiting)
+            if t.state != t.QUEUED or prio != t.priority or t not in self.transfers:
+                continue  # stale entry
+            t.start()
+            if t.state == t.RUNNING:
+                running += 1
+
+
+class _TransferRow(QtWidgets.QFrame):
+    """One line in the panel: name, progress, status and controls."""
+
+    def __init__(self, queue: DownloadQueue, t: DownloadTransfer, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+        self.t = t
+
+        lay = QtWidgets.QGridLayout(self)
+        lay.setContentsMargins(6, 4, 6, 4)
+
+        self.name = QtWidgets.QLabel(t.name, self)
+        self.name.setToolTip(t.url.toString())
+        self.bar = QtWidgets.QProgressBar(self)
+        self.bar.setRange(0, 1000)
+        self.bar.setTextVisible(False)
+        self.status = QtWidgets.QLabel("", self)
+
+        self.prio = QtWidgets.QComboBox(self)
+        for p in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW):
+            self.prio.addItem(PRIORITY_NAMES[p], p)
+        self.prio.setCurrentIndex(self.prio.findData(t.priority))
+        self.prio.currentIndexChanged.connect(
+            lambda _i: queue.set_priority(t, self.prio.currentData())
+        )
+
+        self.btn_pause = QtWidgets.QPushButton("Pause", self)
+        self.btn_pause.clicked.connect(self._toggle_pause)
+        self.btn_cancel = QtWidgets.QPushButton("Cancel", self)
+        self.btn_cancel.clicked.connect(self._cancel_or_remove)
+
+        lay.addWidget(self.name, 0, 0, 1, 3)
+        lay.addWidget(self.bar, 1, 0, 1, 3)
+        lay.addWidget(self.status, 2, 0)
+        lay.addWidget(self.prio, 2, 1)
+        row = QtWidgets.QHBoxLayout()
+        row.addWidget(self.btn_pause)
+        row.addWidget(self.btn_cancel)
+        lay.addLayout(row, 2, 2)
+
+        t.progress.connect(self._on_progress)
+        t.stateChanged.connect(lambda _s: self.refresh())
+        self.refresh()
+
+    def _toggle_pause(self):
+        t = self.t
+        if t.state == t.PAUSED:
+            self.queue.resume(t)
+        elif t.state == t.RUNNING:
+            self.queue.pause(t)
+        elif t.state in (t.FAILED, t.CANCELLED):
+            self.queue.retry(t)
+
+    def _cancel_or_remove(self):
+        if self.t.state in _FINAL:
+            self.queue.remove(self.t)
+        else:
+            self.queue.cancel(self.t)
+
+    def _on_progress(self, received, total):
+        if total and total > 0:
+            self.bar.setRange(0, 1000)
+            self.bar.setValue(int(1000 * received / total))
+        elif self.t.state == self.t.RUNNING:
+            self.bar.setRange(0, 0)  # busy indicator
+        self._update_status()
+
+    def _update_status(self):
+        t = self.t
+        size = _fmt_bytes(t.received)
+        if t.total > 0:
+            size += f" / {_fmt_bytes(t.total)}"
+        if t.state == t.RUNNING and t.retrying:
+            text = f"{size} — connection lost, retrying ({t.attempt}/{RETRY_LIMIT})…"
+        elif t.state == t.RUNNING:
+            text = f"{size} — {_fmt_bytes(t.speed_bps)}/s"
+            if t.total > 0 and t.speed_bps > 0:
+                text += f", {t.eta_s():.0f} s left"
+        elif t.state == t.PAUSED:
+            text = f"Paused — {size}"
+        elif t.state == t.DONE:
+            text = f"Done — {_fmt_bytes(t.total)}"
+            if getattr(t, "verified", None):
+                text += ", checksum OK"
+        elif t.state == t.FAILED:
+            text = (f"Failed — {size} kept, retry resumes"
+                    if t.received > 0 and t.can_retry else "Failed")
+        elif t.state == t.CANCELLED:
+            text = "Cancelled"
+        else:
+            text = "Queued"
+        self.status.setText(text)
+
+    def refresh(self):
+        t = self.t
+        self.name.setText(t.name)
+        tip = t.error if t.state == t.FAILED else t.final_path
+        digest = (getattr(t, "digests", None) or {}).get("sha256")
+        if t.state == t.DONE and digest:
+            tip += f"\nSHA-256: {digest}" + (" (verified)" if t.verified else "")
+        self.status.setToolTip(tip)
+        self.btn_pause.setText(
+            {t.PAUSED: "Resume", t.FAILED: "Retry", t.CANCELLED: "Retry"}.get(t.state, "Pause")
+        )
+        self.btn_pause.setEnabled(
+            t.state not in (t.QUEUED, t.DONE)
+            and (t.can_retry or t.state not in (t.FAILED, t.CANCELLED))
+        )
+        self.btn_cancel.setText("Remove" if t.state in _FINAL else "Cancel")
+        self.prio.setEnabled(t.state not in _FINAL)
+        if t.state == t.DONE:
+            self.bar.setRange(0, 1000)
+            self.bar.setValue(1000)
+        self._update_status()
+
+
+class DownloadPanel(QtWidgets.QWidget):
+    """
+    Tool window listing the queue. Closing it only hides it; downloads keep
+    running.
+    """
+
+    def __init__(self, queue: DownloadQueue, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+        self.setWindowFlags(getattr(Qt, "Tool", getattr(Qt.WindowType, "Tool")))
+        self.setWindowTitle("Downloads")
+        self.resize(520, 360)
+        self._rows: dict[DownloadTransfer, _TransferRow] = {}
+
+        outer = QtWidgets.QVBoxLayout(self)
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(QtWidgets.QLabel("Parallel downloads:", self))
+        self.spin = QtWidgets.QSpinBox(self)
+        self.spin.setRange(1, 10)
+        self.spin.setValue(queue.max_concurrent)
+        self.spin.valueChanged.connect(queue.set_max_concurrent)
+        top.addWidget(self.spin)
+        top.addWidget(QtWidgets.QLabel("Connections each:", self))
+        self.seg_spin = QtWidgets.QSpinBox(self)
+        self.seg_spin.setRange(1, MAX_DOWNLOAD_SEGMENTS)
+        self.seg_spin.setValue(queue.segments)
+        self.seg_spin.setToolTip("Split new downloads over several connections "
+                                 "when the server supports Range requests")
+        self.seg_spin.valueChanged.connect(queue.set_segments)
+        top.addWidget(self.seg_spin)
+        top.addStretch(1)
+        btn_clear = QtWidgets.QPushButton("Clear finished", self)
+        btn_clear.clicked.connect(queue.clear_finished)
+        top.addWidget(btn_clear)
+        outer.addLayout(top)
+
+        rate = QtWidgets.QHBoxLayout()
+        rate.addWidget(QtWidgets.QLabel("Speed limit:", self))
+        self.rate_spin = QtWidgets.QSpinBox(self)
+        self.rate_spin.setRange(0, 1024 * 1024)
+        self.rate_spin.setSingleStep(256)
+        self.rate_spin.setSuffix(" KB/s")
+        self.rate_spin.setSpecialValueText("Unlimited")
+        self.rate_spin.setValue(LIMITER.base_bps // 1024)
+        self.rate_spin.setToolTip("Cap for all downloads together, shared by priority "
+                                  "(time-of-day windows from the config file take precedence)")
+        self.rate_spin.valueChanged.connect(queue.set_rate_limit)
+        rate.addWidget(self.rate_spin)
+        self.rate_label = QtWidgets.QLabel("", self)
+        rate.addWidget(self.rate_label, 1)
+        outer.addLayout(rate)
+        # Measured vs configured rate, refreshed while the panel is shown
+        self._rate_timer = QtCore.QTimer(self)
+        self._rate_timer.setInterval(1000)
+        self._rate_timer.timeout.connect(self._update_rate)
+
+        add = QtWidgets.QHBoxLayout()
+        self.url_edit = QtWidgets.QLineEdit(self)
+        self.url_edit.setPlaceholderText("Download URL… (optionally followed by sha256:<hash>)")
+        self.url_edit.returnPressed.connect(self._add_url)
+        add.addWidget(self.url_edit)
+        btn_add = QtWidgets.QPushButton("Download", self)
+        btn_add.clicked.connect(self._add_url)
+        add.addWidget(btn_add)
+        outer.addLayout(add)
+
+        self._list = QtWidgets.QWidget(self)
+        self._list_lay = QtWidgets.QVBoxLayout(self._list)
+        self._list_lay.setContentsMargins(0, 0, 0, 0)
+        self._list_lay.addStretch(1)
+        scroll = QtWidgets.QScrollArea(self)
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(self._list)
+        outer.addWidget(scroll)
+
+        for t in queue.transfers:
+            self._add_row(t)
+        queue.added.connect(self._add_row)
+        queue.removed.connect(self._remove_row)
+
+    def showEvent(self, e):
+        self._update_rate()
+        self._rate_timer.start()
+        super().showEvent(e)
+
+    def hideEvent(self, e):
+        self._rate_timer.stop()
+        super().hideEvent(e)
+
+    def _update_rate(self):
+        limit = LIMITER.limit_bps()
+        text = f"Actual {_fmt_bytes(LIMITER.actual_bps())}/s"
+        if limit:
+            text += f" of {_fmt_bytes(limit)}/s"
+            window = LIMITER.active_window()
+            if window:
+                (h1, m1), (h2, m2) = divmod(window[0], 60), divmod(window[1], 60)
+                text += f" (scheduled {h1:02d}:{m1:02d}–{h2:02d}:{m2:02d})"
+        else:
+            text += ", no limit"
+        self.rate_label.setText(text)
+
+    def _add_url(self):
+        text, _, expected = self.url_edit.text().strip().partition(" ")
+        url = QtCore.QUrl.fromUserInput(text)
+        if not url.isValid() or url.scheme() not in ("http", "https"):
+            return
+        if expected.strip() and parse_expected_hash(expected) is None:
+            self.url_edit.setToolTip("Unrecognised checksum (use sha256:<hex> or a bare hex digest)")
+            return
+        name = _sanitize_filename(url.fileName() or "download")
+        action, existing = offer_existing(self, url.toString(), expected.strip() or None,
+                                          target=os.path.join(default_download_dir(), name))
+        if action == "cancel":
+            return
+        self.url_edit.clear()
+        if existing:
+            self.url_edit.setPlaceholderText(
+                ("Linked: " if action == "link" else "Already downloaded: ") + existing)
+            return
+        self.queue.enqueue(url.toString(), expected_hash=expected.strip() or None)
+
+    def _add_row(self, t: DownloadTransfer):
+        row = _TransferRow(self.queue, t, self._list)
+        self._rows[t] = row
+        # Newest first, above the trailing stretch
+        self._list_lay.insertWidget(0, row)
+
+    def _remove_row(self, t: DownloadTransfer):
+        row = self._rows.pop(t, None)
+        if row is not None:
+            row.setParent(None)
+            row.deleteLater()
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+download_writer.py — Background file sink for downloads.
+
+Responsibilities:
+- Take (offset, bytes) chunks from a transfer on the GUI thread and write
+  them on a worker thread, so slow disks never stall the event loop.
+- Coalesce contiguous chunks into large writes cut at WRITE_ALIGN
+  boundaries (positional writes, so several segments can share a file).
+- Keep memory bounded: once MAX_PENDING_BYTES are queued, 'congested' tells
+  the transfer to stop reading its reply; Qt's bounded read buffer then
+  throttles the socket. 'drained' fires when the queue is half empty again.
+- Hash the data in file order (streaming for in-order chunks, read back
+  from the page cache for anything written out of order) and, on finish(),
+  trim, verify the expected checksum, fsync and rename off the GUI thread.
+- Run any other file work that must follow the queued writes (resume
+  sidecar, truncate, preallocate) in order on the same thread.
+
+With threaded=False every command runs inline on the caller's thread (used
+as a fallback and as the baseline in benchmarks/bench_writer.py).
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+
+try:
+    from PyQt6 import QtCore
+except ImportError:
+    from PyQt5 import QtCore
+
+from metrics import METRICS
+
+# Coalesced writes are cut at multiples of this (and flushed once this big)
+WRITE_ALIGN = 1024 * 1024
+# Queued-but-unwritten bytes before the transfer has to stop reading
+MAX_PENDING_BYTES = 8 * 1024 * 1024
+# Flush a partial run after this long without new data
+IDLE_FLUSH_S = 0.05
+# Bytes read back for hashing between two queue items
+HASH_CATCHUP_STEP = 8 * 1024 * 1024
+
+# Writers whose thread may still be running (see wait_all)
+_LIVE: set = set()
+_LIVE_LOCK = threading.Lock()
+
+
+def pwrite(fd: int, data, offset: int) -> int:
+    if hasattr(os, "pwrite"):
+        return os.pwrite(fd, data, offset)
+    # No pwrite (Windows): the writer thread is the only user of the fd
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+
+def pread(fd: int, n: int, offset: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, n, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, n)
+
+
+def wait_all(timeout_s: float = 5.0):
+    """Give running writers up to 'timeout_s' to finish (app exit)."""
+    deadline = time.time() + timeout_s
+    with _LIVE_LOCK:
+        threads = [w._thread for w in _LIVE if w._thread is not None]
+    for t in threads:
+        t.join(max(0.0, deadline - time.time()))
+
+
+class FileWriter(QtCore.QObject):
+    """
+    Ordered command queue over one open file. All methods are called from
+    the GUI thread; signals are delivered there too.
+    """
+
+    drained = QtCore.pyqtSignal()
+    done = QtCore.pyqtSignal(object)    # finish() result dict
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, file, prefix: int = 0, algos=("sha256",), threaded: bool = True,
+                 parent=None):
+        super().__init__(parent)
+        self.file = file
+        self.fd = file.fileno()
+        self.algos = tuple(sorted(set(algos)))
+        self.error = ""
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._congested = False
+        self._aborted = False
+
+        # Worker-side state
+        self._run_start = 0
+        self._run = bytearray()
+        self._extents: list[list[int]] = [[0, prefix]] if prefix > 0 else []
+        self._hashers = {a: hashlib.new(a) for a in self.algos}
+        self._hashed = 0
+
+        self._q = queue.Queue() if threaded else None
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._loop, name="download-writer", daemon=True)
+            with _LIVE_LOCK:
+                _LIVE.add(self)
+            self._thread.start()
+
+    # ---------- GUI side ----------
+    @property
+    def congested(self) -> bool:
+        return self._congested
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending
+
+    def write(self, data: bytes, offset: int):
+        n = len(data)
+        with self._lock:
+            self._pending += n
+            if self._pending >= MAX_PENDING_BYTES and not self._congested:
+                self._congested = True
+                METRICS.incr("download.writer_backpressure")
+        self._submit(("write", offset, data))
+
+    def truncate(self, size: int):
+        self._submit(("truncate", size))
+
+    def allocate(self, total: int):
+        self._submit(("allocate", total))
+
+    def mark_written(self, start: int, end: int):
+        """Declare [start, end) as already on disk (resumed data)."""
+        self._submit(("mark", start, end))
+
+    def call(self, fn):
+        """Run fn() on the writer thread once everything queued so far is written."""
+        self._submit(("call", fn))
+
+    def finish(self, size: int, expected=None, tmp_path: str = "", final_path: str = ""):
+        """
+        Flush, trim to 'size', compute digests, check 'expected' ((algo, hex)
+        or None), fsync, close and rename tmp_path -> final_path. The result
+        arrives through 'done': {"path", "digests", "verified", "mismatch",
+        "unverified", "error", "fsync_ms"}. With 'expected' set the file is
+        only renamed once that checksum was checked (re-read from disk if
+        the streaming hash did not cover it).
+        """
+        self._submit(("finish", size, expected, tmp_path, final_path))
+
+    def close(self, remove_paths=()):
+        """
+        Close the file. With 'remove_paths' (cancel) queued writes are
+        dropped and the paths deleted; otherwise they are written first.
+        """
+        if remove_paths:
+            self._aborted = True
+        self._submit(("close", tuple(remove_paths)))
+
+    def _submit(self, cmd):
+        if self._q is not None:
+            self._q.put(cmd)
+        elif self._execute(cmd):
+            # Inline: no coalescing, every chunk is written right away
+            self._flush_run()
+            self._catch_up_hash(HASH_CATCHUP_STEP)
+
+    # ---------- worker ----------
+    def _loop(self):
+        try:
+            while True:
+                busy = self._run or self._hashed < self._prefix()
+                try:
+                    cmd = self._q.get(timeout=IDLE_FLUSH_S if busy else None)
+                except queue.Empty:
+                    self._flush_run()
+                    self._catch_up_hash(HASH_CATCHUP_STEP)
+                    continue
+                if not self._execute(cmd):
+                    break
+                if self._q.empty():
+                    self._catch_up_hash(HASH_CATCHUP_STEP)
+        finally:
+            with _LIVE_LOCK:
+                _LIVE.discard(self)
+
+    def _execute(self, cmd) -> bool:
+        """Run one command; False once the file is closed."""
+        kind = cmd[0]
+        try:
+            if kind == "write":
+                if self._aborted or self.error:
+                    self._release(len(cmd[2]))
+                else:
+                    self._append(cmd[1], cmd[2])
+            elif kind == "close":
+                return self._close(cmd[1])
+            elif self.error:
+                if kind == "finish":
+                    self.done.emit({"error": self.error})
+            elif kind == "truncate":
+                self._flush_run()
+                os.ftruncate(self.fd, cmd[1])
+                self._clip(cmd[1])
+            elif kind == "allocate":
+                total = cmd[1]
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(self.fd, 0, total)
+                elif os.fstat(self.fd).st_size < total:
+                    os.ftruncate(self.fd, total)
+            elif kind == "mark":
+                self._add_extent(cmd[1], cmd[2])
+            elif kind == "call":
+                self._flush_run()
+                cmd[1]()
+            elif kind == "finish":
+                return self._finish(*cmd[1:])
+        except Exception as e:
+            if kind == "allocate":
+                return True  # preallocation is best-effort
+            self._set_error(str(e))
+            if kind == "finish":
+                self.done.emit({"error": self.error})
+        return True
+
+    def _set_error(self, message: str):
+        if not self.error:
+            self.error = message
+            self.failed.emit(message)
+
+    def _release(self, n: int):
+        with self._lock:
+            self._pending -= n
+            wake = self._congested and self._pending <= MAX_PENDING_BYTES // 2
+            if wake:
+                self._congested = False
+        if wake:
+            self.drained.emit()
+
+    def _append(self, offset: int, data: bytes):
+        if self._run and offset != self._run_start + len(self._run):
+            self._flush_run()
+        if not self._run:
+            self._run_start = offset
+        self._run += data
+        if len(self._run) >= WRITE_ALIGN:
+            self._flush_run(aligned=True)
+
+    def _flush_run(self, aligned: bool = False):
+        if not self._run:
+            return
+        start = self._run_start
+        n = len(self._run)
+        if aligned:
+            # Write up to the last WRITE_ALIGN boundary, keep the tail
+            cut = (start + n) // WRITE_ALIGN * WRITE_ALIGN - start
+            if cut > 0:
+                n = cut
+        view = memoryview(self._run)[:n]
+        done = 0
+        try:
+            while done < n:
+                done += pwrite(self.fd, view[done:], start + done)
+            if self._hashed == start:
+                for h in self._hashers.values():
+                    h.update(view)
+                self._hashed += n
+        finally:
+            view.release()
+        del self._run[:n]
+        self._run_start = start + n
+        self._add_extent(start, start + n)
+        self._release(n)
+
+    def _add_extent(self, a: int, b: int):
+        if b <= a:
+            return
+        ext = self._extents
+        ext.append([a, b])
+        ext.sort()
+        merged = [ext[0]]
+        for s, e in ext[1:]:
+            if s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        self._extents = merged
+
+    def _clip(self, size: int):
+        self._extents = [[s, min(e, size)] for s, e in self._extents if s < size]
+        if self._hashed > size:
+            # Rehash from the start (read back from disk as far as written)
+            self._hashers = {a: hashlib.new(a) for a in self.algos}
+            self._hashed = 0
+
+    def _prefix(self) -> int:
+        """End of the data written contiguously from offset 0."""
+        if self._extents and self._extents[0][0] == 0:
+            return self._extents[0][1]
+        return 0
+
+    def _catch_up_hash(self, max_bytes: int | None = None):
+        """Hash data written out of order once it joins the prefix."""
+        if self.error or not self._hashers:
+            return
+        end = self._prefix()
+        if max_bytes is not None:
+            end = min(end, self._hashed + max_bytes)
+        try:
+            while self._hashed < end:
+                data = pread(self.fd, min(WRITE_ALIGN, end - self._hashed), self._hashed)
+                if not data:
+                    break
+                for h in self._hashers.values():
+                    h.update(data)
+                self._hashed += len(data)
+        except OSError:
+            # Can't read back (e.g. file not opened for reading): no digests
+            self._hashers = {}
+
+    def _finish(self, size: int, expected, tmp_path: str, final_path: str) -> bool:
+        self._flush_run()
+        if os.fstat(self.fd).st_size != size:
+            # Drop a preallocated or stale tail beyond the data
+            os.ftruncate(self.fd, size)
+            self._clip(size)
+        if self._prefix() < size:
+            raise OSError(f"only {self._prefix()} of {size} bytes reached the disk")
+        self._catch_up_hash()
+        digests = {a: h.hexdigest() for a, h in self._hashers.items()} \
+            if self._hashed == size else {}
+        result = {"digests": digests, "verified": None, "mismatch": None, "error": "",
+                  "unverified": ""}
+        if expected:
+            algo, want = expected
+            if algo not in digests:
+                # Streaming hash incomplete, dropped, or another algorithm:
+                # read the file back rather than pass it unchecked
+                try:
+                    digests[algo] = self._hash_from_disk(algo, size, tmp_path)
+                except Exception as e:
+                    result["unverified"] = f"{algo}: {e}"
+            if algo in digests:
+                result["verified"] = digests[algo] == want
+                if not result["verified"]:
+                    result["mismatch"] = (algo, want, digests[algo])
+        if result["mismatch"] or result["unverified"]:
+            # Never rename a file whose requested checksum failed or is unknown
+            self.file.close()
+            self.done.emit(result)
+            return False
+
+        t0 = time.perf_counter()
+        os.fsync(self.fd)
+        self.file.close()
+        result["fsync_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        METRICS.observe("download.fsync_ms", result["fsync_ms"])
+        if final_path:
+            try:
+                os.replace(tmp_path, final_path)
+            except Exception:
+                # Best-effort rename fallback
+                if os.path.exists(final_path):
+                    os.remove(final_path)
+                os.rename(tmp_path, final_path)
+        result["path"] = final_path or tmp_path
+        self.done.emit(result)
+        return False
+
+    def _hash_from_disk(self, algo: str, size: int, tmp_path: str) -> str:
+        """Digest of the first 'size' bytes of the (flushed) temp file."""
+        h = hashlib.new(algo)
+        done = 0
+        with open(tmp_path or self.file.name, "rb") as f:
+            while done < size:
+                data = f.read(min(WRITE_ALIGN, size - done))
+                if not data:
+                    raise OSError(f"file ended after {done} of {size} bytes")
+                h.update(data)
+                done += len(data)
+        METRICS.incr("download.rehashed_bytes", done)
+        return h.hexdigest()
+
+    def _close(self, remove_paths) -> bool:
+        try:
+            if not remove_paths:
+                self._flush_run()
+            self.file.close()
+        except Exception:
+            pass
+        for p in remove_paths:
+            try:
+                if p and os.path.exists(p):
+                    os.remove(p)
+            except Exception:
+                pass
+        return False
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+engine_download.py — Downloads performed by QtWebEngine itself.
+
+EngineDownload wraps the QWebEngineDownloadItem (Qt5) /
+QWebEngineDownloadRequest (Qt6) handed over by the profile's
+downloadRequested signal. The engine keeps the original request (cookies,
+auth, POST body, and whatever it had already fetched), so nothing is
+downloaded twice. Only the target is chosen here: ~/Downloads/<sanitised
+name> via setDownloadDirectory / setDownloadFileName.
+
+It exposes the same surface as download.DownloadTransfer (states, signals,
+pause / resume / cancel, throttled progress), so the download manager queue
+and panel treat both kinds alike. The queue's concurrency cap is applied by
+pausing the accepted item until a slot is free. Engine downloads can't be
+restarted once interrupted, so there is no retry for them.
+
+The engine reads the socket itself, so the global rate cap (bandwidth.py)
+is applied after the fact: received bytes are charged to the limiter and
+the item is paused while it is in debt, then resumed once credit returns.
+"""
+
+import os
+import time
+
+from qt_compat import QtCore, vlog
+from download import (
+    DownloadTransfer,
+    PRIORITY_NORMAL,
+    SpeedEstimator,
+    default_download_dir,
+    unique_path,
+    _sanitize_filename,
+)
+from bandwidth import LIMITER
+from metrics import METRICS
+
+_MISSING = object()
+
+
+def _dl_enum(item, name: str):
+    # Qt5: QWebEngineDownloadItem.<Name>
+    # Qt6: QWebEngineDownloadRequest.DownloadState.<Name>
+    cls = type(item)
+    enum = getattr(cls, "DownloadState", None)
+    v = getattr(enum, name, _MISSING) if enum is not None else _MISSING
+    return getattr(cls, name, None) if v is _MISSING else v
+
+
+def suggested_name(item) -> str:
+    """The file name the engine proposes for 'item' (sanitised)."""
+    for attr in ("downloadFileName", "suggestedFileName"):
+        fn = getattr(item, attr, None)
+        if fn:
+            try:
+                name = fn()
+                if name:
+                    return _sanitize_filename(name)
+            except Exception:
+                pass
+    try:
+        return _sanitize_filename(os.path.basename(item.path()))
+    except Exception:
+        pass
+    return _sanitize_filename(item.url().fileName() or "download")
+
+
+def set_target(item, path: str):
+    """Point the engine at 'path' (directory + file name, or setPath on old Qt5)."""
+    d, name = os.path.split(path)
+    if hasattr(item, "setDownloadDirectory") and hasattr(item, "setDownloadFileName"):
+        item.setDownloadDirectory(d)
+        item.setDownloadFileName(name)
+    else:
+        item.setPath(path)
+
+
+class EngineDownload(QtCore.QObject):
+    """
+    DownloadTransfer look-alike backed by a QtWebEngine download item.
+    """
+
+    progress = QtCore.pyqtSignal(object, object)
+    stateChanged = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+
+    QUEUED = DownloadTransfer.QUEUED
+    RUNNING = DownloadTransfer.RUNNING
+    PAUSED = DownloadTransfer.PAUSED
+    DONE = DownloadTransfer.DONE
+    FAILED = DownloadTransfer.FAILED
+    CANCELLED = DownloadTransfer.CANCELLED
+
+    UI_INTERVAL = DownloadTransfer.UI_INTERVAL
+
+    # The queue must not try to restart an interrupted engine download
+    can_retry = False
+    retrying = False
+    attempt = 0
+
+    def __init__(self, item, path: str, priority: int = PRIORITY_NORMAL, parent=None):
+        super().__init__(parent)
+        self.item = item
+        self.url = item.url()
+        self.final_path = path
+        self.priority = priority
+        self.state = self.QUEUED
+        self.error = ""
+        self.received = 0
+        self.total = -1
+        self.speed_bps = 0.0
+        self._speed = SpeedEstimator()
+        self.start_time = None
+        self._bytes0 = 0
+        self._last_emit = 0.0
+        self._charged = 0           # bytes already charged to the rate limiter
+        self._throttled = False
+
+        set_target(item, path)
+        item.accept()
+        # Hold until the queue gives us a slot (pause() is ignored before the
+        # engine reports InProgress, so _on_engine_state repeats it)
+        self._engine_pause()
+
+        if hasattr(item, "downloadProgress"):
+            item.downloadProgress.connect(self._on_progress)
+        else:
+            item.receivedBytesChanged.connect(lambda: self._on_progress(None, None))
+            item.totalBytesChanged.connect(lambda: self._on_progress(None, None))
+        item.stateChanged.connect(lambda _s: self._on_engine_state())
+        if hasattr(item, "finished"):
+            item.finished.connect(self._on_engine_state)
+        METRICS.incr("download.engine")
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.final_path)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            if state != self.RUNNING:
+                LIMITER.forget(self)
+                self._throttled = False
+            self.stateChanged.emit(state)
+
+    def _engine_pause(self):
+        try:
+            self.item.pause()
+        except Exception:
+            pass
+
+    def _hold(self):
+        try:
+            if not self.item.isPaused():
+                self.item.pause()
+        except Exception:
+            pass
+
+    # ---------- control (same surface as DownloadTransfer) ----------
+    def start(self):
+        if self.state != self.QUEUED:
+            return
+        self.start_time = time.time()
+        self._bytes0 = self._charged = self.received
+        self._speed.reset(self.received, self.start_time)
+        self._set_state(self.RUNNING)
+        try:
+            self.item.resume()
+        except Exception:
+            pass
+        self._on_engine_state()
+
+    def pause(self):
+        if self.state == self.RUNNING:
+            self._engine_pause()
+            self.speed_bps = 0.0
+            self._set_state(self.PAUSED)
+            self._emit_progress(force=True)
+
+    def resume(self):
+        if self.state == self.PAUSED:
+            self.start_time = time.time()
+            self._bytes0 = self._charged = self.received
+            self._speed.reset(self.received, self.start_time)
+            self._set_state(self.RUNNING)
+            try:
+                self.item.resume()
+            except Exception:
+                pass
+
+    def requeue(self) -> bool:
+        return False
+
+    def cancel(self):
+        if self.state in (self.DONE, self.CANCELLED, self.FAILED):
+            return
+        self._set_state(self.CANCELLED)
+        try:
+            self.item.cancel()
+        except Exception:
+            pass
+
+    def suspend(self, message: str = "Interrupted"):
+        # The engine can't hand an unfinished download over to a later run
+        if self.state in (self.RUNNING, self.PAUSED):
+            self.error = message
+            self._set_state(self.FAILED)
+            try:
+                self.item.cancel()
+            except Exception:
+                pass
+
+    def eta_s(self) -> float:
+        if self.total > 0:
+            return self._speed.eta_s(self.total - self.received)
+        return 0.0
+
+    # ---------- engine signals ----------
+    def _on_progress(self, received, total):
+        try:
+            self.received = int(self.item.receivedBytes() if received is None else received)
+            t = int(self.item.totalBytes() if total is None else total)
+            self.total = t if t > 0 else -1
+        except Exception:
+            return
+        if self.state == self.QUEUED:
+            self._hold()
+            return
+        self._charge()
+        self._emit_progress()
+
+    # ---------- rate limit ----------
+    def _charge(self):
+        delta = self.received - self._charged
+        self._charged = self.received
+        if self.state != self.RUNNING or delta <= 0:
+            return
+        LIMITER.consume(self, delta)
+        budget = LIMITER.allowance(self)
+        if budget is not None and budget <= 0 and not self._throttled:
+            self._throttled = True
+            self._engine_pause()
+            LIMITER.wait(self, self._unthrottle)
+
+    def _unthrottle(self):
+        if self._throttled and self.state == self.RUNNING:
+            self._throttled = False
+            try:
+                self.item.resume()
+            except Exception:
+                pass
+
+    def _emit_progress(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_emit < self.UI_INTERVAL:
+            return
+        self._last_emit = now
+        if self.state == self.RUNNING and self.start_time:
+            self.speed_bps = self._speed.update(self.received, now)
+            METRICS.set("download.speed_bps", int(self.speed_bps))
+        self.progress.emit(self.received, self.total)
+
+    def _on_engine_state(self):
+        item = self.item
+        try:
+            st = item.state()
+        except Exception:
+            return
+        if st == _dl_enum(item, "DownloadInProgress"):
+            if self.state == self.QUEUED:
+                self._hold()
+        elif st == _dl_enum(item, "DownloadCompleted"):
+            if self.state == self.DONE:
+                return
+            self._on_progress(None, None)
+            try:
+                self.final_path = os.path.join(item.downloadDirectory(), item.downloadFileName())
+            except Exception:
+                try:
+                    self.final_path = item.path()
+                except Exception:
+                    pass
+            elapsed = max(0.001, time.time() - (self.start_time or time.time()))
+            METRICS.incr("download.completed")
+            METRICS.incr("download.bytes", self.received - self._bytes0)
+            METRICS.observe("download.mbps", round((self.received - self._bytes0) / elapsed / 1e6, 3))
+            METRICS.set("download.speed_bps", 0)
+            self.speed_bps = 0.0
+            self._set_state(self.DONE)
+            self._emit_progress(force=True)
+            self.finished.emit(self.final_path)
+        elif st == _dl_enum(item, "DownloadInterrupted"):
+            if self.state in (self.FAILED, self.CANCELLED):
+                return
+            try:
+                self.error = item.interruptReasonString() or "Download interrupted"
+            except Exception:
+                self.error = "Download interrupted"
+            vlog(f"[Download] {self.name}: {self.error}")
+            METRICS.incr("download.failed")
+            self.speed_bps = 0.0
+            self._set_state(self.FAILED)
+            self.failed.emit(self.error)
+        elif st == _dl_enum(item, "DownloadCancelled"):
+            if self.state not in (self.CANCELLED, self.FAILED):
+                self._set_state(self.CANCELLED)
+
+
+def target_for(item, taken=()) -> str:
+    """~/Downloads/<suggested name>, made unique against files and 'taken'."""
+    return unique_path(os.path.join(default_download_dir(), suggested_name(item)), taken)
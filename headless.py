@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+headless.py — Batch page loader for `main.py --headless`.
+
+Loads a list of URLs (or local HTML files) through the real browser stack,
+the profile from web_profile.build_profile(), SecurePage and
+TinyAdblockInterceptor, with no window and no Browser object. Up to
+'parallel' pages load at once. For each page it reports:
+- load_ms: loadStarted → loadFinished
+- blocked: requests blocked by the adblocker for this page, counted by
+  first-party page URL (so fixtures on one host still load in parallel;
+  only the same URL listed twice and loading at once shares a count)
+- renderer_pid / renderer_peak_rss_kb: the page's renderer process and its
+  peak RSS (VmHWM) when the page finished
+
+Meant for repeatable end-to-end benchmarks on the offscreen QPA.
+"""
+
+import json
+import os
+import time
+
+from qt_compat import QtCore, QUrl, vlog
+from adblocker import TinyAdblockInterceptor, load_blocklist, ADBLOCK_ALLOW_SUFFIXES
+from hsts import UpgradeTable
+from metrics import proc_status_kb
+from web_page import SecurePage
+from web_profile import build_profile
+
+# Give up on a page after this many seconds
+PAGE_TIMEOUT_S = 30.0
+
+
+def read_url_file(path: str) -> list[str]:
+    """One URL or path per line; blank lines and #comments are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+
+
+class HeadlessRunner(QtCore.QObject):
+    """
+    Drives a queue of page loads and collects one result dict per URL.
+    Call start(); 'done_cb(report)' runs when every page has finished.
+    """
+
+    def __init__(self, urls, parallel: int = 4, timeout_s: float = PAGE_TIMEOUT_S,
+                 profile_mode: str = "lean", adblock: bool = True, done_cb=None):
+        super().__init__()
+        self.urls = [QUrl.fromUserInput(u, os.getcwd()) for u in urls]
+        self.parallel = max(1, int(parallel))
+        self.timeout_ms = int(timeout_s * 1000)
+        self.profile_mode = profile_mode
+        self.done_cb = done_cb
+
+        self.profile = build_profile(profile_mode)
+        hosts, paths = load_blocklist()
+        self.upgrades = UpgradeTable()
+        self.adblock = TinyAdblockInterceptor(
+            hosts, paths, ADBLOCK_ALLOW_SUFFIXES, upgrades=self.upgrades
+        )
+        self.adblock.enabled = adblock
+        self.adblock.blocked_by_first_party = {}
+        try:
+            self.profile.setUrlRequestInterceptor(self.adblock)
+        except Exception:
+            self.profile.setRequestInterceptor(self.adblock)
+
+        self._next = 0
+        self._active = {}       # page -> result dict
+        self.results = [None] * len(self.urls)
+        self._t0 = 0.0
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        for _ in range(min(self.parallel, len(self.urls))):
+            self._launch_next()
+        if not self.urls:
+            self._finish()
+
+    def _launch_next(self):
+        if self._next >= len(self.urls):
+            return
+        i = self._next
+        self._next += 1
+        url = self.urls[i]
+        page = SecurePage(self.profile, None, upgrades=self.upgrades)
+        res = {"index": i, "url": url.toString(), "ok": False, "load_ms": None}
+        res["_t0"] = time.perf_counter()
+        self._active[page] = res
+
+        timer = QtCore.QTimer(page)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda p=page: self._on_done(p, False, timed_out=True))
+        timer.start(self.timeout_ms)
+        page.loadStarted.connect(lambda p=page: self._on_started(p))
+        page.loadFinished.connect(lambda ok, p=page: self._on_done(p, ok))
+        page.setUrl(url)
+
+    def _on_started(self, page):
+        res = self._active.get(page)
+        if res is not None and "_started" not in res:
+            res["_started"] = time.perf_counter()
+
+    def _on_done(self, page, ok: bool, timed_out: bool = False):
+        res = self._active.pop(page, None)
+        if res is None:
+            return
+        t_end = time.perf_counter()
+        res["ok"] = bool(ok)
+        res["timed_out"] = timed_out
+        res["load_ms"] = round((t_end - res.pop("_started", res["_t0"])) * 1000.0, 1)
+        res["wall_ms"] = round((t_end - res.pop("_t0")) * 1000.0, 1)
+        res["final_url"] = page.url().toString()
+        # Reset by the interceptor at this page's main-frame request
+        final = page.url()
+        key = self.adblock.page_key(final if not final.isEmpty() else QUrl(res["url"]))
+        res["blocked"] = self.adblock.blocked_by_first_party.get(key, 0)
+        try:
+            pid = page.renderProcessPid()
+        except Exception:
+            pid = -1
+        res["renderer_pid"] = pid
+        res["renderer_peak_rss_kb"] = proc_status_kb(pid, "VmHWM")
+        self.results[res["index"]] = res
+        vlog(f"[Headless] {res['url']} ok={res['ok']} {res['load_ms']} ms blocked={res['blocked']}")
+
+        page.deleteLater()
+        self._launch_next()
+        if not self._active and self._next >= len(self.urls):
+            self._finish()
+
+    def _finish(self):
+        pages = [r for r in self.results if r is not None]
+        loads = sorted(r["load_ms"] for r in pages if r["ok"] and r["load_ms"] is not None)
+        report = {
+            "profile_mode": self.profile_mode,
+            "adblock": self.adblock.enabled,
+            "parallel": self.parallel,
+            "pages": pages,
+            "ok": sum(1 for r in pages if r["ok"]),
+            "failed": sum(1 for r in pages if not r["ok"]),
+            "median_load_ms": loads[len(loads) // 2] if loads else None,
+            "max_renderer_peak_rss_kb": max(
+                (r["renderer_peak_rss_kb"] for r in pages), default=-1
+            ),
+            "total_s": round(time.perf_counter() - self._t0, 3),
+        }
+        if self.done_cb:
+            self.done_cb(report)
+
+
+def write_report(report: dict, path: str | None = None):
+    """Write the JSON report to 'path' or stdout."""
+    data = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    else:
+        print(data, flush=True)
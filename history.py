@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+history.py — Browsing history stored in SQLite (WAL mode).
+
+Responsibilities:
+- Record visits (URL, title, timestamp, transition) without blocking the GUI:
+  callers only enqueue, and a single background writer thread commits the
+  queue in batches.
+- Expire old visits and reclaim space with incremental vacuum, scheduled on
+  the writer thread.
+- Serve read queries (top sites, bulk load for the URL bar index) from a
+  separate connection; WAL lets reads run alongside the writer.
+
+Schema: one row per URL in 'urls' (with aggregate counts) and one row per
+visit in 'visits'; both are indexed for the expiry and ranking queries so
+the store stays fast with millions of visits.
+"""
+
+import queue
+import threading
+import time
+
+from pathlib import Path
+
+from qt_compat import vlog
+
+# Database location
+HISTORY_FILE = Path.home() / ".runit_qt_history.sqlite"
+
+# Writer batching: commit when this many ops are queued or this much time passed
+BATCH_MAX = 256
+BATCH_INTERVAL = 1.0          # seconds
+
+# Maintenance: expire visits older than this, at most once per interval
+EXPIRE_DAYS = 90
+MAINTENANCE_INTERVAL = 3600   # seconds
+VACUUM_PAGES = 2048           # pages released per incremental_vacuum run
+
+# Transitions that count as "typed" for ranking
+TYPED_TRANSITIONS = ("typed",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    id          INTEGER PRIMARY KEY,
+    url         TEXT NOT NULL UNIQUE,
+    title       TEXT NOT NULL DEFAULT '',
+    visit_count INTEGER NOT NULL DEFAULT 0,
+    typed_count INTEGER NOT NULL DEFAULT 0,
+    last_visit  REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS visits (
+    id         INTEGER PRIMARY KEY,
+    url_id     INTEGER NOT NULL,
+    ts         REAL NOT NULL,
+    transition TEXT NOT NULL DEFAULT 'link'
+);
+CREATE INDEX IF NOT EXISTS visits_ts ON visits(ts);
+CREATE INDEX IF NOT EXISTS visits_url ON visits(url_id);
+CREATE INDEX IF NOT EXISTS urls_visit_count ON urls(visit_count);
+CREATE INDEX IF NOT EXISTS urls_last_visit ON urls(last_visit);
+"""
+
+_UPSERT_URL = """
+INSERT INTO urls (url, title, visit_count, typed_count, last_visit)
+VALUES (?, ?, 1, ?, ?)
+ON CONFLICT(url) DO UPDATE SET
+    visit_count = visit_count + 1,
+    typed_count = typed_count + excluded.typed_count,
+    last_visit  = MAX(last_visit, excluded.last_visit),
+    title       = CASE WHEN excluded.title != '' THEN excluded.title ELSE title END
+"""
+
+_INSERT_VISIT = """
+INSERT INTO visits (url_id, ts, transition)
+VALUES ((SELECT id FROM urls WHERE url = ?), ?, ?)
+"""
+
+_UPDATE_TITLE = "UPDATE urls SET title = ? WHERE url = ?"
+
+# Take visits about to expire (ts < ?) out of their URL's counters
+_UNCOUNT_EXPIRED = """
+UPDATE urls SET
+    visit_count = MAX(0, visit_count - (
+        SELECT COUNT(*) FROM visits v WHERE v.url_id = urls.id AND v.ts < :cutoff)),
+    typed_count = MAX(0, typed_count - (
+        SELECT COUNT(*) FROM visits v WHERE v.url_id = urls.id AND v.ts < :cutoff
+        AND v.transition IN ({typed})))
+WHERE id IN (SELECT url_id FROM visits WHERE ts < :cutoff)
+""".format(typed=", ".join(f"'{t}'" for t in TYPED_TRANSITIONS))
+
+
+def _connect(path: Path) -> "sqlite3.Connection":
+    # Imported on first use (normally on a background thread), not at startup
+    import sqlite3
+
+    # Read-only use: WAL mode is a database setting made by the writer
+    conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class HistoryStore:
+    """
+    Queue-fronted history database.
+
+    record_visit()/update_title() are safe to call from the GUI thread: they
+    only append to an in-memory queue. Reads use their own connection and
+    should be done off the GUI thread for large results.
+    """
+
+    def __init__(self, path: Path = HISTORY_FILE, expire_days: int = EXPIRE_DAYS):
+        self.path = Path(path)
+        self.expire_days = expire_days
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = None
+        self._read_conn = None
+        self._read_lock = threading.Lock()
+        self._last_maintenance = 0.0
+        self.stats = {"batches": 0, "ops": 0, "expired": 0}
+
+    # ---------- write side (GUI thread) ----------
+    def record_visit(self, url: str, title: str = "", transition: str = "link",
+                     ts: float | None = None):
+        """Queue a visit to 'url'. Non-http(s) URLs are ignored."""
+        if not url.startswith(("http://", "https://")):
+            return
+        self._ensure_writer()
+        self._queue.put(("visit", url, title or "", transition, ts or time.time()))
+
+    def update_title(self, url: str, title: str):
+        """Queue a title update for an already recorded URL."""
+        if not title or not url.startswith(("http://", "https://")):
+            return
+        self._ensure_writer()
+        self._queue.put(("title", url, title))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far is committed."""
+        if self._writer is None:
+            return True
+        ev = threading.Event()
+        self._queue.put(("flush", ev))
+        return ev.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Commit pending writes and stop the writer thread."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout)
+            self._writer = None
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+
+    # ---------- writer thread ----------
+    def _ensure_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="history-writer", daemon=True
+            )
+            self._writer.start()
+
+    def _open_for_write(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        conn = sqlite3.connect(str(self.path), timeout=10)
+        # auto_vacuum must be chosen before the first table is created
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        return conn
+
+    def _writer_loop(self):
+        try:
+            conn = self._open_for_write()
+        except Exception as e:
+            vlog("[History] cannot open database:", e)
+            return
+
+        running = True
+        while running:
+            try:
+                first = self._queue.get(timeout=BATCH_INTERVAL)
+            except queue.Empty:
+                self._maybe_maintain(conn)
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + BATCH_INTERVAL
+            while len(batch) < BATCH_MAX and batch[-1] is not None and batch[-1][0] != "flush":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            waiters = []
+            try:
+                with conn:
+                    for op in batch:
+                        if op is None:
+                            running = False
+                        elif op[0] == "visit":
+                            _, url, title, transition, ts = op
+                            typed = 1 if transition in TYPED_TRANSITIONS else 0
+                            conn.execute(_UPSERT_URL, (url, title, typed, ts))
+                            conn.execute(_INSERT_VISIT, (url, ts, transition))
+                        elif op[0] == "title":
+                            conn.execute(_UPDATE_TITLE, (op[2], op[1]))
+                        elif op[0] == "flush":
+                            waiters.append(op[1])
+                self.stats["batches"] += 1
+                self.stats["ops"] += len(batch)
+            except Exception as e:
+                vlog("[History] batch failed:", e)
+            for ev in waiters:
+                ev.set()
+            self._maybe_maintain(conn)
+
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.close()
+        except Exception:
+            pass
+
+    def _maybe_maintain(self, conn: "sqlite3.Connection", force: bool = False):
+        """Expire old visits and release free pages, at most once per interval."""
+        now = time.time()
+        if not force and now - self._last_maintenance < MAINTENANCE_INTERVAL:
+            return
+        self._last_maintenance = now
+        try:
+            cutoff = now - self.expire_days * 86400
+            with conn:
+                # Counters must match the visits kept, or old heavy use
+                # outranks current sites in most-visited and frecency
+                conn.execute(_UNCOUNT_EXPIRED, {"cutoff": cutoff})
+                cur = conn.execute("DELETE FROM visits WHERE ts < ?", (cutoff,))
+                conn.execute(
+                    "DELETE FROM urls WHERE last_visit < ? "
+                    "AND id NOT IN (SELECT url_id FROM visits)",
+                    (cutoff,),
+                )
+            self.stats["expired"] += cur.rowcount or 0
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            if cur.rowcount:
+                vlog(f"[History] expired {cur.rowcount} visits")
+        except Exception as e:
+            vlog("[History] maintenance failed:", e)
+
+    # ---------- read side ----------
+    def _query(self, sql: str, args=()) -> list:
+        with self._read_lock:
+            if self._read_conn is None:
+                if not self.path.exists():
+                    return []
+                self._read_conn = _connect(self.path)
+            return self._read_conn.execute(sql, args).fetchall()
+
+    def top_sites(self, limit: int = 8) -> list[tuple[str, str, int]]:
+        """Return [(url, title, visit_count)] ordered by visit count."""
+        try:
+            return self._query(
+                "SELECT url, title, visit_count FROM urls "
+                "ORDER BY visit_count DESC LIMIT ?",
+                (limit,),
+            )
+        except Exception as e:
+            vlog("[History] top_sites failed:", e)
+            return []
+
+    def load_entries(self, limit: int = 200000) -> list[tuple]:
+        """
+        Return [(url, title, visit_count, typed_count, last_visit)] for the
+        most recently visited URLs (used to build the URL bar index).
+        """
+        try:
+            return self._query(
+                "SELECT url, title, visit_count, typed_count, last_visit FROM urls "
+                "ORDER BY last_visit DESC LIMIT ?",
+                (limit,),
+            )
+        except Exception as e:
+            vlog("[History] load_entries failed:", e)
+            return []
+
+    def visit_count(self) -> int:
+        try:
+            return self._query("SELECT COUNT(*) FROM visits")[0][0]
+        except Exception:
+            return 0
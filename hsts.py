@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+hsts.py — Host-level HTTP→HTTPS upgrade table.
+
+Responsibilities:
+- Answer "should http://<host> be upgraded?" quickly: preload rules live in
+  a suffix trie (labels stored right-to-left, so subdomain rules cost one
+  walk); learned hosts are exact-match entries.
+- Seed the trie from a small bundled HSTS preload snapshot (entries apply to
+  subdomains as well).
+- Learn from navigation outcomes: hosts that loaded over HTTPS are upgraded
+  up front next time; hosts whose HTTPS attempt failed at the connection
+  level are remembered as HTTP-only for this session only, so the failing
+  attempt is skipped until restart but never stored.
+- Persist learned HTTPS entries in a JSON file with expiry.
+
+Lookups are plain dict reads and are safe from the request interceptor
+thread; learning happens on the GUI thread.
+"""
+
+import json
+import time
+
+from pathlib import Path
+
+from qt_compat import vlog
+
+# Learned entries
+HSTS_FILE = Path.home() / ".runit_qt_hsts.json"
+
+# How long learned HTTPS entries stay valid (seconds)
+LEARNED_HTTPS_TTL = 30 * 86400
+
+# Upper bound on learned hosts (oldest are dropped first)
+MAX_LEARNED = 5000
+
+# Snapshot of HSTS-preloaded names that include subdomains. Whole gTLDs such
+# as .dev and .app are preloaded by their registries. Extend as needed.
+HSTS_PRELOAD = (
+    "app", "bank", "day", "dev", "foo", "insurance", "new", "page",
+    "github.com", "github.io", "paypal.com", "torproject.org", "twitter.com",
+    "wikipedia.org", "wikimedia.org", "mozilla.org", "duckduckgo.com",
+)
+
+HTTPS = "https"
+HTTP = "http"
+
+# Trie node keys (labels never start with these)
+_MODE = "\x00mode"
+_SUBS = "\x00subs"
+
+
+class SuffixTrie:
+    """
+    Reversed-label trie: "a.example.com" is stored as com → example → a.
+    Each node may carry a mode and an include-subdomains flag.
+    """
+
+    def __init__(self):
+        self.root: dict = {}
+        self.size = 0
+
+    @staticmethod
+    def _labels(host: str):
+        return reversed((host or "").lower().strip(".").split("."))
+
+    def insert(self, host: str, mode: str, include_subdomains: bool = False):
+        node = self.root
+        for label in self._labels(host):
+            node = node.setdefault(label, {})
+        if _MODE not in node:
+            self.size += 1
+        node[_MODE] = mode
+        node[_SUBS] = include_subdomains
+
+    def lookup(self, host: str):
+        """
+        Return the mode for 'host': an exact entry wins, otherwise the nearest
+        ancestor with include_subdomains. None when unknown.
+        """
+        node = self.root
+        inherited = None
+        labels = list(self._labels(host))
+        for i, label in enumerate(labels):
+            node = node.get(label)
+            if node is None:
+                return inherited
+            if _MODE in node:
+                if i == len(labels) - 1:
+                    return node[_MODE]
+                if node.get(_SUBS):
+                    inherited = node[_MODE]
+        return inherited
+
+
+class UpgradeTable:
+    """
+    Preload snapshot (suffix trie) + learned exact hosts, with JSON persistence.
+    Preloaded rules always win over learned ones.
+    """
+
+    def __init__(self, path: Path = HSTS_FILE, preload=HSTS_PRELOAD):
+        self.path = Path(path)
+        self.preload = SuffixTrie()
+        for name in preload:
+            self.preload.insert(name, HTTPS, include_subdomains=True)
+        # host -> (mode, learned_at); HTTPS only, persisted
+        self._learned: dict[str, tuple[str, float]] = {}
+        # Hosts that fell back to HTTP this session (never persisted)
+        self._session_http: set[str] = set()
+        self._dirty = False
+        self._load()
+
+    # ---------- persistence ----------
+    def _load(self):
+        try:
+            if not self.path.exists():
+                return
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            now = time.time()
+            for host, (mode, ts) in data.items():
+                # Older files may hold HTTP-only entries: no longer trusted
+                if mode == HTTPS and now - ts < LEARNED_HTTPS_TTL:
+                    self._learned[host] = (mode, ts)
+        except Exception as e:
+            vlog("[HSTS] load failed:", e)
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            self.path.write_text(json.dumps(self._learned), encoding="utf-8")
+            self._dirty = False
+        except Exception as e:
+            vlog("[HSTS] save failed:", e)
+
+    def __len__(self):
+        return self.preload.size + len(self._learned)
+
+    # ---------- queries ----------
+    def lookup(self, host: str):
+        """Return HTTPS, HTTP (HTTP-only this session) or None (unknown)."""
+        h = (host or "").lower().strip(".")
+        if not h:
+            return None
+        mode = self.preload.lookup(h)
+        if mode is not None:
+            return mode
+        if h in self._session_http:
+            return HTTP
+        item = self._learned.get(h)
+        if item is None:
+            return None
+        if time.time() - item[1] >= LEARNED_HTTPS_TTL:
+            return None
+        return item[0]
+
+    # ---------- learning (GUI thread) ----------
+    def learn(self, host: str, mode: str):
+        """
+        Remember that 'host' works over HTTPS (persisted), or only over HTTP
+        (kept for this session; a later HTTPS success clears it).
+        """
+        h = (host or "").lower().strip(".")
+        if not h or self.preload.lookup(h) is not None:
+            return
+        if mode != HTTPS:
+            self._session_http.add(h)
+            return
+        self._session_http.discard(h)
+        item = self._learned.get(h)
+        now = time.time()
+        # Refresh at most once a day to keep writes rare
+        if item is not None and item[0] == mode and now - item[1] < 86400:
+            return
+        learned = self._learned
+        learned[h] = (mode, now)
+        if len(learned) > MAX_LEARNED:
+            for old in sorted(learned, key=lambda k: learned[k][1])[: MAX_LEARNED // 10]:
+                del learned[old]
+        self._dirty = True
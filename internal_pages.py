@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+internal_pages.py — Built-in runit:// pages served from memory.
+
+This module:
+- Registers the runit:// scheme (must happen before QApplication exists).
+- Provides RunitSchemeHandler, which maps runit://<name> to a route callable
+  returning (mime, body) and replies from an in-memory QBuffer.
+- Renders runit://perf (HTML) and runit://perf.json from the metrics registry.
+"""
+
+import html
+import json
+
+from qt_compat import (
+    QtCore,
+    QWebEngineUrlScheme,
+    QWebEngineUrlSchemeHandler,
+    QWebEngineUrlRequestJob,
+    _IODEVICE,
+    vlog,
+)
+from metrics import METRICS
+
+SCHEME = b"runit"
+PERF_URL = "runit://perf"
+
+
+def register_scheme():
+    """
+    Declare runit:// to QtWebEngine. Call once, before QApplication.
+    """
+    if QWebEngineUrlScheme is None:
+        return
+    try:
+        scheme = QWebEngineUrlScheme(SCHEME)
+        syntax = getattr(QWebEngineUrlScheme, "Syntax", QWebEngineUrlScheme)
+        scheme.setSyntax(getattr(syntax, "Host"))
+        flags = getattr(QWebEngineUrlScheme, "Flag", QWebEngineUrlScheme)
+        scheme.setFlags(
+            getattr(flags, "SecureScheme")
+            | getattr(flags, "LocalScheme")
+            | getattr(flags, "ContentSecurityPolicyIgnored")
+        )
+        QWebEngineUrlScheme.registerScheme(scheme)
+    except Exception as e:
+        vlog("[Scheme] register failed:", e)
+
+
+class RunitSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves runit://<name> from route callables. Each route returns
+    (mime: bytes, body: bytes) and must not touch the disk.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._routes = {}
+
+    def add_route(self, name: str, fn):
+        self._routes[name.lower()] = fn
+
+    def install(self, profile):
+        """Attach this handler to 'profile' for the runit scheme."""
+        try:
+            profile.installUrlSchemeHandler(SCHEME, self)
+        except Exception as e:
+            vlog("[Scheme] install failed:", e)
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        name = (url.host() or url.path().strip("/")).lower()
+        fn = self._routes.get(name)
+        if fn is None:
+            job.fail(self._job_error("UrlNotFound"))
+            return
+        try:
+            mime, body = fn()
+        except Exception as e:
+            vlog(f"[Scheme] runit://{name} failed:", e)
+            job.fail(self._job_error("RequestFailed"))
+            return
+        buf = QtCore.QBuffer(job)
+        buf.setData(body)
+        buf.open(_IODEVICE("ReadOnly"))
+        job.reply(mime, buf)
+
+    @staticmethod
+    def _job_error(name: str):
+        enum = getattr(QWebEngineUrlRequestJob, "Error", QWebEngineUrlRequestJob)
+        return getattr(enum, name)
+
+
+# ------------------ runit://perf ------------------
+def perf_json():
+    """Route for runit://perf.json."""
+    data = json.dumps(METRICS.snapshot(), indent=2, default=str)
+    return b"application/json", data.encode("utf-8")
+
+
+def _table(rows, columns):
+    if not rows:
+        return "<p class='muted'>No data yet.</p>"
+    head = "".join(f"<th>{html.escape(c)}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(r.get(c, '')))}</td>" for c in columns) + "</tr>"
+        for r in rows
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def _kv_rows(d: dict):
+    return [{"name": k, "value": v} for k, v in sorted(d.items())]
+
+
+def perf_html():
+    """Route for runit://perf."""
+    snap = METRICS.snapshot()
+    sec = snap.get("sections", {})
+    series = [dict(name=k, **v) for k, v in sorted(snap["series"].items())]
+
+    net_rows = [
+        dict(purpose=k, **v) for k, v in sorted((sec.get("net") or {}).items())
+        if isinstance(v, dict)
+    ]
+
+    startup = sec.get("startup") or {}
+    startup_rows = [
+        {"phase": k, "at_ms": v, "delta_ms": startup.get("deltas_ms", {}).get(k, "")}
+        for k, v in (startup.get("phases_ms") or {}).items()
+    ]
+
+    parts = [
+        "<!doctype html><html><head><meta charset='utf-8'>",
+        "<meta http-equiv='refresh' content='5'>",
+        "<title>RunIT-QT performance</title><style>",
+        "body{font:14px sans-serif;background:#0B0F1A;color:#C9D1D9;margin:24px}",
+        "h2{color:#28C8FF;margin-top:28px}table{border-collapse:collapse}",
+        "td,th{border:1px solid #223056;padding:4px 10px;text-align:left}",
+        ".muted{color:#9AA8BC}",
+        "</style></head><body>",
+        "<h1>RunIT-QT performance</h1>",
+        f"<p class='muted'>pid {snap['pid']} · uptime {snap['uptime_s']} s · "
+        f"browser RSS {snap['rss_kb']} kB · <a href='runit://perf.json'>JSON</a></p>",
+        "<h2>Tabs</h2>",
+        _table(sec.get("tabs") or [], ["index", "title", "host", "pid", "rss_kb"]),
+        "<h2>Counters</h2>",
+        _table(_kv_rows(snap["counters"]), ["name", "value"]),
+        "<h2>Gauges</h2>",
+        _table(_kv_rows(snap["gauges"]), ["name", "value"]),
+        "<h2>Recent samples</h2>",
+        _table(series, ["name", "count", "last", "min", "median", "max"]),
+        "<h2>Network sessions</h2>",
+        _table(net_rows, ["purpose", "requests", "reused", "http2"]),
+        "<h2>Download bandwidth</h2>",
+        _table(_kv_rows(sec.get("bandwidth") or {}), ["name", "value"]),
+        "<h2>Data saver</h2>",
+        _table(_kv_rows(sec.get("data_saver") or {}), ["name", "value"]),
+        "<h2>Load timings (slowest hosts)</h2>",
+        _table(sec.get("timings") or [], ["host", "count", "median", "p90", "ctx"]),
+        "<h2>Startup</h2>",
+        _table(startup_rows, ["phase", "at_ms", "delta_ms"]),
+        "</body></html>",
+    ]
+    return b"text/html", "".join(parts).encode("utf-8")
@@ -4,6 +4,32 @@
 main.py — Entry point for RunIT-QT PyQt WebEngine browser.
 
 This just wires up QApplication and the Browser window.
+
+Options:
+  URL ...                      open these URLs instead of home/session
+                               (the saved session is then left untouched;
+                               everything after "--" is taken as a URL)
+  --profile-startup[=PATH]     write startup phase timings as JSON
+                               (to PATH, or stdout if omitted)
+  --quit-after-startup         exit once the first page has loaded
+  --profile-mode=lean|persistent
+                               lean: off-the-record, no HTTP cache (default)
+                               persistent: on-disk profile with disk cache
+  --cache-size-mb=N            disk cache cap for the persistent profile
+  --engine-preset=low-memory|balanced|throughput
+                               Chromium flag preset (see config.ENGINE_PRESETS)
+  --headless                   no window: load the given URLs / HTML files
+                               on the offscreen platform and print a JSON
+                               report (load time, blocked requests, renderer
+                               peak RSS per page), then exit
+  --url-file=PATH              (headless) read URLs from PATH, one per line
+  --parallel=N                 (headless) pages loading at once (default 4)
+  --page-timeout=S             (headless) per-page timeout in seconds
+  --no-adblock                 (headless) load with the adblocker disabled
+  --output=PATH                (headless) write the report to PATH
+
+Defaults for these options can also be set in ~/.runit_qt_config.json
+(keys "profile_mode", "disk_cache_mb" and "engine_preset").
 """
 
 import os
@@ -16,17 +42,222 @@ import sys
 sys.dont_write_bytecode = True
 os.environ.setdefault("PYTHONDONTWRITEBYTECODE", "1")
 
-from qt_compat import QApplication, API_NAME, PYQT_VER, QT_VER
-from config import APP_NAME
+# Must come first: its import time is the startup reference point.
+from startup_profile import STARTUP
+
+from qt_compat import QApplication, QtCore, API_NAME, PYQT_VER, QT_VER, vlog
+from config import (
+    APP_NAME,
+    PROFILE_MODE,
+    PROFILE_MODES,
+    DISK_CACHE_MB,
+    ENGINE_PRESET,
+    ENGINE_PRESETS,
+    load_user_config,
+)
 from browser import Browser
+from internal_pages import register_scheme
+from metrics import METRICS
+
+STARTUP.mark("imports")
+
+# Qt's own command-line options that take a separate value ("-style fusion");
+# the value is passed on to Qt with the option, not opened as a URL.
+QT_VALUE_OPTIONS = {
+    "style", "stylesheet", "platform", "platformpluginpath", "platformtheme",
+    "plugin", "qmljsdebugger", "qwindowgeometry", "qwindowtitle", "qwindowicon",
+    "session", "display", "geometry", "title", "name", "font", "fn",
+    "background", "bg", "foreground", "fg", "button", "btn", "visual", "ncols",
+    "inputstyle", "im", "dialogs",
+}
+
+
+def parse_args(argv):
+    """
+    Split our own options from the arguments passed on to Qt.
+
+    Returns (opts: dict, qt_argv: list[str]).
+    """
+    user = load_user_config()
+    opts = {
+        "profile_startup": None,
+        "quit_after_startup": False,
+        "urls": [],
+        "profile_mode": user.get("profile_mode", PROFILE_MODE),
+        "cache_mb": user.get("disk_cache_mb", DISK_CACHE_MB),
+        "engine_preset": user.get("engine_preset", ENGINE_PRESET),
+        "headless": False,
+        "url_file": None,
+        "parallel": 4,
+        "page_timeout": None,       # None: headless.PAGE_TIMEOUT_S
+        "adblock": True,
+        "output": None,
+    }
+    qt_argv = [argv[0]] if argv else ["runit-qt"]
+    args = iter(argv[1:])
+    for a in args:
+        if a == "--":
+            opts["urls"].extend(args)
+        elif a == "--profile-startup":
+            opts["profile_startup"] = ""
+        elif a.startswith("--profile-startup="):
+            opts["profile_startup"] = a.split("=", 1)[1]
+        elif a == "--quit-after-startup":
+            opts["quit_after_startup"] = True
+        elif a.startswith("--profile-mode="):
+            opts["profile_mode"] = a.split("=", 1)[1]
+        elif a.startswith("--cache-size-mb="):
+            opts["cache_mb"] = a.split("=", 1)[1]
+        elif a.startswith("--engine-preset="):
+            opts["engine_preset"] = a.split("=", 1)[1]
+        elif a == "--headless":
+            opts["headless"] = True
+        elif a.startswith("--url-file="):
+            opts["url_file"] = a.split("=", 1)[1]
+        elif a.startswith("--parallel="):
+            opts["parallel"] = a.split("=", 1)[1]
+        elif a.startswith("--page-timeout="):
+            opts["page_timeout"] = a.split("=", 1)[1]
+        elif a == "--no-adblock":
+            opts["adblock"] = False
+        elif a.startswith("--output="):
+            opts["output"] = a.split("=", 1)[1]
+        elif not a.startswith("-"):
+            opts["urls"].append(a)
+        else:
+            qt_argv.append(a)
+            if a.lstrip("-") in QT_VALUE_OPTIONS:
+                value = next(args, None)
+                if value is not None:
+                    qt_argv.append(value)
+
+    if opts["profile_mode"] not in PROFILE_MODES:
+        print(f"[Config] unknown profile mode {opts['profile_mode']!r}, using lean", flush=True)
+        opts["profile_mode"] = "lean"
+    if opts["engine_preset"] not in ENGINE_PRESETS:
+        print(f"[Config] unknown engine preset {opts['engine_preset']!r}, using {ENGINE_PRESET}",
+              flush=True)
+        opts["engine_preset"] = ENGINE_PRESET
+    try:
+        opts["cache_mb"] = max(1, int(opts["cache_mb"]))
+    except Exception:
+        opts["cache_mb"] = DISK_CACHE_MB
+    try:
+        opts["parallel"] = max(1, int(opts["parallel"]))
+    except Exception:
+        opts["parallel"] = 4
+    if opts["page_timeout"] is not None:
+        try:
+            opts["page_timeout"] = max(1.0, float(opts["page_timeout"]))
+        except Exception:
+            opts["page_timeout"] = None
+    return opts, qt_argv
+
+
+def apply_engine_preset(name: str) -> list[str]:
+    """
+    Export the preset's Chromium switches via QTWEBENGINE_CHROMIUM_FLAGS.
+    Flags already present in the environment are kept and come last, so a
+    user's explicit flags win. Must run before QApplication is created.
+    """
+    headless = os.environ.get("QT_QPA_PLATFORM", "") in ("offscreen", "minimal")
+    flags = ENGINE_PRESETS[name].chromium_flags(headless=headless)
+    existing = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "").strip()
+    os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = " ".join(flags + ([existing] if existing else []))
+    return flags
+
+
+def run_headless(opts, qt_argv):
+    """
+    Batch-load opts["urls"] (plus --url-file) without a window and exit.
+    Returns the process exit code: 0 if every page loaded, 1 otherwise.
+    """
+    # Only needed here: kept out of the GUI startup path
+    from headless import HeadlessRunner, PAGE_TIMEOUT_S, read_url_file, write_report
+
+    urls = list(opts["urls"])
+    if opts["url_file"]:
+        try:
+            urls += read_url_file(opts["url_file"])
+        except Exception as e:
+            print(f"[Headless] cannot read {opts['url_file']}: {e}", file=sys.stderr, flush=True)
+            return 2
+    if not urls:
+        print("[Headless] no URLs given", file=sys.stderr, flush=True)
+        return 2
+
+    engine_flags = apply_engine_preset(opts["engine_preset"])
+    register_scheme()
+    app = QApplication(qt_argv)
+    result = {}
+
+    def on_done(report):
+        report["engine_preset"] = opts["engine_preset"]
+        report["engine_flags"] = engine_flags
+        result.update(report)
+        write_report(report, opts["output"])
+        QtCore.QTimer.singleShot(0, app.quit)
+
+    runner = HeadlessRunner(
+        urls,
+        parallel=opts["parallel"],
+        timeout_s=opts["page_timeout"] or PAGE_TIMEOUT_S,
+        profile_mode=opts["profile_mode"],
+        adblock=opts["adblock"],
+        done_cb=on_done,
+    )
+    QtCore.QTimer.singleShot(0, runner.start)
+    getattr(app, "exec", getattr(app, "exec_", lambda: 0))()
+    return 0 if result and not result.get("failed") else 1
 
 
 def main():
-    app = QApplication(sys.argv)
-    w = Browser()
+    opts, qt_argv = parse_args(sys.argv)
+
+    if opts["headless"]:
+        # No display needed; honour an explicit QT_QPA_PLATFORM
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        sys.exit(run_headless(opts, qt_argv))
+
+    # Chromium reads its flags when QtWebEngine initialises
+    engine_flags = apply_engine_preset(opts["engine_preset"])
+
+    # Custom schemes must be declared before QApplication is created
+    register_scheme()
+
+    app = QApplication(qt_argv)
+    STARTUP.mark("qapplication")
+
+    if opts["profile_startup"] is not None:
+        STARTUP.enabled = True
+        STARTUP.report_path = opts["profile_startup"] or None
+
+    def on_startup_complete():
+        if STARTUP.enabled:
+            path = STARTUP.write_report()
+            if path:
+                print(f"[Startup] report written to {path}", flush=True)
+        if opts["quit_after_startup"]:
+            QtCore.QTimer.singleShot(0, w.close)
+
+    STARTUP.complete_cb = on_startup_complete
+
+    w = Browser(
+        start_urls=opts["urls"],
+        profile_mode=opts["profile_mode"],
+        cache_mb=opts["cache_mb"],
+    )
 
     banner = f"{API_NAME} {PYQT_VER} (Qt {QT_VER})"
+    if opts["profile_mode"] == "persistent":
+        banner += f" — persistent profile, {opts['cache_mb']} MB cache"
+    else:
+        banner += " — lean profile"
+    banner += f" — engine: {opts['engine_preset']}"
     print(banner, flush=True)
+    vlog("[Engine] flags:", " ".join(engine_flags) or "(none)")
+    METRICS.set("engine.preset", opts["engine_preset"])
+    METRICS.set("engine.flags", " ".join(engine_flags))
 
     try:
         w.status.showMessage(banner, 5000)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+metrics.py — Process-wide metrics registry.
+
+Modules publish into METRICS with cheap calls:
+- incr(name, n)      monotonically increasing counters
+- set(name, value)   last-value gauges
+- observe(name, v)   small rolling series (recent samples only)
+- provide(name, fn)  lazy sections computed only when a snapshot is taken
+
+Publishing may happen from any thread (the adblock interceptor, download
+workers), so updates go through one short lock. Snapshots are plain dicts
+built from memory only; they back the runit://perf page.
+"""
+
+import os
+import threading
+import time
+
+from collections import deque
+
+# Samples kept per rolling series
+SERIES_LEN = 120
+
+
+def proc_status_kb(pid: int, field: str = "VmRSS") -> int:
+    """
+    Return a kB value from /proc/<pid>/status (e.g. VmRSS, VmHWM), or -1 when
+    unavailable (non-Linux, process gone, permission denied).
+    """
+    if not pid or pid <= 0:
+        return -1
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return -1
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-memory counters, gauges and rolling series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._counters: dict[str, float] = {}
+        self._gauges: dict = {}
+        self._series: dict[str, deque] = {}
+        self._providers: dict = {}
+
+    def incr(self, name: str, n: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set(self, name: str, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            d = self._series.get(name)
+            if d is None:
+                d = self._series[name] = deque(maxlen=SERIES_LEN)
+            d.append(value)
+
+    def provide(self, name: str, fn):
+        """Register a callable whose result is included in snapshots."""
+        self._providers[name] = fn
+
+    def counter(self, name: str, default: float = 0):
+        return self._counters.get(name, default)
+
+    def snapshot(self) -> dict:
+        """
+        Return a JSON-friendly copy of all metrics. Providers are evaluated
+        here, so call this from the GUI thread.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            series = {k: list(v) for k, v in self._series.items()}
+
+        summaries = {}
+        for k, vals in series.items():
+            if not vals:
+                continue
+            s = sorted(vals)
+            summaries[k] = {
+                "count": len(s),
+                "last": vals[-1],
+                "min": s[0],
+                "median": s[len(s) // 2],
+                "max": s[-1],
+            }
+
+        sections = {}
+        for name, fn in list(self._providers.items()):
+            try:
+                sections[name] = fn()
+            except Exception as e:
+                sections[name] = {"error": str(e)}
+
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "pid": os.getpid(),
+            "rss_kb": proc_status_kb(os.getpid()),
+            "counters": counters,
+            "gauges": gauges,
+            "series": summaries,
+            "sections": sections,
+        }
+
+
+# Shared registry for the whole process
+METRICS = MetricsRegistry()
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+net_session.py — Process-wide network sessions.
+
+Responsibilities:
+- Own one long-lived QNetworkAccessManager per purpose ("downloads",
+  "certs", "blocklist"), so Qt's connection cache can keep sockets alive
+  between requests (redirect hops, retries, resumes, the next probe to the
+  same host) instead of every operation paying for a new TCP+TLS handshake.
+- prepare(req): allow HTTP/2, ask for keep-alive and enable TLS session
+  sharing/persistence, so even a new connection to a known host can resume
+  its TLS session.
+- fetch_bytes(): the same for plain Python threads (the blocklist updater
+  runs without an event loop): pooled keep-alive http.client connections
+  per origin with one shared SSL context, gzip and redirects.
+- Count requests, connection reuse and HTTP/2 use per purpose (stats(),
+  shown on runit://perf).
+
+Qt doesn't report per request whether a pooled socket was used, so reuse
+of the Qt managers is counted when a request goes to an origin that had a
+finished request within KEEPALIVE_S (Qt's idle-connection expiry) or a
+multiplexed HTTP/2 request still in flight.
+
+Imports only QtCore/QtNetwork (like download.py), so the standalone
+downloader stays free of WebEngine.
+"""
+
+import threading
+import time
+
+try:
+    from PyQt6 import QtCore, QtNetwork
+except ImportError:
+    from PyQt5 import QtCore, QtNetwork
+
+from metrics import METRICS
+
+# Qt drops idle pooled connections after this long
+KEEPALIVE_S = 120.0
+# Idle http.client connections kept per origin (thread fetches)
+POOL_IDLE_S = 60.0
+USER_AGENT = "RunIT-QT/0.9 (+local)"
+
+
+def _enum(cls, group: str, name: str):
+    # Qt5: Class.<Name>; Qt6: Class.<Group>.<Name>
+    v = getattr(getattr(cls, group, None), name, None)
+    return getattr(cls, name, None) if v is None else v
+
+
+def _req_attr(name: str):
+    return _enum(QtNetwork.QNetworkRequest, "Attribute", name)
+
+
+def _ssl_option(name: str):
+    QSsl = getattr(QtNetwork, "QSsl", None)
+    return _enum(QSsl, "SslOption", name) if QSsl is not None else None
+
+
+def _reply_failed(reply) -> bool:
+    try:
+        return reply.error() != _enum(QtNetwork.QNetworkReply, "NetworkError", "NoError")
+    except Exception:
+        return True
+
+
+def _origin(url) -> tuple:
+    scheme = (url.scheme() or "").lower()
+    return scheme, (url.host() or "").lower(), url.port(443 if scheme == "https" else 80)
+
+
+class HTTPStatusError(Exception):
+    """Non-2xx answer from fetch_bytes()."""
+
+    def __init__(self, code: int, url: str):
+        super().__init__(f"HTTP {code} for {url}")
+        self.code = code
+        self.url = url
+
+
+class NetworkSession:
+    """
+    Shared network managers and connection pool. Qt managers are created
+    lazily on first use and must be used from the GUI thread.
+    """
+
+    def __init__(self):
+        self._managers: dict = {}
+        self._ssl_conf = None
+        self._lock = threading.Lock()
+        # (purpose, origin) -> [inflight, last finished, http2 seen]
+        self._origins: dict = {}
+        self._stats: dict = {}
+        # origin -> [(connection, idle since)] for fetch_bytes()
+        self._pool: dict = {}
+        self._ssl_ctx = None
+
+    # ---------- Qt managers ----------
+    def manager(self, purpose: str = "downloads"):
+        mgr = self._managers.get(purpose)
+        if mgr is None:
+            mgr = self._managers[purpose] = QtNetwork.QNetworkAccessManager()
+            mgr.setObjectName(f"net-{purpose}")
+            # Keep the C++ object alive for the life of the process
+            app = QtCore.QCoreApplication.instance()
+            if app is not None:
+                mgr.setParent(app)
+        return mgr
+
+    def purpose_of(self, mgr) -> str:
+        for purpose, m in self._managers.items():
+            if m is mgr:
+                return purpose
+        return "other"
+
+    def _tls_conf(self):
+        if self._ssl_conf is None:
+            try:
+                conf = QtNetwork.QSslConfiguration.defaultConfiguration()
+                for name, off in (("SslOptionDisableSessionSharing", False),
+                                  ("SslOptionDisableSessionPersistence", False)):
+                    opt = _ssl_option(name)
+                    if opt is not None:
+                        conf.setSslOption(opt, off)
+                self._ssl_conf = conf
+            except Exception:
+                self._ssl_conf = False  # built without SSL
+        return self._ssl_conf or None
+
+    def prepare(self, req, http2: bool = True):
+        """
+        Set the shared connection options on a QNetworkRequest and return it.
+        Pass http2=False for requests that need a connection of their own
+        (segmented downloads: HTTP/2 would multiplex them onto one socket).
+        """
+        attr = _req_attr("Http2AllowedAttribute")
+        if attr is not None:
+            req.setAttribute(attr, http2)
+        req.setRawHeader(b"Connection", b"keep-alive")
+        if req.url().scheme().lower() == "https":
+            conf = self._tls_conf()
+            if conf is not None:
+                req.setSslConfiguration(conf)
+        return req
+
+    def track(self, reply, purpose: str = "downloads"):
+        """Count 'reply' in the stats of 'purpose' (call right after get/head)."""
+        key = (purpose,) + _origin(reply.url())
+        now = time.time()
+        o = self._origins.get(key)
+        reused = o is not None and ((o[0] > 0 and o[2]) or (o[1] and now - o[1] < KEEPALIVE_S))
+        with self._lock:
+            st = self._stats.setdefault(purpose, {"requests": 0, "reused": 0, "http2": 0})
+            st["requests"] += 1
+            st["reused"] += int(reused)
+        METRICS.incr("net.requests")
+        if reused:
+            METRICS.incr("net.reused")
+        if o is None:
+            o = self._origins[key] = [0, 0.0, False]
+        o[0] += 1
+
+        def done(r=reply, o=o, st=st):
+            o[0] = max(0, o[0] - 1)
+            # A failed request may have taken its connection down with it
+            o[1] = 0.0 if _reply_failed(r) else time.time()
+            try:
+                h2 = _req_attr("Http2WasUsedAttribute")
+                if h2 is not None and r.attribute(h2):
+                    o[2] = True
+                    with self._lock:
+                        st["http2"] += 1
+            except Exception:
+                pass
+
+        reply.finished.connect(done)
+        return reply
+
+    def get(self, req, purpose: str = "downloads", http2: bool = True):
+        return self.track(self.manager(purpose).get(self.prepare(req, http2)), purpose)
+
+    def head(self, req, purpose: str = "certs"):
+        return self.track(self.manager(purpose).head(self.prepare(req)), purpose)
+
+    # ---------- thread fetches (http.client) ----------
+    def _connect(self, scheme: str, host: str, port: int, timeout: float):
+        # Imported lazily: http.client/ssl are only needed by background workers
+        import http.client
+
+        if scheme == "https":
+            if self._ssl_ctx is None:
+                import ssl
+
+                self._ssl_ctx = ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_ctx)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _checkout(self, origin: tuple, timeout: float):
+        now = time.time()
+        with self._lock:
+            idle = self._pool.get(origin) or []
+            while idle:
+                conn, since = idle.pop()
+                if now - since < POOL_IDLE_S:
+                    conn.timeout = timeout
+                    return conn, True
+                conn.close()
+        return self._connect(*origin, timeout), False
+
+    def _checkin(self, origin: tuple, conn):
+        with self._lock:
+            self._pool.setdefault(origin, []).append((conn, time.time()))
+
+    def fetch_bytes(self, url: str, timeout: float = 30, headers: dict | None = None,
+                    purpose: str = "blocklist", max_redirects: int = 5) -> bytes:
+        """
+        GET 'url' from any thread over a pooled keep-alive connection.
+        Follows redirects, decodes gzip, raises HTTPStatusError on non-2xx.
+        """
+        import gzip
+        from urllib.parse import urljoin, urlsplit
+
+        for _hop in range(max_redirects + 1):
+            u = urlsplit(url)
+            scheme = (u.scheme or "http").lower()
+            origin = (scheme, (u.hostname or "").lower(), u.port or (443 if scheme == "https" else 80))
+            target = (u.path or "/") + (f"?{u.query}" if u.query else "")
+            hdrs = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip",
+                    "Connection": "keep-alive"}
+            hdrs.update(headers or {})
+
+            for attempt in (0, 1):
+                conn, reused = self._checkout(origin, timeout)
+                try:
+                    conn.request("GET", target, headers=hdrs)
+                    resp = conn.getresponse()
+                    body = resp.read()
+                    break
+                except Exception:
+                    conn.close()
+                    # A pooled socket may have been closed by the server meanwhile
+                    if reused and attempt == 0:
+                        continue
+                    raise
+
+            with self._lock:
+                st = self._stats.setdefault(purpose, {"requests": 0, "reused": 0, "http2": 0})
+                st["requests"] += 1
+                st["reused"] += int(reused)
+            METRICS.incr("net.requests")
+            if reused:
+                METRICS.incr("net.reused")
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(origin, conn)
+
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                url = urljoin(url, resp.getheader("Location"))
+                continue
+            if not 200 <= resp.status < 300:
+                raise HTTPStatusError(resp.status, url)
+            if (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+                body = gzip.decompress(body)
+            return body
+        raise HTTPStatusError(310, url)
+
+    def close_idle(self):
+        """Close pooled thread connections (e.g. when the updater is done)."""
+        with self._lock:
+            pool, self._pool = self._pool, {}
+        for idle in pool.values():
+            for conn, _since in idle:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    # ---------- stats ----------
+    def stats(self) -> dict:
+        """Per purpose: requests, reused connections, HTTP/2 answers."""
+        with self._lock:
+            out = {k: dict(v) for k, v in self._stats.items()}
+            out["pooled_idle"] = sum(len(v) for v in self._pool.values())
+        return out
+
+
+NET = NetworkSession()
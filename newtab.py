@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+newtab.py — Built-in runit://newtab page.
+
+Responsibilities:
+- Keep a small most-visited index that is seeded from the history store in
+  the background and then updated incrementally per visit.
+- Build the page HTML once (search box + quick links) and only re-render the
+  most-visited tiles when the index actually changed.
+- Everything is served from memory and the page references no remote assets,
+  so a new tab renders without any network request.
+"""
+
+import html
+import threading
+
+from config import APP_NAME, QUICK_LINKS
+from qt_compat import vlog
+
+# Tiles shown on the page / entries kept in the index
+TOP_N = 8
+MAX_ENTRIES = 500
+
+
+class MostVisited:
+    """
+    Visit counter keyed by URL with a cached top-N list.
+
+    record() is O(1) apart from the occasional cheap re-check of the cached
+    top list, so it can run on every page load.
+    """
+
+    def __init__(self, history=None, top_n: int = TOP_N):
+        self.history = history
+        self.top_n = top_n
+        self._entries: dict[str, list] = {}   # url -> [count, title]
+        self._top: list[str] | None = None
+        self._seed = None                     # rows handed over by the loader thread
+        self.version = 0                      # bumps when top() changes
+
+    def load_async(self):
+        """
+        Read the top URLs from history on a worker thread. The result is
+        merged on the next record()/top() call on the GUI thread.
+        """
+        if self.history is None:
+            return
+
+        def worker():
+            try:
+                self._seed = self.history.top_sites(MAX_ENTRIES)
+            except Exception as e:
+                vlog("[NewTab] history seed failed:", e)
+
+        threading.Thread(target=worker, name="newtab-seed", daemon=True).start()
+
+    def _merge_seed(self):
+        rows, self._seed = self._seed, None
+        for url, title, count in rows:
+            e = self._entries.get(url)
+            if e is None:
+                self._entries[url] = [int(count), title or ""]
+            else:
+                # Visits recorded this session are already in history too
+                e[0] = max(e[0], int(count))
+                e[1] = e[1] or title or ""
+        self._top = None
+        self.version += 1
+
+    def record(self, url: str, title: str = "", count: int = 1):
+        """Count a visit to 'url' and keep the cached top list current."""
+        if not url.startswith(("http://", "https://")):
+            return
+        if self._seed is not None:
+            self._merge_seed()
+        e = self._entries.get(url)
+        if e is None:
+            e = self._entries[url] = [0, ""]
+        e[0] += count
+        retitled = bool(title) and title != e[1]
+        if title:
+            e[1] = title
+
+        top = self._top
+        if top is None:
+            return
+        if url in top or len(top) < self.top_n or e[0] > self._entries[top[-1]][0]:
+            # Only the visited URL moved; re-sort the small top list.
+            new = sorted(set(top) | {url}, key=lambda u: -self._entries[u][0])[: self.top_n]
+            if new != top or (retitled and url in new):
+                self._top = new
+                self.version += 1
+
+        if len(self._entries) > MAX_ENTRIES:
+            self._prune()
+
+    def _prune(self):
+        keep = sorted(self._entries.items(), key=lambda kv: -kv[1][0])[: MAX_ENTRIES // 2]
+        self._entries = dict(keep)
+        self._top = None
+        self.version += 1
+
+    def top(self) -> list[tuple[str, str, int]]:
+        """Return [(url, title, count)] for the most visited URLs."""
+        if self._seed is not None:
+            self._merge_seed()
+        if self._top is None:
+            self._top = sorted(self._entries, key=lambda u: -self._entries[u][0])[: self.top_n]
+        return [(u, self._entries[u][1], self._entries[u][0]) for u in self._top]
+
+
+_PAGE_HEAD = """<!doctype html>
+<html><head><meta charset="utf-8"><title>New Tab</title>
+<style>
+body{{margin:0;font:15px sans-serif;background:#0B0F1A;color:#C9D1D9;
+     display:flex;flex-direction:column;align-items:center}}
+h1{{font-weight:500;color:#E6EDF3;margin:12vh 0 24px}}
+form{{display:flex;width:min(640px,90vw)}}
+input{{flex:1;padding:12px 14px;font-size:16px;border:1px solid #223056;
+      background:#0E1730;color:#E6EDF3;border-radius:6px 0 0 6px;outline:none}}
+button{{padding:0 18px;border:1px solid #223056;background:#28C8FF;color:#0B0F1A;
+       border-radius:0 6px 6px 0;cursor:pointer}}
+.grid{{display:grid;grid-template-columns:repeat(4,150px);gap:14px;margin-top:36px}}
+a.tile{{display:block;padding:14px;background:#0F1527;border:1px solid #1D2744;
+       border-radius:8px;color:#C9D1D9;text-decoration:none;overflow:hidden;
+       white-space:nowrap;text-overflow:ellipsis}}
+a.tile:hover{{border-color:#28C8FF}}
+.badge{{display:inline-block;width:28px;height:28px;line-height:28px;text-align:center;
+       border-radius:50%;background:#7C4DFF;color:#fff;margin-right:8px}}
+h2{{font-size:13px;font-weight:500;color:#9AA8BC;margin:32px 0 0;text-transform:uppercase}}
+</style></head>
+<body>
+<h1>{app}</h1>
+<form action="https://startpage.com/do/search" method="get">
+<input name="query" placeholder="Search Startpage or type a URL in the address bar" autofocus>
+<button type="submit">Search</button>
+</form>
+"""
+
+_PAGE_TAIL = """</body></html>"""
+
+
+def _tiles(items) -> str:
+    out = []
+    for url, title in items:
+        label = title or url.split("://", 1)[-1]
+        letter = html.escape((label.strip() or "?")[0].upper())
+        out.append(
+            f'<a class="tile" href="{html.escape(url, quote=True)}" '
+            f'title="{html.escape(url, quote=True)}"><span class="badge">{letter}</span>'
+            f"{html.escape(label)}</a>"
+        )
+    return '<div class="grid">' + "".join(out) + "</div>"
+
+
+class NewTabPage:
+    """
+    Renders runit://newtab. The static parts are encoded once; the tiles
+    fragment is cached and rebuilt only when MostVisited.version changes.
+    """
+
+    def __init__(self, most_visited: MostVisited):
+        self.most_visited = most_visited
+        self._head = _PAGE_HEAD.format(app=html.escape(APP_NAME)).encode("utf-8")
+        self._links = ("<h2>Quick links</h2>" + _tiles(QUICK_LINKS)).encode("utf-8")
+        self._tail = _PAGE_TAIL.encode("utf-8")
+        self._top_version = -1
+        self._top_html = b""
+        self._cached = b""
+
+    def __call__(self):
+        """Route callable for RunitSchemeHandler: returns (mime, body)."""
+        top = self.most_visited.top()
+        if self.most_visited.version != self._top_version or not self._cached:
+            self._top_version = self.most_visited.version
+            self._top_html = (
+                ("<h2>Most visited</h2>" + _tiles((u, t) for u, t, _c in top)).encode("utf-8")
+                if top else b""
+            )
+            self._cached = self._head + self._top_html + self._links + self._tail
+        return b"text/html", self._cached
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+omnibox.py — In-memory prefix index for URL bar suggestions.
+
+Design:
+- Entries are ranked once by frecency (visit count, typed bonus and recency
+  decay) and numbered in that order, so "best first" is simply "lowest id
+  first".
+- Every entry contributes a few tokens (URL without scheme/www, host labels,
+  path segments, title words). (token, id) pairs live in two parallel sorted
+  arrays; a query word maps to a contiguous range found with bisect.
+- Ranges larger than HEAVY_RANGE (e.g. a single letter) get their best
+  HEAVY_KEEP ids precomputed at build time, so every lookup is bounded.
+- query() remembers the previous keystroke's candidates; when the user keeps
+  typing, the new result is filtered from that list instead of searched again.
+- Visits made after the build go to a small overlay that is scanned
+  linearly: new URLs with their own score, known URLs as a score bump.
+  Once it holds OVERLAY_MAX entries, needs_rebuild tells the owner to build
+  a fresh index from history (off the GUI thread, like the first build).
+
+No Qt imports here: the index is built on a worker thread and benchmarked
+standalone (benchmarks/bench_omnibox.py).
+"""
+
+import heapq
+import re
+import time
+
+from bisect import bisect_left
+
+# Suggestions returned per query
+MAX_RESULTS = 8
+
+# Ranges above this size use precomputed best-id lists
+HEAVY_RANGE = 1024
+HEAVY_KEEP = 256
+
+# Overlay entries (new or re-visited URLs since build) before a rebuild
+OVERLAY_MAX = 512
+
+_SPLIT = re.compile(r"[^\w]+", re.UNICODE)
+_HIGH = "\U0010ffff"
+
+
+def frecency(visit_count: int, typed_count: int, last_visit: float,
+             now: float | None = None) -> float:
+    """
+    Frecency score: visits (typed ones weigh more) scaled by recency.
+    """
+    age_days = max(0.0, ((now or time.time()) - (last_visit or 0)) / 86400.0)
+    if age_days < 4:
+        decay = 1.0
+    elif age_days < 14:
+        decay = 0.7
+    elif age_days < 31:
+        decay = 0.5
+    elif age_days < 90:
+        decay = 0.3
+    else:
+        decay = 0.1
+    return (visit_count + 2 * typed_count) * decay * 100.0
+
+
+def _url_key(url: str) -> str:
+    u = url.split("://", 1)[-1].lower()
+    return u[4:] if u.startswith("www.") else u
+
+
+def tokenize(url: str, title: str = "") -> list[str]:
+    """Return the distinct lowercase tokens for an entry."""
+    key = _url_key(url)
+    host, _, path = key.partition("/")
+    toks = {key}
+    labels = host.split(".")
+    toks.update(l for l in labels[:-1] if l)
+    toks.update(t for t in _SPLIT.split(path.lower()) if len(t) > 1)
+    toks.update(t for t in _SPLIT.split((title or "").lower()) if t)
+    return list(toks)
+
+
+class PrefixIndex:
+    """
+    Read-mostly prefix index over (url, title) entries ranked by frecency.
+    """
+
+    def __init__(self, rows=(), now: float | None = None):
+        """
+        'rows' are (url, title, visit_count, typed_count, last_visit) tuples,
+        as returned by HistoryStore.load_entries().
+        """
+        now = now or time.time()
+        ranked = sorted(
+            ((frecency(v, t, lv, now), url, title or "") for url, title, v, t, lv in rows),
+            key=lambda r: -r[0],
+        )
+        self.urls = [r[1] for r in ranked]
+        self.titles = [r[2] for r in ranked]
+        self.scores = [r[0] for r in ranked]
+        self._url_ids = {u: i for i, u in enumerate(self.urls)}
+
+        pairs = []
+        hay = []
+        for i, (url, title) in enumerate(zip(self.urls, self.titles)):
+            toks = tokenize(url, title)
+            hay.append(" " + " ".join(toks))
+            pairs.extend((t, i) for t in toks)
+        pairs.sort()
+        self._tokens = [p[0] for p in pairs]
+        self._ids = [p[1] for p in pairs]
+        self._hay = hay
+
+        self._heavy: dict[str, list[int]] = {}
+        self._build_heavy(0, len(self._tokens), 0)
+
+        # Visits after build: url -> [score, title, haystack] for new URLs,
+        # and the ids of indexed URLs whose score was bumped
+        self._overlay: dict[str, list] = {}
+        self._bumped: set[int] = set()
+
+        # Incremental state from the previous query
+        self._prev_query = ""
+        self._prev_cands: list[int] | None = None
+
+    def __len__(self):
+        return len(self.urls) + len(self._overlay)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """True once the overlay is full; visits are still counted meanwhile."""
+        return len(self._overlay) + len(self._bumped) >= OVERLAY_MAX
+
+    # ---------- build helpers ----------
+    def _build_heavy(self, lo: int, hi: int, depth: int):
+        """
+        Precompute best ids for every prefix whose range exceeds HEAVY_RANGE.
+        Recurses only into heavy sub-ranges, so the cost stays near-linear.
+        """
+        toks = self._tokens
+        i = lo
+        while i < hi:
+            # Skip tokens too short to extend at this depth
+            if len(toks[i]) <= depth:
+                i += 1
+                continue
+            prefix = toks[i][: depth + 1]
+            j = bisect_left(toks, prefix + _HIGH, i, hi)
+            if j - i > HEAVY_RANGE:
+                self._heavy[prefix] = self._best_unique(self._ids[i:j], HEAVY_KEEP)
+                self._build_heavy(i, j, depth + 1)
+            i = j
+
+    @staticmethod
+    def _best_unique(ids, k: int) -> list[int]:
+        return heapq.nsmallest(k, set(ids))
+
+    # ---------- lookups ----------
+    def _word_candidates(self, word: str):
+        """
+        Return (ids, complete) for a single prefix word. 'complete' is False
+        when the list was truncated to the precomputed best ids.
+        """
+        heavy = self._heavy.get(word)
+        if heavy is not None:
+            return heavy, False
+        lo = bisect_left(self._tokens, word)
+        hi = bisect_left(self._tokens, word + _HIGH, lo)
+        return sorted(set(self._ids[lo:hi])), True
+
+    def _matches(self, hay: str, words) -> bool:
+        for w in words:
+            if " " + w not in hay:
+                return False
+        return True
+
+    def query(self, text: str, limit: int = MAX_RESULTS) -> list[tuple[str, str]]:
+        """
+        Return up to 'limit' (url, title) suggestions for 'text', best first.
+        """
+        q = (text or "").lower().strip()
+        if q.startswith(("http://", "https://")):
+            q = q.split("://", 1)[1]
+        if q.startswith("www."):
+            q = q[4:]
+        words = q.split()
+        if not words:
+            self._prev_query, self._prev_cands = "", None
+            return []
+
+        hay = self._hay
+        prev = self._prev_cands
+        if prev is not None and self._prev_query and q.startswith(self._prev_query):
+            # Keep typing: narrow the previous complete candidate list.
+            cands = [i for i in prev if self._matches(hay[i], words)]
+            complete = True
+        else:
+            # Drive the lookup with the most selective word.
+            best = None
+            for w in words:
+                ids, complete_w = self._word_candidates(w)
+                if best is None or len(ids) < len(best[0]) or (complete_w and not best[1]):
+                    best = (ids, complete_w)
+            ids, complete = best
+            cands = [i for i in ids if self._matches(hay[i], words)] if len(words) > 1 else ids
+
+        self._prev_query = q
+        self._prev_cands = cands if complete else None
+
+        out = [(self.urls[i], self.titles[i]) for i in cands[:limit]]
+        if self._overlay or self._bumped:
+            out = self._merge_overlay(out, words, limit)
+        return out
+
+    # ---------- live updates ----------
+    def note_visit(self, url: str, title: str = "", typed: bool = False):
+        """
+        Account for a visit made after the index was built: known URLs get
+        their score raised (and are merged like overlay entries, since their
+        id order is fixed); new URLs go to the overlay.
+        """
+        delta = frecency(1, 1 if typed else 0, time.time())
+        i = self._url_ids.get(url)
+        if i is not None:
+            self.scores[i] += delta
+            self._bumped.add(i)
+            return
+        e = self._overlay.get(url)
+        if e is None:
+            e = self._overlay[url] = [0.0, "", ""]
+        e[0] += delta
+        if title:
+            e[1] = title
+        e[2] = " " + " ".join(tokenize(url, e[1]))
+
+    def _merge_overlay(self, out, words, limit):
+        extra = [
+            (score, url, title)
+            for url, (score, title, h) in self._overlay.items()
+            if self._matches(h, words)
+        ]
+        shown = {u for u, _t in out}
+        extra.extend(
+            (self.scores[i], self.urls[i], self.titles[i])
+            for i in self._bumped
+            if self.urls[i] not in shown and self._matches(self._hay[i], words)
+        )
+        if not extra and not any(self._url_ids[u] in self._bumped for u in shown):
+            return out
+        scored = [(self.scores[self._url_ids[u]], u, t) for u, t in out]
+        scored.extend(extra)
+        scored.sort(key=lambda r: -r[0])
+        return [(u, t) for _s, u, t in scored[:limit]]
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+page_timing.py — Per-tab navigation timing and Web Vitals collection.
+
+Responsibilities:
+- Inject a small observer script (isolated world) that accumulates LCP, CLS
+  and long-task counts inside the page without calling back into Python.
+- Collect one batched sample per navigation: Qt's loadStarted → loadFinished
+  time plus PerformanceNavigationTiming and the observer totals, read with a
+  single runJavaScript() poll after the load settles.
+- Keep a rolling per-host history (persisted as JSON) tagged with the browser
+  context (adblock, JS/images, profile) so slow sites and the effect of those
+  toggles can be compared.
+"""
+
+import json
+import time
+
+from collections import deque
+from pathlib import Path
+
+from qt_compat import QWebEngineScript, _SCRIPT, vlog
+
+# Where the rolling per-host history is stored between sessions
+TIMINGS_FILE = Path.home() / ".runit_qt_timings.json"
+
+# Samples kept per host
+HISTORY_PER_HOST = 50
+
+# Delay after loadFinished before the single vitals poll (LCP settles late)
+VITALS_POLL_DELAY_MS = 2500
+
+# Runs at document creation in the ApplicationWorld. Observers only update
+# counters in the isolated world; nothing is sent per frame or per entry.
+VITALS_OBSERVER_JS = r"""
+(function () {
+  if (window.__runitVitals) return;
+  var v = window.__runitVitals = {lcp: 0, cls: 0, longTasks: 0, longTaskMs: 0};
+  function obs(type, fn) {
+    try {
+      new PerformanceObserver(function (list) { list.getEntries().forEach(fn); })
+        .observe({type: type, buffered: true});
+    } catch (e) {}
+  }
+  obs("largest-contentful-paint", function (e) { v.lcp = e.renderTime || e.loadTime || e.startTime; });
+  obs("layout-shift", function (e) { if (!e.hadRecentInput) v.cls += e.value; });
+  obs("longtask", function (e) { v.longTasks += 1; v.longTaskMs += e.duration; });
+})();
+"""
+
+# Evaluated once per navigation; returns a JSON string.
+VITALS_COLLECT_JS = r"""
+(function () {
+  var n = (performance.getEntriesByType("navigation") || [])[0] || {};
+  var v = window.__runitVitals || {};
+  return JSON.stringify({
+    ttfb_ms: n.responseStart || 0,
+    dcl_ms: n.domContentLoadedEventEnd || 0,
+    load_event_ms: n.loadEventEnd || 0,
+    transfer_bytes: n.transferSize || 0,
+    lcp_ms: v.lcp || 0,
+    cls: v.cls || 0,
+    long_tasks: v.longTasks || 0,
+    long_task_ms: v.longTaskMs || 0
+  });
+})();
+"""
+
+
+def install_vitals_script(profile):
+    """
+    Register the Web Vitals observer on 'profile' (once) so every page on it
+    runs the script in the isolated ApplicationWorld.
+    """
+    try:
+        scripts = profile.scripts()
+        if hasattr(scripts, "find") and scripts.find("runit-vitals"):
+            return
+        s = QWebEngineScript()
+        s.setName("runit-vitals")
+        s.setSourceCode(VITALS_OBSERVER_JS)
+        s.setInjectionPoint(_SCRIPT("InjectionPoint", "DocumentCreation"))
+        s.setWorldId(_SCRIPT("ScriptWorldId", "ApplicationWorld"))
+        s.setRunsOnSubFrames(False)
+        scripts.insert(s)
+    except Exception as e:
+        vlog("[Timing] could not install vitals script:", e)
+
+
+def _pct(values, q: float):
+    """Nearest-rank percentile of a non-empty list."""
+    vals = sorted(values)
+    idx = min(len(vals) - 1, max(0, int(round(q * (len(vals) - 1)))))
+    return vals[idx]
+
+
+class PageTimingStore:
+    """
+    Rolling per-host store of navigation samples.
+
+    'context_provider' is a callable returning a small dict describing the
+    browser state at record time (e.g. adblock on/off); samples with the same
+    context can be compared against each other in summary().
+    """
+
+    def __init__(self, path: Path = TIMINGS_FILE, per_host: int = HISTORY_PER_HOST,
+                 context_provider=None):
+        self.path = Path(path)
+        self.per_host = per_host
+        self.context_provider = context_provider
+        self._hosts: dict[str, deque] = {}
+        self._loaded = False
+        self._dirty = False
+
+    # --- persistence ---
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            if self.path.exists():
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                for host, samples in data.get("hosts", {}).items():
+                    self._hosts[host] = deque(samples, maxlen=self.per_host)
+        except Exception as e:
+            vlog("[Timing] load failed:", e)
+
+    def save(self):
+        """Persist the store if anything changed since the last save."""
+        if not self._dirty:
+            return
+        try:
+            self.path.write_text(
+                json.dumps({"hosts": {h: list(d) for h, d in self._hosts.items()}}),
+                encoding="utf-8",
+            )
+            self._dirty = False
+        except Exception as e:
+            vlog("[Timing] save failed:", e)
+
+    # --- recording ---
+    def record(self, host: str, sample: dict):
+        """Append a sample for 'host', tagging it with the current context."""
+        host = (host or "").lower()
+        if not host:
+            return
+        self._ensure_loaded()
+        sample = dict(sample)
+        sample.setdefault("t", time.time())
+        if self.context_provider:
+            try:
+                sample["ctx"] = self.context_provider()
+            except Exception:
+                pass
+        d = self._hosts.get(host)
+        if d is None:
+            d = self._hosts[host] = deque(maxlen=self.per_host)
+        d.append(sample)
+        self._dirty = True
+
+    def samples(self, host: str) -> list:
+        self._ensure_loaded()
+        return list(self._hosts.get((host or "").lower(), ()))
+
+    # --- reporting ---
+    def summary(self, host: str | None = None, key: str = "load_ms") -> list[dict]:
+        """
+        Summarise 'key' per host and context: count, median and p90.
+        Sorted by median, slowest first.
+        """
+        self._ensure_loaded()
+        hosts = [host.lower()] if host else list(self._hosts)
+        rows = []
+        for h in hosts:
+            groups: dict[str, list] = {}
+            for s in self._hosts.get(h, ()):
+                if key in s and s.get("ok", True):
+                    ctx = json.dumps(s.get("ctx", {}), sort_keys=True)
+                    groups.setdefault(ctx, []).append(s[key])
+            for ctx, vals in groups.items():
+                rows.append({
+                    "host": h,
+                    "ctx": json.loads(ctx),
+                    "count": len(vals),
+                    "median": _pct(vals, 0.5),
+                    "p90": _pct(vals, 0.9),
+                })
+        rows.sort(key=lambda r: r["median"], reverse=True)
+        return rows
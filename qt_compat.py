@@ -45,6 +45,8 @@ QTabWidget = QtWidgets.QTabWidget
 QStatusBar = QtWidgets.QStatusBar
 QSizePolicy = QtWidgets.QSizePolicy
 QMessageBox = QtWidgets.QMessageBox
+QCompleter = QtWidgets.QCompleter
+QStringListModel = QtCore.QStringListModel
 
 # --- WebEngine imports ---
 if QT6:
@@ -53,15 +55,23 @@ if QT6:
         QWebEngineProfile, QWebEnginePage, QWebEngineSettings,
         QWebEngineDownloadRequest as QWebEngineDownloadItem,
         QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo,
+        QWebEngineScript,
+        QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob,
     )
 else:
     from PyQt5.QtWebEngineWidgets import (
         QWebEngineView, QWebEngineProfile, QWebEngineSettings,
-        QWebEnginePage, QWebEngineDownloadItem,
+        QWebEnginePage, QWebEngineDownloadItem, QWebEngineScript,
     )
     from PyQt5.QtWebEngineCore import (
         QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo,
+        QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob,
     )
+    try:
+        # Qt >= 5.12
+        from PyQt5.QtWebEngineCore import QWebEngineUrlScheme
+    except ImportError:
+        QWebEngineUrlScheme = None
 
 # -------- Version banner --------
 API_NAME = "PyQt6" if QT6 else "PyQt5"
@@ -102,6 +112,27 @@ def _COOKIES(name: str):
     return getattr(enum, name) if enum else getattr(QWebEngineProfile, name)
 
 
+def _SCRIPT(group: str, name: str):
+    """
+    Compatibility wrapper for QWebEngineScript enums
+    (e.g. _SCRIPT("InjectionPoint", "DocumentCreation")).
+    """
+    enum = getattr(QWebEngineScript, group, None)
+    return getattr(enum, name) if enum else getattr(QWebEngineScript, name)
+
+
+def _COMPLETION(name: str):
+    """Compatibility wrapper for QCompleter.CompletionMode enums."""
+    enum = getattr(QCompleter, "CompletionMode", None)
+    return getattr(enum, name) if enum else getattr(QCompleter, name)
+
+
+def _IODEVICE(name: str):
+    """Compatibility wrapper for QIODevice.OpenModeFlag enums."""
+    enum = getattr(QtCore.QIODevice, "OpenModeFlag", None)
+    return getattr(enum, name) if enum else getattr(QtCore.QIODevice, name)
+
+
 def _set_web_attr(settings_obj, name: str, value: bool):
     """
     Safely set WebEngine settings with both Qt5 and Qt6 APIs.
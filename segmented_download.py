@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+segmented_download.py — Multi-connection downloads for Range-capable servers.
+
+SegmentedTransfer behaves like download.DownloadTransfer until the first
+response headers arrive. If the server advertises 'Accept-Ranges: bytes' (or
+already answered a resume with 206) and the file is large enough, the byte
+range is split into N segments:
+- The first segment keeps the already-open response and simply stops
+  reading at its new end; the others are fetched with their own Range
+  requests.
+- Each segment queues its data at its own offset to the transfer's
+  FileWriter, which writes it with os.pwrite into the preallocated '.part'
+  file (no seeking, no shared file position).
+- When a segment finishes, its connection takes over half of the remaining
+  work of the segment expected to finish last (work stealing), so one slow
+  connection can't hold up the whole download.
+- A failed segment is retried on its own with backoff from where it stopped.
+- The finished file must contain exactly Content-Length bytes.
+
+Checksums stream through the writer's hashers while the lowest segment is
+written; the later segments are hashed from the page cache as the
+contiguous prefix grows (see download_writer.FileWriter).
+
+The resume sidecar lists the unfinished ranges ('holes'), so a resumed
+segmented download refetches only what is missing; its 'bytes' field stays
+the contiguous prefix, which is what a single-stream resume needs.
+"""
+
+import time
+
+from download import (
+    DownloadTransfer,
+    HASH_ALGOS,
+    HTTP_STATUS_ATTR,
+    MAX_READBUF,
+    PRIORITY_NORMAL,
+    QNetworkRequest,
+    RETRY_LIMIT,
+    QtCore,
+    _net_error,
+    _parse_content_range,
+    vlog,
+)
+from bandwidth import LIMITER
+from metrics import METRICS
+from net_session import NET
+
+# Files smaller than this are not split
+SEGMENT_MIN_BYTES = 4 * 1024 * 1024
+# A segment is only split if both halves get at least this much
+STEAL_MIN_BYTES = 1024 * 1024
+
+
+class _Segment:
+    """One byte range [pos, end) and the reply currently filling it."""
+
+    __slots__ = ("pos", "end", "reply", "attempt", "t0", "bytes0", "finish_pending")
+
+    def __init__(self, pos: int, end: int, reply=None):
+        self.pos = pos
+        self.end = end
+        self.reply = reply
+        self.attempt = 0
+        self.t0 = time.time()
+        self.bytes0 = pos
+        self.finish_pending = False
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.end - self.pos)
+
+    def eta(self, now: float) -> float:
+        """Seconds this segment still needs at its current speed."""
+        rate = (self.pos - self.bytes0) / max(0.001, now - self.t0)
+        return self.remaining / rate if rate > 0 else float("inf")
+
+
+class SegmentedTransfer(DownloadTransfer):
+    """
+    DownloadTransfer that fetches up to 'segments' ranges concurrently.
+    """
+
+    def __init__(self, url, path: str, priority: int = PRIORITY_NORMAL,
+                 manager=None, overwrite: bool = True, parent=None, segments: int = 4,
+                 expected_hash: str | None = None, hash_algos=HASH_ALGOS):
+        super().__init__(url, path, priority=priority, manager=manager,
+                         overwrite=overwrite, parent=parent,
+                         expected_hash=expected_hash, hash_algos=hash_algos)
+        self.max_segments = max(1, int(segments))
+        self.segmented = False
+        self._segs: list[_Segment] = []
+        self._holes: list[list[int]] = []   # [pos, end) not yet assigned
+        self._ranges_refused = False
+
+    def start(self):
+        self.segmented = False
+        self._segs = []
+        self._holes = []
+        self._ranges_refused = False
+        super().start()
+
+    # ---------- switching to segments ----------
+    def _on_headers(self, reply):
+        if self.segmented:
+            seg = self._seg_for(reply)
+            if seg is not None and not self._on_headers_segment(seg, reply):
+                self._assign_work()
+            return
+        super()._on_headers(reply)
+        if reply is not self.reply or self.state != self.RUNNING:
+            return
+        if self.max_segments < 2 or self._ranges_refused:
+            return
+        try:
+            status = int(reply.attribute(HTTP_STATUS_ATTR()) or 0)
+            ranges = bytes(reply.rawHeader(b"Accept-Ranges")).decode("latin-1").lower()
+        except Exception:
+            return
+        if status not in (200, 206) or (status == 200 and "bytes" not in ranges):
+            return
+        if self.total - self.offset < SEGMENT_MIN_BYTES:
+            return
+        self._split(reply)
+
+    def _split(self, reply):
+        """Turn the running response into segment 0 and open the rest."""
+        holes = self._saved_holes() if self.offset > 0 else []
+        if holes and holes[0][0] == self.offset:
+            # Resume: refetch only the missing ranges
+            first = holes.pop(0)
+            self.received = self.total - sum(e - p for p, e in holes) - (first[1] - first[0])
+            self._session_bytes0 = self.received
+        else:
+            span = self.total - self.offset
+            step = span // self.max_segments
+            bounds = [self.offset + i * step for i in range(self.max_segments)] + [self.total]
+            first = [bounds[0], bounds[1]]
+            holes = [[bounds[i], bounds[i + 1]] for i in range(1, self.max_segments)]
+
+        if holes:
+            # Everything outside the missing ranges is already on disk
+            pos = 0
+            for p, e in sorted(holes + [first]):
+                self._writer.mark_written(pos, p)
+                pos = e
+            self._writer.mark_written(pos, self.total)
+
+        self.segmented = True
+        self.reply = None  # owned by the segment now
+        self._segs = [_Segment(first[0], first[1], reply)]
+        self._holes = holes
+        vlog(f"[Download] {self.name}: {self.max_segments} segments over {self.total} bytes")
+        self._assign_work()
+
+    def _saved_holes(self) -> list[list[int]]:
+        meta = self._resume_state or {}
+        if int(meta.get("total") or -1) != self.total:
+            return []
+        out = []
+        for h in meta.get("holes") or []:
+            try:
+                p, e = int(h[0]), int(h[1])
+            except Exception:
+                return []
+            if 0 <= p < e <= self.total:
+                out.append([p, e])
+        return sorted(out)
+
+    # ---------- segment lifecycle ----------
+    def _open_segment(self, seg: _Segment):
+        req = QNetworkRequest(self.url)
+        req.setRawHeader(b"User-Agent", self.user_agent)
+        req.setRawHeader(b"Range", f"bytes={seg.pos}-{seg.end - 1}".encode("ascii"))
+        validator = self._etag if self._etag and not self._etag.startswith("W/") \
+            else self._last_modified
+        if validator:
+            req.setRawHeader(b"If-Range", validator.encode("latin-1", "replace"))
+
+        # No HTTP/2 here: it would multiplex every segment onto one connection
+        reply = seg.reply = NET.track(self.manager.get(NET.prepare(req, http2=False)),
+                                      NET.purpose_of(self.manager))
+        try:
+            # Stay within the transfer's MAX_READBUF until _tune_io reshares it
+            reply.setReadBufferSize(min(self.readbuf, MAX_READBUF // max(1, len(self._segs))))
+        except Exception:
+            pass
+        reply.readyRead.connect(self._on_ready_read)
+        reply.finished.connect(lambda r=reply: self._on_finished(r))
+        if hasattr(reply, "metaDataChanged"):
+            reply.metaDataChanged.connect(lambda r=reply: self._on_headers(r))
+        seg.t0 = time.time()
+        seg.bytes0 = seg.pos
+        METRICS.incr("download.segments_opened")
+
+    def _seg_for(self, reply):
+        for seg in self._segs:
+            if seg.reply is reply:
+                return seg
+        return None
+
+    def _release(self, seg: _Segment):
+        """Detach and abort a segment's reply (late signals are ignored)."""
+        r, seg.reply = seg.reply, None
+        if r is not None:
+            try:
+                r.abort()
+            except Exception:
+                pass
+            r.deleteLater()
+
+    def _assign_work(self):
+        """Fill free connection slots from holes, then by work stealing."""
+        if self.state != self.RUNNING:
+            return
+        now = time.time()
+        while len(self._segs) < self.max_segments:
+            if self._holes:
+                if self._ranges_refused:
+                    break
+                p, e = self._holes.pop(0)
+                seg = _Segment(p, e)
+                self._segs.append(seg)
+                self._open_segment(seg)
+                continue
+            # Steal half of the slowest segment's remaining work
+            live = [s for s in self._segs if s.reply is not None]
+            if self._ranges_refused or not live:
+                break
+            victim = max(live, key=lambda s: s.eta(now))
+            if victim.remaining < 2 * STEAL_MIN_BYTES:
+                break
+            mid = victim.pos + victim.remaining // 2
+            seg = _Segment(mid, victim.end)
+            victim.end = mid  # it stops reading at mid
+            self._segs.append(seg)
+            self._open_segment(seg)
+            METRICS.incr("download.steals")
+
+        if not self._segs:
+            if self._holes:
+                # Ranges stopped working part-way; start over on one stream
+                self.segmented = False
+                self._holes = []
+                self._restart_from_zero("server refused segment ranges")
+            else:
+                self._complete()
+
+    def _drain(self, seg: _Segment):
+        r = seg.reply
+        if r is None:
+            return
+        w = self._writer
+        while seg.pos < seg.end and not w.congested:
+            n = min(self.chunk, seg.end - seg.pos)
+            # Segments share the transfer's share of the global rate cap
+            budget = LIMITER.allowance(self)
+            if budget is not None:
+                if budget <= 0:
+                    if r.bytesAvailable() > 0:
+                        LIMITER.wait(self, self._on_ready_read)
+                    break
+                n = min(n, budget)
+            data = r.read(n)
+            if not data:
+                break
+            LIMITER.consume(self, len(data))
+            w.write(data, seg.pos)
+            seg.pos += len(data)
+            self.received += len(data)
+
+    def _seg_done(self, seg: _Segment):
+        self._release(seg)
+        try:
+            self._segs.remove(seg)
+        except ValueError:
+            pass
+        self._assign_work()
+
+    # ---------- overrides ----------
+    def _replies(self) -> list:
+        if not self.segmented:
+            return super()._replies()
+        return [s.reply for s in self._segs if s.reply is not None]
+
+    def _on_ready_read(self):
+        if not self.segmented:
+            return super()._on_ready_read()
+        if self.state != self.RUNNING or not self._writer:
+            return
+        try:
+            for seg in list(self._segs):
+                self._drain(seg)
+                if seg.pos >= seg.end and seg in self._segs:
+                    self._seg_done(seg)
+        except Exception as e:
+            self._fail(f"I/O write error:\n{e}")
+            return
+        self._save_state()
+        self._emit_progress()
+        # Segments that finished while the writer was congested (or throttled)
+        for seg in [s for s in self._segs if s.finish_pending]:
+            if self.state != self.RUNNING or self._writer.congested:
+                break
+            if seg in self._segs and seg.reply is not None and seg.reply.bytesAvailable() == 0:
+                self._seg_finished(seg)
+
+    def _on_headers_segment(self, seg: _Segment, reply) -> bool:
+        """Check a segment's answer; False if it had to be dropped."""
+        try:
+            status = int(reply.attribute(HTTP_STATUS_ATTR()) or 0)
+        except Exception:
+            status = 0
+        if status == 206:
+            start, full = _parse_content_range(reply.rawHeader(b"Content-Range"))
+            if start == seg.pos and (full <= 0 or full == self.total):
+                return True
+        elif status >= 300 or status == 0:
+            return True  # error: handled when the reply finishes
+        # 200 (range ignored / validator changed) or a mismatching range
+        vlog(f"[Download] {self.name}: segment at {seg.pos} refused (HTTP {status})")
+        self._ranges_refused = True
+        self._holes.insert(0, [seg.pos, seg.end])
+        self._holes.sort()
+        self._release(seg)
+        self._segs.remove(seg)
+        return False
+
+    def _on_finished(self, reply=None):
+        if not self.segmented:
+            return super()._on_finished(reply)
+        seg = self._seg_for(reply)
+        if seg is None or self.state in (self.CANCELLED, self.FAILED, self.DONE):
+            return
+        if self.state == self.PAUSED:
+            seg.finish_pending = True
+            return
+        self._seg_finished(seg)
+
+    def _seg_finished(self, seg: _Segment):
+        r = seg.reply
+        seg.finish_pending = False
+        try:
+            self._drain(seg)
+        except Exception as e:
+            self._fail(f"I/O write error:\n{e}")
+            return
+        if seg.pos >= seg.end:
+            self._seg_done(seg)
+            self._emit_progress()
+            return
+        if r is not None and r.bytesAvailable() > 0:
+            # Writer congested or over the rate cap: finish once drained
+            seg.finish_pending = True
+            return
+
+        noerr = _net_error("NoError") or 0
+        err = r.error() if r is not None and hasattr(r, "error") else noerr
+        try:
+            status = int(r.attribute(HTTP_STATUS_ATTR()) or 0)
+        except Exception:
+            status = 0
+        why = r.errorString() if r is not None and err != noerr else "short body"
+        self._release(seg)
+
+        transient = err == noerr or self._is_transient(err, status)
+        if not transient or seg.attempt >= RETRY_LIMIT:
+            self._fail(f"Network error: {why}")
+            return
+        delay = self._backoff_delay(seg.attempt)
+        seg.attempt += 1
+        METRICS.incr("download.retries")
+        vlog(f"[Download] {self.name}: segment at {seg.pos} {why}; retry in {delay:.1f}s")
+        self._save_state(force=True)
+        QtCore.QTimer.singleShot(int(delay * 1000), lambda s=seg: self._reopen(s))
+
+    def _reopen(self, seg: _Segment):
+        if seg not in self._segs or seg.reply is not None:
+            return
+        if self.state == self.RUNNING:
+            self._open_segment(seg)
+        # Paused: resume() reopens it
+
+    def resume(self):
+        if not self.segmented:
+            return super().resume()
+        if self.state != self.PAUSED:
+            return
+        self._set_state(self.RUNNING)
+        for seg in list(self._segs):
+            if seg.reply is None:
+                self._open_segment(seg)
+        self._on_ready_read()
+        for seg in [s for s in self._segs if s.finish_pending]:
+            if seg in self._segs:
+                self._seg_finished(seg)
+        self._assign_work()
+
+    def _drop_reply(self):
+        super()._drop_reply()
+        for seg in self._segs:
+            self._release(seg)
+
+    def _resume_meta(self) -> dict:
+        meta = super()._resume_meta()
+        if self.segmented:
+            holes = sorted([[s.pos, s.end] for s in self._segs if s.pos < s.end] + self._holes)
+            meta["holes"] = holes
+            meta["bytes"] = holes[0][0] if holes else self.received
+        return meta
+
+    def _complete(self):
+        """All ranges received: check the count, then finalize (the writer
+        checks that every byte reached the disk)."""
+        if self.received != self.total:
+            self._fail(f"Incomplete download: {self.received} of {self.total} bytes.")
+            return
+        self._finalize()
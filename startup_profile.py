@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+startup_profile.py — Startup phase timing for `main.py --profile-startup`.
+
+This module is imported first by main.py, so it must stay stdlib-only and
+cheap. Each phase is recorded once as milliseconds since this module was
+imported; the report is written as JSON when the first page finishes loading.
+"""
+
+import json
+import os
+import sys
+import time
+
+# Phases in the order they normally happen (used to compute deltas).
+PHASES = (
+    "imports",
+    "qapplication",
+    "profile_build",
+    "blocklist_load",
+    "ui_build",
+    "first_tab",
+    "first_load_finished",
+)
+
+
+class StartupProfiler:
+    """
+    Records named startup phases. Marks are cheap and recorded even when
+    profiling is disabled; only the report writing is gated by 'enabled'.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.t0_wall = time.time()
+        self.enabled = False
+        self.report_path = None
+        self.marks: dict[str, float] = {}
+        # Optional callback invoked once 'first_load_finished' is marked
+        self.complete_cb = None
+
+    def mark(self, phase: str):
+        """Record 'phase' once (later marks of the same phase are ignored)."""
+        if phase in self.marks:
+            return
+        self.marks[phase] = (time.perf_counter() - self.t0) * 1000.0
+        if phase == "first_load_finished" and self.complete_cb:
+            try:
+                self.complete_cb()
+            except Exception as e:
+                print("[Startup] complete callback failed:", e, file=sys.stderr, flush=True)
+
+    def done(self) -> bool:
+        """True once the first page has finished loading."""
+        return "first_load_finished" in self.marks
+
+    def report(self) -> dict:
+        """
+        Return a JSON-friendly dict with absolute times and per-phase deltas.
+        """
+        ordered = sorted(self.marks.items(), key=lambda kv: kv[1])
+        deltas = {}
+        prev = 0.0
+        for name, ms in ordered:
+            deltas[name] = round(ms - prev, 3)
+            prev = ms
+        return {
+            "started_at": self.t0_wall,
+            "pid": os.getpid(),
+            "python": sys.version.split()[0],
+            "phases_ms": {k: round(v, 3) for k, v in ordered},
+            "deltas_ms": deltas,
+            "total_ms": round(prev, 3),
+            "missing": [p for p in PHASES if p not in self.marks],
+        }
+
+    def write_report(self, path: str | None = None) -> str | None:
+        """
+        Write the report as JSON to 'path' (or self.report_path, or stdout when
+        neither is set). Returns the path written, if any.
+        """
+        data = self.report()
+        path = path or self.report_path
+        if not path:
+            print(json.dumps(data, indent=2), flush=True)
+            return None
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            return path
+        except Exception as e:
+            print("[Startup] report write failed:", e, file=sys.stderr, flush=True)
+            return None
+
+
+# Process-wide profiler shared by main.py and browser.py
+STARTUP = StartupProfiler()
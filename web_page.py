@@ -3,12 +3,22 @@
 web_page.py — Custom QWebEnginePage implementation.
 
 SecurePage provides:
-- Automatic HTTP → HTTPS upgrade for main-frame navigation.
+- Automatic HTTP → HTTPS upgrade for main-frame navigation, guided by an
+  optional upgrade table (hsts.py): known-HTTPS hosts are left to the request
+  interceptor, hosts that fell back to HTTP this session are not upgraded,
+  and outcomes of upgrade attempts are learned. A failed upgrade falls back
+  to http:// only on connection-level errors (refused / reset / no TLS
+  listener), never after a certificate error or an aborted load, and the
+  fallback is announced via httpsFallback.
 - Certificate error handling to update the lock icon.
 - Optional JS console logging (controlled via env).
 - Strict feature permissions (only fullscreen is granted).
+- Optional per-navigation timing/Web Vitals samples (see page_timing.py).
 """
 
+import json
+import time
+
 from qt_compat import (
     QtCore,
     QUrl,
@@ -17,8 +27,20 @@ from qt_compat import (
     PERM_GRANT,
     PERM_DENY,
     _set_web_attr,
+    _SCRIPT,
     RUNIT_JS_CONSOLE,
 )
+from page_timing import VITALS_COLLECT_JS, VITALS_POLL_DELAY_MS
+
+# Chromium net errors after which an upgraded navigation may retry over
+# http://: the host has no (working) TLS listener. Timeouts, DNS failures,
+# certificate errors and aborts (ERR_ABORTED) never fall back.
+HTTPS_FALLBACK_ERRORS = {
+    -100,   # ERR_CONNECTION_CLOSED
+    -101,   # ERR_CONNECTION_RESET
+    -102,   # ERR_CONNECTION_REFUSED
+    -107,   # ERR_SSL_PROTOCOL_ERROR (plain HTTP answering on 443)
+}
 
 
 class SecurePage(QWebEnginePage):
@@ -29,10 +51,44 @@ class SecurePage(QWebEnginePage):
     - Denies most special features except fullscreen.
     """
 
-    def __init__(self, profile, parent=None, lock_cb=None):
+    # Emitted with the http:// URL when an upgrade attempt fell back to it
+    httpsFallback = QtCore.pyqtSignal(QUrl)
+
+    def __init__(self, profile, parent=None, lock_cb=None, timings=None, certs=None,
+                 upgrades=None):
         super().__init__(profile, parent)
         self._lock_cb = lock_cb
 
+        # hsts.UpgradeTable (or None) and the pending upgrade attempt
+        self._upgrades = upgrades
+        self._upgrade_from = None
+        # Why the pending upgrade must not fall back ("certificate",
+        # "aborted"), tracked per page
+        self._upgrade_veto = None
+        # Qt >= 6.2 reports the error code of a failed load; without it a
+        # failed upgrade is left as is (no fallback).
+        self._has_loading_info = hasattr(self, "loadingChanged")
+        if upgrades is not None:
+            self.loadFinished.connect(self._learn_upgrade_outcome)
+            if self._has_loading_info:
+                self.loadingChanged.connect(self._on_loading_changed)
+        # CertificateCache fed with chains QtWebEngine exposes on errors
+        self._certs = certs
+
+        # Transition of the first navigation of the current main-frame chain
+        # (for history); kept across redirects and our own upgrade/fallback
+        # setUrl() calls, which set _internal_nav
+        self.last_transition = "link"
+        self._internal_nav = False
+
+        # Navigation timing (PageTimingStore or None)
+        self._timings = timings
+        self._nav_seq = 0
+        self._nav_t0 = 0.0
+        if timings is not None:
+            self.loadStarted.connect(self._on_load_started)
+            self.loadFinished.connect(self._on_load_finished)
+
         # Enable some useful settings per-page
         try:
             _set_web_attr(self.settings(), "FullScreenSupportEnabled", True)
@@ -47,16 +103,155 @@ class SecurePage(QWebEnginePage):
         """
         Auto-upgrade http:// to https:// for main-frame navigation.
         """
+        if is_main_frame:
+            name = self._transition_name(nav_type)
+            if self._internal_nav:
+                self._internal_nav = False
+            elif name != "redirect":
+                self.last_transition = name
         try:
             if is_main_frame and (url.scheme() or "").lower() == "http":
-                secure = QUrl(url)
-                secure.setScheme("https")
-                self.setUrl(secure)
-                return False
+                mode = self._upgrades.lookup(url.host()) if self._upgrades else None
+                if mode == "https":
+                    # The request interceptor rewrites it; no second navigation.
+                    self._upgrade_from = None
+                elif mode == "http":
+                    # Known HTTP-only host: skip the failing upgrade attempt.
+                    self._upgrade_from = None
+                else:
+                    secure = QUrl(url)
+                    secure.setScheme("https")
+                    self._upgrade_from = QUrl(url)
+                    self._upgrade_veto = None
+                    self._internal_nav = True
+                    self.setUrl(secure)
+                    return False
         except Exception:
             pass
         return super().acceptNavigationRequest(url, nav_type, is_main_frame)
 
+    def _learn_upgrade_outcome(self, ok: bool):
+        """
+        Record that the current host works over HTTPS. Failures are judged
+        in _on_loading_changed, which knows the error code.
+        """
+        try:
+            url = self.url()
+            if (url.scheme() or "").lower() != "https":
+                return
+            if ok:
+                self._upgrade_from = None
+                self._upgrades.learn(url.host(), "https")
+            elif not self._has_loading_info:
+                self._upgrade_from = None
+        except Exception:
+            pass
+
+    def _on_loading_changed(self, info):
+        """
+        Qt >= 6.2: a failed upgraded load falls back to http:// only for
+        connection-level errors, and only if nothing vetoed it.
+        """
+        try:
+            fallback = self._upgrade_from
+            if fallback is None or info.url().host() != fallback.host():
+                return
+            if (info.url().scheme() or "").lower() != "https":
+                return
+            status = info.status()
+            enum = getattr(type(info), "LoadStatus", type(info))
+            if status == getattr(enum, "LoadStoppedStatus", None):
+                self._upgrade_veto = "aborted"
+            if status not in (
+                getattr(enum, "LoadFailedStatus", None),
+                getattr(enum, "LoadStoppedStatus", None),
+            ):
+                return
+            self._upgrade_from = None
+            domains = getattr(type(info), "ErrorDomain", type(info))
+            if (
+                self._upgrade_veto is None
+                and info.errorDomain() == getattr(domains, "ConnectionErrorDomain", None)
+                and info.errorCode() in HTTPS_FALLBACK_ERRORS
+            ):
+                self._upgrades.learn(fallback.host(), "http")
+                self._internal_nav = True
+                self.setUrl(fallback)
+                self.httpsFallback.emit(fallback)
+        except Exception:
+            pass
+
+    def triggerAction(self, action, checked=False):
+        """Note a user Stop so a pending upgrade does not fall back."""
+        try:
+            enum = getattr(QWebEnginePage, "WebAction", QWebEnginePage)
+            if action == getattr(enum, "Stop", None) and self._upgrade_from is not None:
+                self._upgrade_veto = "aborted"
+        except Exception:
+            pass
+        return super().triggerAction(action, checked)
+
+    @staticmethod
+    def _transition_name(nav_type) -> str:
+        """Map QWebEnginePage.NavigationType to a short history transition."""
+        enum = getattr(QWebEnginePage, "NavigationType", QWebEnginePage)
+        for attr, name in (
+            ("NavigationTypeTyped", "typed"),
+            ("NavigationTypeLinkClicked", "link"),
+            ("NavigationTypeFormSubmitted", "form"),
+            ("NavigationTypeBackForward", "back_forward"),
+            ("NavigationTypeReload", "reload"),
+            ("NavigationTypeRedirect", "redirect"),
+        ):
+            if nav_type == getattr(enum, attr, None):
+                return name
+        return "other"
+
+    # ---------- Load timing ----------
+    def _on_load_started(self):
+        self._nav_seq += 1
+        self._nav_t0 = time.perf_counter()
+
+    def _on_load_finished(self, ok: bool):
+        """
+        Record Qt's load time, then poll the vitals once after a short delay.
+        """
+        if not self._nav_t0:
+            return
+        load_ms = (time.perf_counter() - self._nav_t0) * 1000.0
+        self._nav_t0 = 0.0
+        url = self.url()
+        if (url.scheme() or "").lower() not in ("http", "https"):
+            return
+        sample = {"ok": bool(ok), "load_ms": round(load_ms, 1), "scheme": url.scheme()}
+        if not ok:
+            self._timings.record(url.host(), sample)
+            return
+        seq = self._nav_seq
+        QtCore.QTimer.singleShot(
+            VITALS_POLL_DELAY_MS, lambda: self._collect_vitals(seq, url.host(), sample)
+        )
+
+    def _collect_vitals(self, seq: int, host: str, sample: dict):
+        if seq != self._nav_seq:
+            # Navigated away meanwhile; keep just the Qt timing.
+            self._timings.record(host, sample)
+            return
+
+        def done(result):
+            try:
+                sample.update(json.loads(result or "{}"))
+            except Exception:
+                pass
+            self._timings.record(host, sample)
+
+        try:
+            self.runJavaScript(
+                VITALS_COLLECT_JS, _SCRIPT("ScriptWorldId", "ApplicationWorld"), done
+            )
+        except Exception:
+            self._timings.record(host, sample)
+
     # ---------- Certificate handling ----------
     def certificateError(self, error):
         """
@@ -67,6 +262,17 @@ class SecurePage(QWebEnginePage):
                 self._lock_cb(False)
         except Exception:
             pass
+        try:
+            # A bad certificate is never a reason to retry over plain HTTP
+            if self._upgrade_from is not None:
+                self._upgrade_veto = "certificate"
+        except Exception:
+            pass
+        try:
+            if self._certs is not None and hasattr(error, "certificateChain"):
+                self._certs.capture_chain(error.url().host(), error.certificateChain())
+        except Exception:
+            pass
         return False  # do not ignore errors
 
     # ---------- Console logging ----------
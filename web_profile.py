@@ -6,8 +6,16 @@ build_lean_profile() creates a minimal, memory-friendly profile:
 - No disk cache (or off-the-record if supported).
 - In-memory cookies only.
 - Common WebEngine features turned on for compatibility.
+
+build_persistent_profile() creates a named on-disk profile instead:
+- Disk HTTP cache with a configurable size cap, so revisits reuse assets.
+- Persistent storage and cookies under a fixed directory.
+
+build_profile() picks one of the two by mode name.
 """
 
+import os
+
 from qt_compat import (
     QApplication,
     QWebEngineProfile,
@@ -15,22 +23,48 @@ from qt_compat import (
     _HTTP_CACHE,
     _COOKIES,
     _set_web_attr,
+    vlog,
 )
+from config import PROFILE_DIR, DISK_CACHE_MB
 
 
-def build_lean_profile():
-    """
-    Create a QWebEngineProfile optimised for low persistence and low overhead.
-    """
+def _named_profile(name: str):
+    """Create a profile parented by the app so it's destroyed last."""
     app = QApplication.instance()
     try:
-        # Named profile parented by the app so it's destroyed last.
-        prof = QWebEngineProfile("lean-profile", app)
+        return QWebEngineProfile(name, app)
     except Exception:
         try:
-            prof = QWebEngineProfile(app)
+            return QWebEngineProfile(app)
         except Exception:
-            prof = QWebEngineProfile()
+            return QWebEngineProfile()
+
+
+def _apply_common_settings(prof):
+    """Enable common features that many websites depend on."""
+    s = prof.settings()
+    for name in [
+        "FullScreenSupportEnabled",
+        "JavascriptEnabled",
+        "LocalStorageEnabled",
+        "AutoLoadImages",
+        "WebGLEnabled",
+        "Accelerated2dCanvasEnabled",
+    ]:
+        _set_web_attr(s, name, True)
+
+    # Flash/plugins disabled by default
+    _set_web_attr(s, "PluginsEnabled", False)
+
+    # Allow mixed content for compatibility; change to False for strict HTTPS.
+    _set_web_attr(s, "AllowRunningInsecureContent", True)
+
+
+def build_lean_profile():
+    """
+    Create a QWebEngineProfile optimised for low persistence and low overhead.
+    """
+    prof = _named_profile("lean-profile")
 
     # Try to go "off the record" (no on-disk storage).
     try:
@@ -53,22 +87,51 @@ def build_lean_profile():
     except Exception:
         pass
 
-    # Enable common features that many websites depend on
-    s = prof.settings()
-    for name in [
-        "FullScreenSupportEnabled",
-        "JavascriptEnabled",
-        "LocalStorageEnabled",
-        "AutoLoadImages",
-        "WebGLEnabled",
-        "Accelerated2dCanvasEnabled",
-    ]:
-        _set_web_attr(s, name, True)
+    _apply_common_settings(prof)
+    return prof
 
-    # Flash/plugins disabled by default
-    _set_web_attr(s, "PluginsEnabled", False)
 
-    # Allow mixed content for compatibility; change to False for strict HTTPS.
-    _set_web_attr(s, "AllowRunningInsecureContent", True)
+def build_persistent_profile(cache_mb: int = DISK_CACHE_MB, base_dir: str = PROFILE_DIR):
+    """
+    Create a named on-disk profile with a disk HTTP cache capped at 'cache_mb'.
+    """
+    prof = _named_profile("runit-persistent")
+
+    cache_dir = os.path.join(base_dir, "cache")
+    storage_dir = os.path.join(base_dir, "storage")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        os.makedirs(storage_dir, exist_ok=True)
+    except Exception as e:
+        vlog("[Profile] cannot create profile dirs:", e)
+
+    try:
+        if hasattr(prof, "setPersistentStoragePath"):
+            prof.setPersistentStoragePath(storage_dir)
+        if hasattr(prof, "setCachePath"):
+            prof.setCachePath(cache_dir)
+        if hasattr(prof, "setPersistentCookiesPolicy"):
+            prof.setPersistentCookiesPolicy(_COOKIES("AllowPersistentCookies"))
+    except Exception:
+        pass
 
+    try:
+        prof.setHttpCacheType(_HTTP_CACHE("DiskHttpCache"))
+        prof.setHttpCacheMaximumSize(max(1, int(cache_mb)) * 1024 * 1024)
+    except Exception:
+        pass
+
+    _apply_common_settings(prof)
     return prof
+
+
+def build_profile(mode: str = "lean", cache_mb: int = DISK_CACHE_MB):
+    """
+    Build the profile for 'mode' ("lean" or "persistent").
+    Unknown modes fall back to lean.
+    """
+    if mode == "persistent":
+        return build_persistent_profile(cache_mb)
+    if mode != "lean":
+        vlog(f"[Profile] unknown mode {mode!r}, using lean")
+    return build_lean_profile()